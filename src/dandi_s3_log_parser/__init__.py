@@ -21,9 +21,12 @@ from ._config import DANDI_S3_LOG_PARSER_BASE_FOLDER_PATH
 from ._s3_log_file_reducer import reduce_raw_s3_log
 from ._buffered_text_reader import BufferedTextReader
 from ._dandi_s3_log_file_reducer import reduce_all_dandi_raw_s3_logs
-from ._ip_utils import get_region_from_ip_address
+from ._ip_utils import get_region_from_ip_address, get_regions_from_ip_addresses
 from ._map_binned_s3_logs_to_dandisets import map_binned_s3_logs_to_dandisets
+from ._compact_reduced_s3_logs import compact_reduced_s3_logs
 from ._bin_all_reduced_s3_logs_by_object_key import bin_all_reduced_s3_logs_by_object_key
+from ._binned_s3_log_store import BinnedS3LogStore, compact_binned_s3_log_store
+from ._resolve_regions_of_binned_s3_logs import resolve_regions_of_binned_s3_logs
 from ._generate_all_dandiset_totals import generate_all_dandiset_totals
 from ._generate_archive_summaries import generate_archive_summaries
 from ._generate_archive_totals import generate_archive_totals
@@ -38,7 +41,12 @@ __all__ = [
     "generate_archive_summaries",
     "generate_archive_totals",
     "get_region_from_ip_address",
+    "get_regions_from_ip_addresses",
     "map_binned_s3_logs_to_dandisets",
+    "compact_reduced_s3_logs",
     "bin_all_reduced_s3_logs_by_object_key",
+    "BinnedS3LogStore",
+    "compact_binned_s3_log_store",
+    "resolve_regions_of_binned_s3_logs",
     "update_region_codes_to_coordinates",
 ]
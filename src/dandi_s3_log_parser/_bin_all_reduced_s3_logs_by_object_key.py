@@ -1,10 +1,24 @@
 """Bin reduced logs by object key."""
 
+import contextlib
 import pathlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Literal
 
+import numpy
 import pandas
 import tqdm
-from pydantic import DirectoryPath, validate_call
+from pydantic import DirectoryPath, Field, validate_call
+
+from ._binned_s3_log_store import BinnedS3LogStore, _hold_binned_s3_log_store_lease
+from ._binned_s3_log_writer import (
+    _get_binned_s3_log_file_path,
+    _iterate_binned_s3_log_contents,
+    _write_binned_s3_logs,
+)
+from ._binning_journal import _BinningJournal, _CatalogEntry
+from ._s3_log_table_reader import _TIMESTAMP_FORMAT, _format_timestamps, _read_s3_log_table
 
 
 @validate_call
@@ -13,6 +27,13 @@ def bin_all_reduced_s3_logs_by_object_key(
     reduced_s3_logs_folder_path: DirectoryPath,
     binned_s3_logs_folder_path: DirectoryPath,
     file_limit: int | None = None,
+    engine: Literal["append", "external_sort"] = "append",
+    number_of_spill_partitions: int = Field(ge=1, default=64),
+    maximum_number_of_workers: int = Field(ge=1, default=1),
+    maximum_buffer_size_in_bytes: int = Field(ge=1, default=10**9),
+    storage: Literal["folder", "store"] = "folder",
+    compression: Literal["none", "gzip"] = "none",
+    ip_address_encoding: Literal["text", "dictionary"] = "text",
 ) -> None:
     """
     Bin reduced S3 logs by object keys.
@@ -26,91 +47,547 @@ def bin_all_reduced_s3_logs_by_object_key(
         There will be one file per object key.
     file_limit : int, optional
         The maximum number of files to process per call.
+    engine : "append" or "external_sort", default: "append"
+        The strategy used to bin the reduced logs.
+
+        - "append" accumulates the records of as many reduced files as fit in `maximum_buffer_size_in_bytes`, then
+          appends to the binned file of every object key found in that batch.
+        - "external_sort" first hash-partitions the records of all reduced files into a bounded number of spill files,
+          then sorts and groups each partition in memory so that each binned file is appended to only once per call.
+          The spill files are kept in a temporary `.spill` subfolder of the `binned_s3_logs_folder_path`.
+    number_of_spill_partitions : int, default: 64
+        Only used if `engine` is "external_sort".
+        The number of spill files to partition the records into; the memory used while grouping each partition is
+        roughly the total size of the reduced files being binned divided by this number.
+    maximum_number_of_workers : int, default: 1
+        The maximum number of workers to distribute tasks across.
+
+        Each worker owns a disjoint hash range of the object keys, so no two workers ever append to the same binned
+        file. Every worker reads all reduced files but only bins the records of the object keys it owns.
+        Files completed by only some of the workers of an interrupted call can only be resumed with the same number
+        of workers.
+    maximum_buffer_size_in_bytes : int, default: 1 GB
+        Only used if `engine` is "append".
+        The approximate in-memory size of the records to accumulate before flushing them to the binned files.
+        This budget is shared evenly between the workers.
+        Larger budgets mean fewer, larger appends to each binned file.
+    storage : "folder" or "store", default: "folder"
+        How the binned S3 logs are stored.
+
+        - "folder" writes one file per object key, laid out by the folders of the object key.
+        - "store" appends the records of all object keys to a few segment files of a `BinnedS3LogStore`, kept in the
+          `binned_s3_log_store` subfolder. The store is never compacted by binning; run `compact_binned_s3_log_store`
+          separately to do so. Binning holds a lease on the store while it runs, so it raises a ValueError if another
+          call is already binning into or compacting the same store. It can be exported to the "folder" layout with
+          `BinnedS3LogStore.export_to_folder`.
+    compression : "none" or "gzip", default: "none"
+        Only used if `storage` is "folder".
+        If "gzip", each binned file is written as `<object key>.tsv.gz`, with every append compressed as its own gzip
+        member so the files never need to be rewritten. Compressed files are read transparently when mapping.
+        The same compression must be used for every call binning into the same folder.
+    ip_address_encoding : "text" or "dictionary", default: "text"
+        Only used if `storage` is "folder".
+        If "dictionary", each distinct IP address across all calls is given an integer ID, kept in the binning
+        journal, and the binned files store the column "ip_id" in place of "ip_address". Mapping then resolves the
+        region of each ID only once and assigns regions by indexing an array with the IDs.
+        The same encoding must be used for every call binning into the same folder.
     """
-    started_tracking_file_path = binned_s3_logs_folder_path / "binned_log_file_paths_started.txt"
-    completed_tracking_file_path = binned_s3_logs_folder_path / "binned_log_file_paths_completed.txt"
+    if storage == "store" and compression != "none":
+        message = "Compression is only supported when binning with `storage='folder'`."
+        raise ValueError(message)
+    if storage == "store" and ip_address_encoding != "text":
+        message = "Dictionary encoding of IP addresses is only supported when binning with `storage='folder'`."
+        raise ValueError(message)
 
-    if started_tracking_file_path.exists() != completed_tracking_file_path.exists():
-        raise FileNotFoundError(
-            "One of the tracking files is missing, indicating corruption in the binning process. "
-            "Please clean the binning directory and re-run this function."
-        )
+    # Anything binned into the folder before the journal existed is missing from the catalog
+    is_catalog_complete = not any(binned_s3_logs_folder_path.iterdir())
+
+    # Compaction must not rewrite or remove the segments that this call is still appending to
+    store_lease_context = (
+        _hold_binned_s3_log_store_lease(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+        if storage == "store"
+        else contextlib.nullcontext(enter_result=True)
+    )
+    with store_lease_context as is_store_claimed:
+        if not is_store_claimed:
+            message = (
+                f"The binned S3 log store in '{binned_s3_logs_folder_path}' is in use by another call to binning or "
+                "compaction!"
+            )
+            raise ValueError(message)
+
+        # Undo any batch left partially written by an interrupted call before deciding what remains to be done
+        binned_s3_log_store = None
+        if storage == "store" or BinnedS3LogStore.exists(binned_s3_logs_folder_path=binned_s3_logs_folder_path):
+            binned_s3_log_store = BinnedS3LogStore(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+        journal = _BinningJournal(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+        try:
+            journal.import_legacy_tracking_files()
+            journal.initialize_setting(name="is_catalog_complete", value="true" if is_catalog_complete else "false")
+            journal.check_setting(name="storage", value=storage)
+            journal.check_setting(name="compression", value=compression)
+            journal.check_setting(name="ip_address_encoding", value=ip_address_encoding)
+            journal.recover(on_rollback=binned_s3_log_store._discard_batch if binned_s3_log_store is not None else None)
+            completed_by_worker = [
+                journal.get_completed_reduced_s3_log_files(
+                    worker_index=worker_index, number_of_workers=maximum_number_of_workers
+                )
+                for worker_index in range(maximum_number_of_workers)
+            ]
+        finally:
+            journal.close()
+            if binned_s3_log_store is not None:
+                binned_s3_log_store.close()
+        completed_by_all_workers = set.intersection(*completed_by_worker)
+
+        reduced_s3_log_files = [
+            reduced_s3_log_file
+            # The reduced files are named by date, so sorting them bins the oldest days first
+            for reduced_s3_log_file in sorted(reduced_s3_logs_folder_path.rglob("*.tsv"))
+            if str(reduced_s3_log_file) not in completed_by_all_workers
+        ][:file_limit]
+        reduced_s3_log_files_by_worker = [
+            [
+                reduced_s3_log_file
+                for reduced_s3_log_file in reduced_s3_log_files
+                if str(reduced_s3_log_file) not in completed
+            ]
+            for completed in completed_by_worker
+        ]
+
+        if maximum_number_of_workers == 1:
+            _bin_reduced_s3_logs_on_worker(
+                reduced_s3_log_files=reduced_s3_log_files_by_worker[0],
+                binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+                worker_index=0,
+                number_of_workers=1,
+                engine=engine,
+                number_of_spill_partitions=number_of_spill_partitions,
+                maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
+                storage=storage,
+                compression=compression,
+                ip_address_encoding=ip_address_encoding,
+            )
+        else:
+            with ProcessPoolExecutor(max_workers=maximum_number_of_workers) as executor:
+                futures = [
+                    executor.submit(
+                        _bin_reduced_s3_logs_on_worker,
+                        reduced_s3_log_files=reduced_s3_log_files_by_worker[worker_index],
+                        binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+                        worker_index=worker_index,
+                        number_of_workers=maximum_number_of_workers,
+                        engine=engine,
+                        number_of_spill_partitions=number_of_spill_partitions,
+                        maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes // maximum_number_of_workers,
+                        storage=storage,
+                        compression=compression,
+                        ip_address_encoding=ip_address_encoding,
+                    )
+                    for worker_index in range(maximum_number_of_workers)
+                ]
+                for future in as_completed(futures):
+                    # Propagate any errors; the next call rolls back the unfinished batch of that worker
+                    future.result()
+
+    return None
 
-    completed = None
-    if not started_tracking_file_path.exists():
-        started_tracking_file_path.touch()
-        completed_tracking_file_path.touch()
-    else:
-        with open(file=started_tracking_file_path, mode="r") as io:
-            started = set(pathlib.Path(path.rstrip("\n")) for path in io.readlines())
-        with open(file=completed_tracking_file_path, mode="r") as io:
-            completed = set(pathlib.Path(path.rstrip("\n")) for path in io.readlines())
-
-        if started != completed:
-            raise ValueError(
-                "The tracking files do not agree on the state of the binning process. "
-                "Please clean the binning directory and re-run this function."
+
+def _bin_reduced_s3_logs_on_worker(
+    *,
+    reduced_s3_log_files: list[pathlib.Path],
+    binned_s3_logs_folder_path: pathlib.Path,
+    worker_index: int,
+    number_of_workers: int,
+    engine: Literal["append", "external_sort"],
+    number_of_spill_partitions: int,
+    maximum_buffer_size_in_bytes: int,
+    storage: Literal["folder", "store"],
+    compression: Literal["none", "gzip"],
+    ip_address_encoding: Literal["text", "dictionary"] = "text",
+) -> None:
+    batch_writer = _BinnedS3LogBatchWriter(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+        worker_index=worker_index,
+        number_of_workers=number_of_workers,
+        storage=storage,
+        compression=compression,
+        ip_address_encoding=ip_address_encoding,
+    )
+    try:
+        if engine == "external_sort":
+            _bin_reduced_s3_logs_by_external_sort(
+                reduced_s3_log_files=reduced_s3_log_files,
+                binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+                batch_writer=batch_writer,
+                number_of_spill_partitions=number_of_spill_partitions,
+                worker_index=worker_index,
+                number_of_workers=number_of_workers,
             )
-    completed = completed or set()
+        else:
+            _bin_reduced_s3_logs_by_batched_append(
+                reduced_s3_log_files=reduced_s3_log_files,
+                batch_writer=batch_writer,
+                maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
+                worker_index=worker_index,
+                number_of_workers=number_of_workers,
+            )
+    finally:
+        batch_writer.close()
+
+    return None
+
 
-    reduced_s3_log_files = list(set(reduced_s3_logs_folder_path.rglob("*.tsv")) - completed)[:file_limit]
+def _bin_reduced_s3_logs_by_batched_append(
+    *,
+    reduced_s3_log_files: list[pathlib.Path],
+    batch_writer: "_BinnedS3LogBatchWriter",
+    maximum_buffer_size_in_bytes: int,
+    worker_index: int = 0,
+    number_of_workers: int = 1,
+) -> None:
+    worker_description = f" on worker {worker_index + 1}" if number_of_workers > 1 else ""
+    batch_reduced_s3_log_files = []
+    batch_data_frames = []
+    batch_size_in_bytes = 0
     for reduced_s3_log_file in tqdm.tqdm(
         iterable=reduced_s3_log_files,
         total=len(reduced_s3_log_files),
-        desc="Binning reduced logs",
-        position=0,
+        desc=f"Binning reduced logs{worker_description}",
+        position=worker_index,
         leave=True,
         mininterval=3.0,
         smoothing=0,
         unit="file",
     ):
-        if reduced_s3_log_file.stat().st_size == 0:
-            with open(file=started_tracking_file_path, mode="a") as io:
-                io.write(f"{reduced_s3_log_file}\n")
-            with open(file=completed_tracking_file_path, mode="a") as io:
-                io.write(f"{reduced_s3_log_file}\n")
+        batch_reduced_s3_log_files.append(reduced_s3_log_file)
 
-            continue
+        if reduced_s3_log_file.stat().st_size != 0:
+            reduced_data_frame = _read_owned_reduced_records(
+                reduced_s3_log_file=reduced_s3_log_file, worker_index=worker_index, number_of_workers=number_of_workers
+            )
+            batch_data_frames.append(reduced_data_frame)
+            batch_size_in_bytes += int(reduced_data_frame.memory_usage(index=False, deep=True).sum())
+
+        if batch_size_in_bytes >= maximum_buffer_size_in_bytes:
+            _flush_batch(
+                batch_reduced_s3_log_files=batch_reduced_s3_log_files,
+                batch_data_frames=batch_data_frames,
+                batch_writer=batch_writer,
+            )
+            batch_reduced_s3_log_files = []
+            batch_data_frames = []
+            batch_size_in_bytes = 0
 
-        reduced_data_frame = pandas.read_csv(filepath_or_buffer=reduced_s3_log_file, sep="\t")
-        binned_data_frame = reduced_data_frame.groupby("object_key").agg(
-            {
-                "timestamp": list,
-                "bytes_sent": list,
-                "ip_address": list,
-            }
+    if len(batch_reduced_s3_log_files) != 0:
+        _flush_batch(
+            batch_reduced_s3_log_files=batch_reduced_s3_log_files,
+            batch_data_frames=batch_data_frames,
+            batch_writer=batch_writer,
         )
-        del reduced_data_frame
-
-        object_keys_to_data = {
-            row.name: {"timestamp": row["timestamp"], "bytes_sent": row["bytes_sent"], "ip_address": row["ip_address"]}
-            for _, row in binned_data_frame.iterrows()
-        }
-        del binned_data_frame
-
-        with open(file=started_tracking_file_path, mode="a") as io:
-            io.write(f"{reduced_s3_log_file}\n")
-
-        for object_key, data in tqdm.tqdm(
-            iterable=object_keys_to_data.items(),
-            total=len(object_keys_to_data),
-            desc=f"Binning {reduced_s3_log_file}",
-            position=1,
-            leave=False,
+
+    return None
+
+
+def _flush_batch(
+    *,
+    batch_reduced_s3_log_files: list[pathlib.Path],
+    batch_data_frames: list[pandas.DataFrame],
+    batch_writer: "_BinnedS3LogBatchWriter",
+) -> None:
+    """
+    Write the accumulated records of a batch of reduced files with a single append to each binned file.
+
+    The batch is committed to the journal as a whole, so the files of a batch are either all completed or, after
+    recovery, none of them are.
+    """
+    batch_id = batch_writer.start_batch(reduced_s3_log_files=batch_reduced_s3_log_files)
+
+    if len(batch_data_frames) != 0:
+        batch_data_frame = pandas.concat(objs=batch_data_frames, ignore_index=True)
+        batch_data_frames.clear()
+
+        batch_writer.write(batch_id=batch_id, reduced_data_frame=batch_data_frame)
+        del batch_data_frame
+
+    batch_writer.commit_batch(batch_id=batch_id)
+
+    return None
+
+
+class _BinnedS3LogBatchWriter:
+    def __init__(
+        self,
+        *,
+        binned_s3_logs_folder_path: pathlib.Path,
+        worker_index: int,
+        number_of_workers: int,
+        storage: Literal["folder", "store"],
+        compression: Literal["none", "gzip"],
+        ip_address_encoding: Literal["text", "dictionary"] = "text",
+    ) -> None:
+        """
+        Write batches of reduced records to the binned S3 logs of a single worker, recording each in the journal.
+
+        If `ip_address_encoding` is "dictionary", the IP addresses of each batch are replaced by their integer IDs
+        from the dictionary of the journal, which is shared by all workers.
+
+        Also keeps the catalog entry of each object key up to date: its number of rows, size on disk, first and last
+        timestamps, total bytes sent, the last batch that appended to it, and whether every batch appended to that key
+        started no earlier than the previous one ended; that is, whether the binned records of the key are in
+        timestamp order.
+        """
+        self.binned_s3_logs_folder_path = binned_s3_logs_folder_path
+        self.worker_index = worker_index
+        self.number_of_workers = number_of_workers
+        self.compression = compression
+        self.ip_address_encoding = ip_address_encoding
+
+        self.journal = _BinningJournal(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+        self.binned_s3_log_store = (
+            BinnedS3LogStore(binned_s3_logs_folder_path=binned_s3_logs_folder_path) if storage == "store" else None
+        )
+
+        self._created_folder_paths: set[pathlib.Path] = set()
+        # Each worker owns a disjoint set of object keys, so no other worker can change these entries
+        self._catalog = self.journal.get_catalog()
+        self._updated_object_keys_by_batch_id: dict[int, set[str]] = dict()
+        self._ip_ids_by_ip_address: dict[str, int] = dict()
+
+    def close(self) -> None:
+        self.journal.close()
+        if self.binned_s3_log_store is not None:
+            self.binned_s3_log_store.close()
+
+    def start_batch(self, *, reduced_s3_log_files: list[pathlib.Path]) -> int:
+        batch_id = self.journal.start_batch(
+            reduced_s3_log_files=reduced_s3_log_files,
+            worker_index=self.worker_index,
+            number_of_workers=self.number_of_workers,
+        )
+        self._updated_object_keys_by_batch_id[batch_id] = set()
+
+        return batch_id
+
+    def write(self, *, batch_id: int, reduced_data_frame: pandas.DataFrame) -> None:
+        """Record the length of every file about to be touched in the journal, then write the records to them."""
+        if self.ip_address_encoding == "dictionary":
+            reduced_data_frame = self._encode_ip_addresses(reduced_data_frame=reduced_data_frame)
+
+        if self.binned_s3_log_store is not None:
+            self.journal.record_binned_file_lengths(
+                batch_id=batch_id, binned_s3_log_file_paths=[self.binned_s3_log_store._get_write_segment_file_path()]
+            )
+            appended_sizes_in_bytes = self.binned_s3_log_store._append(
+                batch_id=batch_id, contents=_iterate_binned_s3_log_contents(reduced_data_frame=reduced_data_frame)
+            )
+        else:
+            binned_s3_log_file_paths = [
+                _get_binned_s3_log_file_path(
+                    object_key=object_key,
+                    binned_s3_logs_folder_path=self.binned_s3_logs_folder_path,
+                    compression=self.compression,
+                )
+                for object_key in reduced_data_frame["object_key"].unique()
+            ]
+            self.journal.record_binned_file_lengths(
+                batch_id=batch_id, binned_s3_log_file_paths=binned_s3_log_file_paths
+            )
+            appended_sizes_in_bytes = _write_binned_s3_logs(
+                reduced_data_frame=reduced_data_frame,
+                binned_s3_logs_folder_path=self.binned_s3_logs_folder_path,
+                created_folder_paths=self._created_folder_paths,
+                compression=self.compression,
+            )
+
+        self._update_catalog(
+            batch_id=batch_id, reduced_data_frame=reduced_data_frame, appended_sizes_in_bytes=appended_sizes_in_bytes
+        )
+
+    def _encode_ip_addresses(self, *, reduced_data_frame: pandas.DataFrame) -> pandas.DataFrame:
+        codes, unique_ip_addresses = pandas.factorize(values=reduced_data_frame["ip_address"])
+        unique_ip_addresses = unique_ip_addresses.astype(str).tolist()
+
+        new_ip_addresses = [
+            ip_address for ip_address in unique_ip_addresses if ip_address not in self._ip_ids_by_ip_address
+        ]
+        if len(new_ip_addresses) != 0:
+            new_ip_ids = self.journal.get_ip_ids(ip_addresses=new_ip_addresses)
+            self._ip_ids_by_ip_address.update(zip(new_ip_addresses, new_ip_ids))
+
+        ip_ids = numpy.array(
+            [self._ip_ids_by_ip_address[ip_address] for ip_address in unique_ip_addresses], dtype=numpy.int64
+        )
+        encoded_data_frame = reduced_data_frame.drop(columns="ip_address")
+        encoded_data_frame["ip_id"] = ip_ids[codes]
+
+        return encoded_data_frame
+
+    def commit_batch(self, *, batch_id: int) -> None:
+        updated_object_keys = self._updated_object_keys_by_batch_id.pop(batch_id)
+        self.journal.commit_batch(
+            batch_id=batch_id,
+            catalog_entries=((object_key, self._catalog[object_key]) for object_key in updated_object_keys),
+        )
+
+    def _update_catalog(
+        self, *, batch_id: int, reduced_data_frame: pandas.DataFrame, appended_sizes_in_bytes: dict[str, int]
+    ) -> None:
+        statistics = reduced_data_frame.groupby(by="object_key", sort=False).agg(
+            number_of_rows=("timestamp", "size"),
+            first_timestamp=("timestamp", "min"),
+            last_timestamp=("timestamp", "max"),
+            total_bytes_sent=("bytes_sent", "sum"),
+        )
+        for object_key, number_of_rows, first_timestamp, last_timestamp, total_bytes_sent in zip(
+            statistics.index.tolist(),
+            statistics["number_of_rows"].tolist(),
+            _format_timestamps(timestamps=statistics["first_timestamp"]).tolist(),
+            _format_timestamps(timestamps=statistics["last_timestamp"]).tolist(),
+            statistics["total_bytes_sent"].tolist(),
+        ):
+            size_in_bytes = appended_sizes_in_bytes[object_key]
+            previous_entry = self._catalog.get(object_key, None)
+            if previous_entry is None:
+                self._catalog[object_key] = _CatalogEntry(
+                    number_of_rows=number_of_rows,
+                    size_in_bytes=size_in_bytes,
+                    first_timestamp=first_timestamp,
+                    last_timestamp=last_timestamp,
+                    total_bytes_sent=total_bytes_sent,
+                    last_batch_id=batch_id,
+                    is_time_ordered=True,
+                )
+            else:
+                self._catalog[object_key] = _CatalogEntry(
+                    number_of_rows=previous_entry.number_of_rows + number_of_rows,
+                    size_in_bytes=previous_entry.size_in_bytes + size_in_bytes,
+                    first_timestamp=min(previous_entry.first_timestamp, first_timestamp),
+                    last_timestamp=max(previous_entry.last_timestamp, last_timestamp),
+                    total_bytes_sent=previous_entry.total_bytes_sent + total_bytes_sent,
+                    last_batch_id=batch_id,
+                    is_time_ordered=previous_entry.is_time_ordered and first_timestamp >= previous_entry.last_timestamp,
+                )
+            self._updated_object_keys_by_batch_id[batch_id].add(object_key)
+
+
+def _bin_reduced_s3_logs_by_external_sort(
+    *,
+    reduced_s3_log_files: list[pathlib.Path],
+    binned_s3_logs_folder_path: pathlib.Path,
+    batch_writer: _BinnedS3LogBatchWriter,
+    number_of_spill_partitions: int,
+    worker_index: int = 0,
+    number_of_workers: int = 1,
+) -> None:
+    """
+    Bin all the given reduced files as a single batch through hash-partitioned spill files.
+
+    The batch is started in the journal before anything is written to the binned files, the length of the binned
+    files of each partition are recorded before it is written, and the batch is committed only after every partition
+    has been written.
+    """
+    spill_folder_name = ".spill" if number_of_workers == 1 else f".spill_worker_{worker_index}"
+    spill_folder_path = binned_s3_logs_folder_path / spill_folder_name
+    if spill_folder_path.exists():
+        shutil.rmtree(path=spill_folder_path)  # Leftovers from an interrupted call
+    spill_folder_path.mkdir()
+
+    spill_file_paths = [
+        spill_folder_path / f"partition_{partition_index}.tsv" for partition_index in range(number_of_spill_partitions)
+    ]
+
+    worker_description = f" on worker {worker_index + 1}" if number_of_workers > 1 else ""
+
+    # Phase 1: scatter the records of each reduced file across the spill files by the hash of their object key
+    spill_file_streams = [open(file=spill_file_path, mode="a") for spill_file_path in spill_file_paths]
+    try:
+        for reduced_s3_log_file in tqdm.tqdm(
+            iterable=reduced_s3_log_files,
+            total=len(reduced_s3_log_files),
+            desc=f"Partitioning reduced logs{worker_description}",
+            position=worker_index,
+            leave=True,
             mininterval=3.0,
             smoothing=0,
-            unit="asset",
+            unit="file",
         ):
-            object_key_as_path = pathlib.Path(object_key)
-            binned_s3_log_file_path = (
-                binned_s3_logs_folder_path / object_key_as_path.parent / f"{object_key_as_path.name}.tsv"
+            if reduced_s3_log_file.stat().st_size == 0:
+                continue
+
+            reduced_data_frame = _read_owned_reduced_records(
+                reduced_s3_log_file=reduced_s3_log_file,
+                worker_index=worker_index,
+                number_of_workers=number_of_workers,
             )
-            binned_s3_log_file_path.parent.mkdir(exist_ok=True, parents=True)
+            # Skip over the bits of the hash already used to assign the object keys to workers
+            object_key_hashes = _get_object_key_hashes(object_keys=reduced_data_frame["object_key"])
+            partition_indices = (
+                (object_key_hashes // numpy.uint64(number_of_workers)) % numpy.uint64(number_of_spill_partitions)
+            ).astype(numpy.int64)
+            for partition_index, partition_data_frame in reduced_data_frame.groupby(by=partition_indices, sort=False):
+                partition_data_frame.to_csv(
+                    path_or_buf=spill_file_streams[partition_index],
+                    sep="\t",
+                    header=False,
+                    index=False,
+                    columns=["timestamp", "bytes_sent", "ip_address", "object_key"],
+                    date_format=_TIMESTAMP_FORMAT,
+                )
+    finally:
+        for spill_file_stream in spill_file_streams:
+            spill_file_stream.close()
+
+    batch_id = batch_writer.start_batch(reduced_s3_log_files=reduced_s3_log_files)
+
+    # Phase 2: sort and group each partition in memory, then write each object key with a single append
+    for spill_file_path in tqdm.tqdm(
+        iterable=spill_file_paths,
+        total=len(spill_file_paths),
+        desc=f"Binning partitions{worker_description}",
+        position=worker_index,
+        leave=True,
+        mininterval=3.0,
+        smoothing=0,
+        unit="partition",
+    ):
+        if spill_file_path.stat().st_size == 0:
+            continue
+
+        partition_data_frame = _read_s3_log_table(
+            file_path_or_buffer=spill_file_path, names=["timestamp", "bytes_sent", "ip_address", "object_key"]
+        )
+        # The writer sorts the records of each object key by timestamp
+        batch_writer.write(batch_id=batch_id, reduced_data_frame=partition_data_frame)
+        del partition_data_frame
+
+        spill_file_path.unlink()
+
+    batch_writer.commit_batch(batch_id=batch_id)
+
+    shutil.rmtree(path=spill_folder_path)
+
+    return None
+
+
+def _read_owned_reduced_records(
+    *, reduced_s3_log_file: pathlib.Path, worker_index: int, number_of_workers: int
+) -> pandas.DataFrame:
+    """Read a reduced file, keeping only the records of the object keys owned by this worker."""
+    reduced_data_frame = _read_s3_log_table(
+        file_path_or_buffer=reduced_s3_log_file, columns=["timestamp", "ip_address", "object_key", "bytes_sent"]
+    )
+    if number_of_workers == 1:
+        return reduced_data_frame
+
+    object_key_hashes = _get_object_key_hashes(object_keys=reduced_data_frame["object_key"])
+    is_owned = object_key_hashes % numpy.uint64(number_of_workers) == numpy.uint64(worker_index)
+
+    return reduced_data_frame[is_owned]
 
-            data_frame = pandas.DataFrame(data=data)
 
-            header = False if binned_s3_log_file_path.exists() else True
-            data_frame.to_csv(path_or_buf=binned_s3_log_file_path, mode="a", sep="\t", header=header, index=False)
+def _get_object_key_hashes(*, object_keys: pandas.Series) -> numpy.ndarray:
+    """Hash each object key in a way that is stable across processes and calls."""
+    object_key_hashes = pandas.util.hash_pandas_object(obj=object_keys, index=False).to_numpy()
 
-        with open(file=completed_tracking_file_path, mode="a") as io:
-            io.write(f"{reduced_s3_log_file}\n")
+    return object_key_hashes
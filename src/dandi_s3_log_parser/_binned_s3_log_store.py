@@ -0,0 +1,567 @@
+"""Storage of all binned S3 logs in a small number of append-only segment files indexed by object key."""
+
+import collections
+import contextlib
+import io
+import pathlib
+import sqlite3
+from collections.abc import Iterable
+
+import pandas
+from pydantic import DirectoryPath, validate_call
+
+from ._binned_s3_log_writer import (
+    _BINNED_S3_LOG_FILE_SUFFIXES,
+    _BINNED_S3_LOG_HEADER,
+    _get_binned_s3_log_file_path,
+)
+from ._binning_journal import _CatalogEntry, _has_uncommitted_batches, _load_binned_s3_log_catalog
+from ._s3_log_table_reader import _read_s3_log_table
+from ._work_coordination import _hold_lease
+
+_STORE_FOLDER_NAME = "binned_s3_log_store"
+_SMALL_SEGMENT_SIZE_IN_BYTES = 64 * 10**6
+_STORE_LEASE_DURATION_IN_SECONDS = 600
+_INSERT_EXTENT_STATEMENT = (
+    "INSERT INTO extents (object_key, segment_id, byte_offset, byte_length, batch_id) VALUES (?, ?, ?, ?, ?)"
+)
+
+
+class BinnedS3LogStore:
+    @validate_call
+    def __init__(self, *, binned_s3_logs_folder_path: DirectoryPath) -> None:
+        """
+        A single container for the binned S3 logs of all object keys.
+
+        Instead of one file per object key, records are appended to a few segment files and located through a
+        persistent index of (object key, segment, byte offset, byte length) extents.
+        Each call to binning appends one extent per object key it touches; `compact` rewrites the fragmented object keys
+        and small segments so that each object key occupies a single contiguous extent again.
+
+        The store is kept in the `binned_s3_log_store` subfolder of the `binned_s3_logs_folder_path`, which is created
+        if it does not exist.
+
+        Parameters
+        ----------
+        binned_s3_logs_folder_path : DirectoryPath
+            The path to the folder of binned S3 logs.
+        """
+        self.binned_s3_logs_folder_path = binned_s3_logs_folder_path
+        self.store_folder_path = binned_s3_logs_folder_path / _STORE_FOLDER_NAME
+        self.segments_folder_path = self.store_folder_path / "segments"
+        self.segments_folder_path.mkdir(parents=True, exist_ok=True)
+
+        self._connection = sqlite3.connect(
+            database=self.store_folder_path / "index.sqlite", timeout=60.0, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS segments (segment_id INTEGER PRIMARY KEY AUTOINCREMENT, is_retired INTEGER)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS extents ("
+                "extent_id INTEGER PRIMARY KEY AUTOINCREMENT, object_key TEXT, segment_id INTEGER, "
+                "byte_offset INTEGER, byte_length INTEGER, batch_id INTEGER"
+                ")"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS extents_by_object_key ON extents (object_key)")
+
+        self._segment_read_streams: dict[int, io.BufferedReader] = dict()
+        self._write_segment_id: int | None = None
+        self._catalog: dict[str, _CatalogEntry] | None = None
+        self._is_catalog_loaded = False
+
+    @staticmethod
+    def exists(*, binned_s3_logs_folder_path: pathlib.Path) -> bool:
+        """Whether a binned S3 log store has been created in the given folder."""
+        return (binned_s3_logs_folder_path / _STORE_FOLDER_NAME / "index.sqlite").exists()
+
+    def close(self) -> None:
+        self._close_segment_read_streams()
+        self._connection.close()
+
+    def __enter__(self) -> "BinnedS3LogStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __contains__(self, object_key: str) -> bool:
+        catalog = self._get_catalog()
+        if catalog is not None:
+            return object_key in catalog
+
+        cursor = self._connection.execute("SELECT 1 FROM extents WHERE object_key = ? LIMIT 1", (object_key,))
+
+        return cursor.fetchone() is not None
+
+    def get_object_keys(self) -> list[str]:
+        """Get all object keys in the store, in sorted order."""
+        return [
+            object_key
+            for (object_key,) in self._connection.execute("SELECT DISTINCT object_key FROM extents ORDER BY object_key")
+        ]
+
+    def read_bytes(self, *, object_key: str) -> bytes | None:
+        """Read the binned S3 log of an object key as the exact bytes of its TSV file, or None if it has no records."""
+        catalog = self._get_catalog()
+        if catalog is not None and object_key not in catalog:
+            return None
+
+        extents = self._connection.execute(
+            "SELECT segment_id, byte_offset, byte_length FROM extents WHERE object_key = ? ORDER BY extent_id",
+            (object_key,),
+        ).fetchall()
+        if len(extents) == 0:
+            return None
+
+        contents = [_BINNED_S3_LOG_HEADER.encode(encoding="utf-8")]
+        for segment_id, byte_offset, byte_length in extents:
+            segment_read_stream = self._get_segment_read_stream(segment_id=segment_id)
+            segment_read_stream.seek(byte_offset)
+            contents.append(segment_read_stream.read(byte_length))
+
+        return b"".join(contents)
+
+    def get_catalog_entry(self, *, object_key: str) -> _CatalogEntry | None:
+        """
+        Get the summary of the binned S3 log of an object key kept by the binning journal, without reading the log.
+
+        Returns None if the object key has no records, or if the store holds records binned before the journal kept a
+        catalog.
+        """
+        catalog = self._get_catalog()
+        if catalog is None:
+            return None
+
+        return catalog.get(object_key, None)
+
+    def is_time_ordered(self, *, object_key: str) -> bool:
+        """Whether the binned records of an object key are guaranteed to be in timestamp order."""
+        catalog_entry = self.get_catalog_entry(object_key=object_key)
+
+        return catalog_entry is not None and catalog_entry.is_time_ordered
+
+    def get_fingerprint(self, *, object_key: str) -> str | None:
+        """
+        Get a string that changes whenever records are appended to the binned S3 log of an object key.
+
+        Taken from the catalog if there is one, or otherwise from the extents of the object key.
+        Returns None if the object key has no records.
+        """
+        catalog = self._get_catalog()
+        if catalog is not None:
+            return _get_catalog_entry_fingerprint(catalog_entry=catalog.get(object_key, None))
+
+        extents = self._connection.execute(
+            "SELECT segment_id, byte_offset, byte_length FROM extents WHERE object_key = ? ORDER BY extent_id",
+            (object_key,),
+        ).fetchall()
+        if len(extents) == 0:
+            return None
+
+        return "extents:" + ",".join(
+            f"{segment_id}/{byte_offset}/{byte_length}" for segment_id, byte_offset, byte_length in extents
+        )
+
+    def read(self, *, object_key: str, columns: list[str] | None = None) -> pandas.DataFrame | None:
+        """Read the binned S3 log of an object key, or None if it has no records."""
+        content = self.read_bytes(object_key=object_key)
+        if content is None:
+            return None
+
+        return _read_s3_log_table(file_path_or_buffer=io.BytesIO(content), columns=columns)
+
+    @validate_call
+    def export_to_folder(self, *, binned_s3_logs_folder_path: DirectoryPath) -> None:
+        """
+        Write the binned S3 log of every object key to its own file, in the default binned folder layout.
+
+        Parameters
+        ----------
+        binned_s3_logs_folder_path : DirectoryPath
+            The folder to export to. Any existing binned files for the same object keys are overwritten.
+        """
+        created_folder_paths = set()
+        for object_key in self.get_object_keys():
+            binned_s3_log_file_path = _get_binned_s3_log_file_path(
+                object_key=object_key, binned_s3_logs_folder_path=binned_s3_logs_folder_path
+            )
+            if binned_s3_log_file_path.parent not in created_folder_paths:
+                binned_s3_log_file_path.parent.mkdir(parents=True, exist_ok=True)
+                created_folder_paths.add(binned_s3_log_file_path.parent)
+
+            binned_s3_log_file_path.write_bytes(self.read_bytes(object_key=object_key))
+
+    def compact(self, *, small_segment_size_in_bytes: int = _SMALL_SEGMENT_SIZE_IN_BYTES) -> None:
+        """
+        Rewrite the fragmented object keys and the contents of small or sparse segments into a single new segment.
+
+        Only the object keys spread over more than one extent, and those held by segments that are smaller than
+        `small_segment_size_in_bytes` or whose live records take up less than half of their size, are rewritten, each
+        as one contiguous extent. Every other segment is left as it is, so the work done by each call is proportional
+        to what was appended since the last one rather than to the size of the store.
+
+        Binning never compacts the store itself; this should be run on its own, between calls to binning into the same
+        folder, whenever reads have become fragmented. Binning holds a lease on the store for as long as it runs, so
+        this raises a ValueError instead of rewriting or removing the segments it is still appending to. It also raises
+        if an interrupted call to binning left a batch to roll back, since the rewritten extents would no longer be
+        attributed to that batch; binning into the folder again recovers it.
+
+        The new segment is fully written before the index is switched over to it in a single transaction, and the
+        drained segments are only removed afterwards, so an interruption at any point leaves a readable store.
+
+        Parameters
+        ----------
+        small_segment_size_in_bytes : int, default: 64 MB
+            Segments smaller than this are merged into the new segment, even if none of their object keys are
+            fragmented.
+        """
+        with _hold_binned_s3_log_store_lease(binned_s3_logs_folder_path=self.binned_s3_logs_folder_path) as is_claimed:
+            if not is_claimed:
+                message = (
+                    f"The binned S3 log store in '{self.binned_s3_logs_folder_path}' is in use by another call to "
+                    "binning or compaction!"
+                )
+                raise ValueError(message)
+            if _has_uncommitted_batches(binned_s3_logs_folder_path=self.binned_s3_logs_folder_path):
+                message = (
+                    f"An interrupted call to binning left a batch to roll back in '{self.binned_s3_logs_folder_path}'! "
+                    "Please bin into this folder again to recover it before compacting."
+                )
+                raise ValueError(message)
+
+            self._compact(small_segment_size_in_bytes=small_segment_size_in_bytes)
+
+    def _compact(self, *, small_segment_size_in_bytes: int) -> None:
+        self._remove_unreferenced_segment_files()
+
+        extents_by_object_key: dict[str, list[tuple[int, int, int, int]]] = collections.defaultdict(list)
+        live_bytes_by_segment_id: dict[int, int] = collections.defaultdict(int)
+        for extent_id, object_key, segment_id, byte_offset, byte_length in self._connection.execute(
+            "SELECT extent_id, object_key, segment_id, byte_offset, byte_length FROM extents ORDER BY extent_id"
+        ):
+            extents_by_object_key[object_key].append((extent_id, segment_id, byte_offset, byte_length))
+            live_bytes_by_segment_id[segment_id] += byte_length
+
+        segment_sizes = {
+            segment_id: self._get_segment_file_path(segment_id=segment_id).stat().st_size
+            for segment_id in live_bytes_by_segment_id
+        }
+        small_segment_ids = {
+            segment_id
+            for segment_id, segment_size in segment_sizes.items()
+            if segment_size < small_segment_size_in_bytes
+        }
+        sparse_segment_ids = {
+            segment_id
+            for segment_id, segment_size in segment_sizes.items()
+            if 2 * live_bytes_by_segment_id[segment_id] < segment_size
+        }
+        fragmented_object_keys = {
+            object_key for object_key, extents in extents_by_object_key.items() if len(extents) > 1
+        }
+
+        # A single small segment gains nothing from being copied on its own
+        if len(fragmented_object_keys) == 0 and len(sparse_segment_ids) == 0 and len(small_segment_ids) <= 1:
+            return None
+
+        drained_segment_ids = small_segment_ids | sparse_segment_ids
+        object_keys_to_rewrite = sorted(
+            object_key
+            for object_key, extents in extents_by_object_key.items()
+            if object_key in fragmented_object_keys
+            or any(segment_id in drained_segment_ids for _, segment_id, _, _ in extents)
+        )
+
+        compacted_segment_id, compacted_segment_file_path = self._create_segment(is_retired=True)
+
+        compacted_extents = []
+        rewritten_extent_ids = []
+        byte_offset = 0
+        with compacted_segment_file_path.open(mode="ab") as segment_write_stream:
+            for object_key in object_keys_to_rewrite:
+                extents = extents_by_object_key[object_key]
+                for _, segment_id, extent_byte_offset, byte_length in extents:
+                    segment_read_stream = self._get_segment_read_stream(segment_id=segment_id)
+                    segment_read_stream.seek(extent_byte_offset)
+                    segment_write_stream.write(segment_read_stream.read(byte_length))
+
+                # The new extent takes the place of the first one, so it still comes before any appended since
+                byte_length = sum(byte_length for _, _, _, byte_length in extents)
+                compacted_extents.append(
+                    (extents[0][0], object_key, compacted_segment_id, byte_offset, byte_length, None)
+                )
+                rewritten_extent_ids.extend((extent_id,) for extent_id, _, _, _ in extents)
+                byte_offset += byte_length
+
+        self._close_segment_read_streams()
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.executemany("DELETE FROM extents WHERE extent_id = ?", rewritten_extent_ids)
+            self._connection.executemany(
+                "INSERT INTO extents (extent_id, object_key, segment_id, byte_offset, byte_length, batch_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                compacted_extents,
+            )
+            self._connection.execute("UPDATE segments SET is_retired = 0 WHERE segment_id = ?", (compacted_segment_id,))
+            self._connection.executemany(
+                "UPDATE segments SET is_retired = 1 WHERE segment_id = ? "
+                "AND NOT EXISTS (SELECT 1 FROM extents WHERE extents.segment_id = segments.segment_id)",
+                ((segment_id,) for segment_id in live_bytes_by_segment_id),
+            )
+
+        self._remove_unreferenced_segment_files()
+
+        return None
+
+    def _get_catalog(self) -> dict[str, _CatalogEntry] | None:
+        if not self._is_catalog_loaded:
+            self._catalog = _load_binned_s3_log_catalog(binned_s3_logs_folder_path=self.binned_s3_logs_folder_path)
+            self._is_catalog_loaded = True
+
+        return self._catalog
+
+    def _get_segment_file_path(self, *, segment_id: int) -> pathlib.Path:
+        return self.segments_folder_path / f"segment_{segment_id:06d}.tsv"
+
+    def _get_segment_read_stream(self, *, segment_id: int) -> io.BufferedReader:
+        if segment_id not in self._segment_read_streams:
+            segment_file_path = self._get_segment_file_path(segment_id=segment_id)
+            self._segment_read_streams[segment_id] = segment_file_path.open(mode="rb")
+
+        return self._segment_read_streams[segment_id]
+
+    def _close_segment_read_streams(self) -> None:
+        for segment_read_stream in self._segment_read_streams.values():
+            segment_read_stream.close()
+        self._segment_read_streams.clear()
+
+    def _create_segment(self, *, is_retired: bool = False) -> tuple[int, pathlib.Path]:
+        """Register and create a new, empty segment file, returning its ID and path."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            cursor = self._connection.execute("INSERT INTO segments (is_retired) VALUES (?)", (int(is_retired),))
+        segment_id = cursor.lastrowid
+
+        segment_file_path = self._get_segment_file_path(segment_id=segment_id)
+        segment_file_path.touch()
+
+        return segment_id, segment_file_path
+
+    def _remove_unreferenced_segment_files(self) -> None:
+        live_segment_file_paths = {
+            self._get_segment_file_path(segment_id=segment_id)
+            for (segment_id,) in self._connection.execute("SELECT segment_id FROM segments WHERE is_retired = 0")
+        }
+        for segment_file_path in self.segments_folder_path.iterdir():
+            if segment_file_path not in live_segment_file_paths:
+                segment_file_path.unlink()
+
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.execute("DELETE FROM segments WHERE is_retired = 1")
+
+    def _get_write_segment_file_path(self) -> pathlib.Path:
+        """
+        Get the path to the segment this instance appends to, creating it on first use.
+
+        Each writing process gets its own segment, so concurrent workers never append to the same file.
+        """
+        if self._write_segment_id is None:
+            self._write_segment_id, _ = self._create_segment()
+
+        return self._get_segment_file_path(segment_id=self._write_segment_id)
+
+    def _append(self, *, batch_id: int, contents: Iterable[tuple[str, bytes]]) -> dict[str, int]:
+        """
+        Append the content of each object key to the end of a segment, then index them in a single transaction.
+
+        Returns the number of bytes appended for each object key.
+        """
+        segment_file_path = self._get_write_segment_file_path()
+        segment_id = self._write_segment_id
+
+        extents = []
+        with segment_file_path.open(mode="ab") as segment_write_stream:
+            byte_offset = segment_write_stream.tell()
+            for object_key, content in contents:
+                segment_write_stream.write(content)
+                extents.append((object_key, segment_id, byte_offset, len(content), batch_id))
+                byte_offset += len(content)
+
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.executemany(
+                _INSERT_EXTENT_STATEMENT,
+                extents,
+            )
+
+        return {object_key: byte_length for object_key, _, _, byte_length, _ in extents}
+
+    def _discard_batch(self, batch_id: int) -> None:
+        """Remove the extents written by a batch that is being rolled back."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.execute("DELETE FROM extents WHERE batch_id = ?", (batch_id,))
+
+
+class _BinnedS3LogFolderReader:
+    def __init__(self, *, binned_s3_logs_folder_path: pathlib.Path) -> None:
+        """
+        Read binned S3 logs from the default layout of one file per object key, with the same API as the store.
+
+        Files compressed during binning are decompressed transparently.
+        """
+        self.binned_s3_logs_folder_path = binned_s3_logs_folder_path
+
+        self._catalog: dict[str, _CatalogEntry] | None = None
+        self._is_catalog_loaded = False
+
+    def close(self) -> None:
+        pass
+
+    def get_catalog_entry(self, *, object_key: str) -> _CatalogEntry | None:
+        catalog = self._get_catalog()
+        if catalog is None:
+            return None
+
+        return catalog.get(object_key, None)
+
+    def is_time_ordered(self, *, object_key: str) -> bool:
+        catalog_entry = self.get_catalog_entry(object_key=object_key)
+
+        return catalog_entry is not None and catalog_entry.is_time_ordered
+
+    def get_fingerprint(self, *, object_key: str) -> str | None:
+        """
+        Get a string that changes whenever records are appended to the binned S3 log of an object key.
+
+        Taken from the catalog if there is one, or otherwise from the size and modification time of the binned file.
+        Returns None if the object key has no records.
+        """
+        catalog = self._get_catalog()
+        if catalog is not None:
+            return _get_catalog_entry_fingerprint(catalog_entry=catalog.get(object_key, None))
+
+        binned_s3_log_file_path = self._find_binned_s3_log_file_path(object_key=object_key)
+        if binned_s3_log_file_path is None:
+            return None
+
+        file_stat = binned_s3_log_file_path.stat()
+
+        return f"file:{binned_s3_log_file_path.name}:{file_stat.st_size}:{file_stat.st_mtime_ns}"
+
+    def __contains__(self, object_key: str) -> bool:
+        catalog = self._get_catalog()
+        if catalog is not None:
+            return object_key in catalog
+
+        return self._find_binned_s3_log_file_path(object_key=object_key) is not None
+
+    def get_object_keys(self) -> list[str]:
+        catalog = self._get_catalog()
+        if catalog is not None:
+            return sorted(catalog)
+
+        # Every object key is nested at least one folder deep, unlike the other files kept in the binned folder
+        object_keys = set()
+        for suffix in _BINNED_S3_LOG_FILE_SUFFIXES.values():
+            for binned_s3_log_file_path in self.binned_s3_logs_folder_path.rglob(f"*{suffix}"):
+                relative_file_path = binned_s3_log_file_path.relative_to(self.binned_s3_logs_folder_path)
+                if relative_file_path.parent != pathlib.Path("."):
+                    object_keys.add(relative_file_path.as_posix().removesuffix(suffix))
+
+        return sorted(object_keys)
+
+    def read(self, *, object_key: str, columns: list[str] | None = None) -> pandas.DataFrame | None:
+        # Most assets were never downloaded, so avoid probing the file system for each of them when possible
+        catalog = self._get_catalog()
+        if catalog is not None and object_key not in catalog:
+            return None
+
+        binned_s3_log_file_path = self._find_binned_s3_log_file_path(object_key=object_key)
+        if binned_s3_log_file_path is None:
+            return None
+
+        # The compression is inferred from the suffix of the file
+        return _read_s3_log_table(file_path_or_buffer=binned_s3_log_file_path, columns=columns)
+
+    def _get_catalog(self) -> dict[str, _CatalogEntry] | None:
+        if not self._is_catalog_loaded:
+            self._catalog = _load_binned_s3_log_catalog(binned_s3_logs_folder_path=self.binned_s3_logs_folder_path)
+            self._is_catalog_loaded = True
+
+        return self._catalog
+
+    def _find_binned_s3_log_file_path(self, *, object_key: str) -> pathlib.Path | None:
+        for compression in _BINNED_S3_LOG_FILE_SUFFIXES:
+            binned_s3_log_file_path = _get_binned_s3_log_file_path(
+                object_key=object_key,
+                binned_s3_logs_folder_path=self.binned_s3_logs_folder_path,
+                compression=compression,
+            )
+            if binned_s3_log_file_path.exists():
+                return binned_s3_log_file_path
+
+        return None
+
+
+@validate_call
+def compact_binned_s3_log_store(
+    *,
+    binned_s3_logs_folder_path: DirectoryPath,
+    small_segment_size_in_bytes: int = _SMALL_SEGMENT_SIZE_IN_BYTES,
+) -> None:
+    """
+    Compact the binned S3 log store in a folder, rewriting only its fragmented object keys and small segments.
+
+    Binning never compacts the store, so that it spends no time rewriting logs; this is meant to be run on its own,
+    between calls to binning into the same folder. It raises a ValueError while a call to binning is still running, or
+    if an interrupted one has not been recovered yet.
+
+    Parameters
+    ----------
+    binned_s3_logs_folder_path : DirectoryPath
+        The path to the folder of binned S3 logs, which must have been binned with `storage="store"`.
+    small_segment_size_in_bytes : int, default: 64 MB
+        Segments smaller than this are merged together, even if none of their object keys are fragmented.
+    """
+    if not BinnedS3LogStore.exists(binned_s3_logs_folder_path=binned_s3_logs_folder_path):
+        message = f"No binned S3 log store was found in '{binned_s3_logs_folder_path}'!"
+        raise ValueError(message)
+
+    with BinnedS3LogStore(binned_s3_logs_folder_path=binned_s3_logs_folder_path) as binned_s3_log_store:
+        binned_s3_log_store.compact(small_segment_size_in_bytes=small_segment_size_in_bytes)
+
+    return None
+
+
+def _hold_binned_s3_log_store_lease(
+    *, binned_s3_logs_folder_path: pathlib.Path
+) -> contextlib.AbstractContextManager[bool]:
+    """Claim the store in a folder for a single call to binning or compaction at a time."""
+    return _hold_lease(
+        leases_folder_path=binned_s3_logs_folder_path / _STORE_FOLDER_NAME,
+        relative_file_path=pathlib.Path("store"),
+        lease_duration_in_seconds=_STORE_LEASE_DURATION_IN_SECONDS,
+    )
+
+
+def _get_catalog_entry_fingerprint(*, catalog_entry: _CatalogEntry | None) -> str | None:
+    if catalog_entry is None:
+        return None
+
+    return f"catalog:{catalog_entry.number_of_rows}:{catalog_entry.size_in_bytes}:{catalog_entry.last_batch_id}"
+
+
+def _get_binned_s3_log_reader(
+    *, binned_s3_logs_folder_path: pathlib.Path
+) -> BinnedS3LogStore | _BinnedS3LogFolderReader:
+    """Get a reader for the binned S3 logs in a folder, from the store if one was created there."""
+    if BinnedS3LogStore.exists(binned_s3_logs_folder_path=binned_s3_logs_folder_path):
+        return BinnedS3LogStore(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+
+    return _BinnedS3LogFolderReader(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
@@ -0,0 +1,126 @@
+"""Efficient writing of reduced records to the binned file of each object key."""
+
+import gzip
+import pathlib
+from collections.abc import Iterator
+from typing import Literal
+
+import numpy
+import pandas
+
+from ._s3_log_table_reader import _format_timestamps
+
+_BINNED_S3_LOG_HEADER = "timestamp\tbytes_sent\tip_address\n"
+_DICTIONARY_ENCODED_BINNED_S3_LOG_HEADER = "timestamp\tbytes_sent\tip_id\n"
+_BINNED_S3_LOG_FILE_SUFFIXES = {"none": ".tsv", "gzip": ".tsv.gz"}
+_GZIP_COMPRESSION_LEVEL = 6
+
+
+def _write_binned_s3_logs(
+    *,
+    reduced_data_frame: pandas.DataFrame,
+    binned_s3_logs_folder_path: pathlib.Path,
+    created_folder_paths: set[pathlib.Path] | None = None,
+    compression: Literal["none", "gzip"] = "none",
+) -> dict[str, int]:
+    """
+    Append the records of each object key in a reduced data frame to the binned file of that object key.
+
+    Rather than grouping into a new data frame per object key, the records are sorted once by object key and then
+    by timestamp (stably, so records with the same timestamp keep their existing order), every row is formatted to a
+    TSV line in a single vectorized pass, and the contiguous range of lines for each key is written with a single
+    append.
+
+    Parameters
+    ----------
+    reduced_data_frame : pandas.DataFrame
+        The reduced records, with at least the columns "object_key", "timestamp", "bytes_sent", and either
+        "ip_address" or, for IP addresses encoded by a dictionary, their integer "ip_id".
+    binned_s3_logs_folder_path : pathlib.Path
+        The path to the folder of binned S3 log files.
+    created_folder_paths : set of pathlib.Path, optional
+        The folders already known to exist, used to avoid repeated calls to `mkdir`.
+        Updated in place with any new folders created, so the same set may be passed across calls.
+    compression : "none" or "gzip", default: "none"
+        If "gzip", each append is written as its own gzip member to a `.tsv.gz` file.
+        A sequence of gzip members is itself a valid gzip file, so appending never requires rewriting the file.
+
+    Returns
+    -------
+    appended_sizes_in_bytes : dict of str to int
+        The number of bytes appended to the binned file of each object key, including any header.
+    """
+    created_folder_paths = created_folder_paths if created_folder_paths is not None else set()
+    header = (
+        _DICTIONARY_ENCODED_BINNED_S3_LOG_HEADER if "ip_id" in reduced_data_frame.columns else _BINNED_S3_LOG_HEADER
+    )
+
+    appended_sizes_in_bytes = dict()
+
+    for object_key, content in _iterate_binned_s3_log_contents(reduced_data_frame=reduced_data_frame):
+        binned_s3_log_file_path = _get_binned_s3_log_file_path(
+            object_key=object_key, binned_s3_logs_folder_path=binned_s3_logs_folder_path, compression=compression
+        )
+
+        binned_s3_log_folder_path = binned_s3_log_file_path.parent
+        if binned_s3_log_folder_path not in created_folder_paths:
+            binned_s3_log_folder_path.mkdir(parents=True, exist_ok=True)
+            created_folder_paths.add(binned_s3_log_folder_path)
+
+        with open(file=binned_s3_log_file_path, mode="ab") as io:
+            # The position of a fresh append stream is the current size of the file, so no separate stat is needed
+            if io.tell() == 0:
+                content = header.encode(encoding="utf-8") + content
+            if compression == "gzip":
+                content = gzip.compress(data=content, compresslevel=_GZIP_COMPRESSION_LEVEL, mtime=0)
+            io.write(content)
+        appended_sizes_in_bytes[object_key] = len(content)
+
+    return appended_sizes_in_bytes
+
+
+def _iterate_binned_s3_log_contents(*, reduced_data_frame: pandas.DataFrame) -> Iterator[tuple[str, bytes]]:
+    """
+    Yield each object key in sorted order along with the encoded lines (without header) of all its records.
+
+    The lines of each object key are in timestamp order.
+    """
+    number_of_rows = len(reduced_data_frame)
+    if number_of_rows == 0:
+        return
+
+    object_keys = reduced_data_frame["object_key"].to_numpy(dtype=object)
+    # The last key given to `lexsort` is the primary one
+    sorting_indices = numpy.lexsort(keys=(reduced_data_frame["timestamp"].to_numpy(), object_keys))
+    sorted_object_keys = object_keys[sorting_indices]
+
+    lines = (
+        pandas.Series(
+            data=_format_timestamps(timestamps=reduced_data_frame["timestamp"]), index=reduced_data_frame.index
+        )
+        + "\t"
+        + reduced_data_frame["bytes_sent"].astype(str)
+        + "\t"
+        + reduced_data_frame["ip_id" if "ip_id" in reduced_data_frame.columns else "ip_address"].astype(str)
+        + "\n"
+    ).to_numpy()[sorting_indices]
+
+    key_start_indices = numpy.flatnonzero(sorted_object_keys[1:] != sorted_object_keys[:-1]) + 1
+    slice_starts = numpy.concatenate(([0], key_start_indices)).tolist()
+    slice_ends = numpy.concatenate((key_start_indices, [number_of_rows])).tolist()
+
+    for slice_start, slice_end in zip(slice_starts, slice_ends):
+        yield sorted_object_keys[slice_start], "".join(lines[slice_start:slice_end]).encode(encoding="utf-8")
+
+
+def _get_binned_s3_log_file_path(
+    *,
+    object_key: str,
+    binned_s3_logs_folder_path: pathlib.Path,
+    compression: Literal["none", "gzip"] = "none",
+) -> pathlib.Path:
+    object_key_as_path = pathlib.Path(object_key)
+    file_name = f"{object_key_as_path.name}{_BINNED_S3_LOG_FILE_SUFFIXES[compression]}"
+    binned_s3_log_file_path = binned_s3_logs_folder_path / object_key_as_path.parent / file_name
+
+    return binned_s3_log_file_path
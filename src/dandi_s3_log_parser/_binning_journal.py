@@ -0,0 +1,385 @@
+"""A transactional journal of the batches written by the binning process, used to recover from interruptions."""
+
+import os
+import pathlib
+import re
+import sqlite3
+import typing
+from collections.abc import Callable, Iterable
+
+import numpy
+
+_JOURNAL_FILE_NAME = "binning_journal.sqlite"
+_CATALOG_COLUMNS = (
+    "number_of_rows, size_in_bytes, first_timestamp, last_timestamp, total_bytes_sent, last_batch_id, is_time_ordered"
+)
+_LEGACY_TRACKING_FILE_PATTERN = re.compile(
+    pattern=r"binned_log_file_paths_(started|completed)(?:_worker_(\d+)_of_(\d+))?\.txt"
+)
+
+
+class _CatalogEntry(typing.NamedTuple):
+    number_of_rows: int
+    size_in_bytes: int
+    first_timestamp: str
+    last_timestamp: str
+    total_bytes_sent: int
+    last_batch_id: int
+    is_time_ordered: bool
+
+
+def _get_catalog_entries(*, connection: sqlite3.Connection) -> dict[str, _CatalogEntry]:
+    return {
+        row[0]: _CatalogEntry(*row[1:-1], is_time_ordered=bool(row[-1]))
+        for row in connection.execute(f"SELECT object_key, {_CATALOG_COLUMNS} FROM catalog")
+    }
+
+
+class _BinningJournal:
+    def __init__(self, *, binned_s3_logs_folder_path: pathlib.Path) -> None:
+        """
+        Record which reduced files and which binned files are touched by each batch of the binning process.
+
+        The journal also keeps a catalog of every binned object key, with its number of rows, size on disk, first and
+        last timestamps, total bytes sent, the last batch that appended to it, and whether its binned records are
+        guaranteed to be in timestamp order. When binning with `ip_address_encoding="dictionary"`, it also keeps the
+        dictionary of the integer ID of every IP address.
+
+        Before any record of a batch is appended, the journal stores the length of every binned file the batch is about
+        to touch. Once all of them have been written, the batch is committed along with the reduced files it contained.
+        If the process is interrupted in between, `recover` truncates the binned files back to their recorded lengths,
+        so the reduced files of that batch can simply be binned again.
+
+        Parameters
+        ----------
+        binned_s3_logs_folder_path : pathlib.Path
+            The path to the folder of binned S3 log files, where the journal is kept.
+        """
+        self.binned_s3_logs_folder_path = binned_s3_logs_folder_path
+
+        # Each worker process opens its own connection; write-ahead logging lets them commit concurrently
+        self._connection = sqlite3.connect(
+            database=binned_s3_logs_folder_path / _JOURNAL_FILE_NAME, timeout=60.0, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=FULL")
+        with self._transaction():
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "batch_id INTEGER PRIMARY KEY, worker_index INTEGER, number_of_workers INTEGER, is_committed INTEGER"
+                ")"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS batch_reduced_files (batch_id INTEGER, reduced_s3_log_file_path TEXT)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS batch_binned_file_lengths ("
+                "batch_id INTEGER, relative_binned_s3_log_file_path TEXT, length_in_bytes INTEGER"
+                ")"
+            )
+            self._connection.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS catalog ("
+                "object_key TEXT PRIMARY KEY, number_of_rows INTEGER, size_in_bytes INTEGER, first_timestamp TEXT, "
+                "last_timestamp TEXT, total_bytes_sent INTEGER, last_batch_id INTEGER, is_time_ordered INTEGER"
+                ")"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS ip_addresses (ip_id INTEGER PRIMARY KEY, ip_address TEXT NOT NULL UNIQUE)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS batch_binned_file_lengths_by_batch ON batch_binned_file_lengths (batch_id)"
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _transaction(self) -> sqlite3.Connection:
+        # The connection context manager commits on success and rolls back on error, but needs an explicit BEGIN
+        # since the connection is in autocommit mode
+        self._connection.execute("BEGIN IMMEDIATE")
+        return self._connection
+
+    def initialize_setting(self, *, name: str, value: str) -> None:
+        """Record a setting only if it has not been recorded by a previous call."""
+        with self._transaction():
+            self._connection.execute("INSERT OR IGNORE INTO settings (name, value) VALUES (?, ?)", (name, value))
+
+    def check_setting(self, *, name: str, value: str) -> None:
+        """
+        Record a setting that must stay the same across every call binning into this folder.
+
+        Raises a ValueError if the setting was previously recorded with a different value.
+        """
+        with self._transaction():
+            recorded_value = self._connection.execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+            if recorded_value is None:
+                self._connection.execute("INSERT INTO settings (name, value) VALUES (?, ?)", (name, value))
+
+        if recorded_value is not None and recorded_value[0] != value:
+            raise ValueError(
+                f"This binned folder was previously written with `{name}={recorded_value[0]!r}`! "
+                f"Please use a different folder to bin with `{name}={value!r}`."
+            )
+
+    def recover(self, *, on_rollback: Callable[[int], None] | None = None) -> int:
+        """
+        Roll back every batch that was started but never committed.
+
+        Parameters
+        ----------
+        on_rollback : callable, optional
+            Called with the ID of each batch after its binned files have been truncated, but before the batch is
+            removed from the journal, so that any other record of the batch can be discarded as well.
+
+        Returns
+        -------
+        int
+            The number of batches rolled back.
+        """
+        uncommitted_batch_ids = [
+            batch_id for (batch_id,) in self._connection.execute("SELECT batch_id FROM batches WHERE is_committed = 0")
+        ]
+
+        for batch_id in uncommitted_batch_ids:
+            binned_file_lengths = self._connection.execute(
+                "SELECT relative_binned_s3_log_file_path, length_in_bytes FROM batch_binned_file_lengths "
+                "WHERE batch_id = ?",
+                (batch_id,),
+            ).fetchall()
+            for relative_binned_s3_log_file_path, length_in_bytes in binned_file_lengths:
+                binned_s3_log_file_path = self.binned_s3_logs_folder_path / relative_binned_s3_log_file_path
+                if not binned_s3_log_file_path.exists():
+                    continue
+
+                # Files created by the batch are removed entirely so that their header is written again next time
+                if length_in_bytes is None:
+                    binned_s3_log_file_path.unlink()
+                else:
+                    os.truncate(path=binned_s3_log_file_path, length=length_in_bytes)
+
+            if on_rollback is not None:
+                on_rollback(batch_id)
+
+            with self._transaction():
+                self._connection.execute("DELETE FROM batch_binned_file_lengths WHERE batch_id = ?", (batch_id,))
+                self._connection.execute("DELETE FROM batch_reduced_files WHERE batch_id = ?", (batch_id,))
+                self._connection.execute("DELETE FROM batches WHERE batch_id = ?", (batch_id,))
+
+        return len(uncommitted_batch_ids)
+
+    def import_legacy_tracking_files(self) -> None:
+        """
+        Import the text files used to track the binning process before the journal, then remove them.
+
+        Raises the same errors as before if the text files show the binning process was interrupted, since there is no
+        record of which binned files were touched.
+        """
+        tracking_file_paths_by_worker = dict()
+        for tracking_file_path in self.binned_s3_logs_folder_path.glob(pattern="binned_log_file_paths_*.txt"):
+            match = _LEGACY_TRACKING_FILE_PATTERN.fullmatch(tracking_file_path.name)
+            if match is None:
+                continue
+
+            stage, worker_index, number_of_workers = match.groups()
+            worker = (int(worker_index or 0), int(number_of_workers or 1))
+            tracking_file_paths_by_worker.setdefault(worker, dict())[stage] = tracking_file_path
+
+        for (worker_index, number_of_workers), tracking_file_paths in tracking_file_paths_by_worker.items():
+            if len(tracking_file_paths) != 2:
+                raise FileNotFoundError(
+                    "One of the tracking files is missing, indicating corruption in the binning process. "
+                    "Please clean the binning directory and re-run this function."
+                )
+
+            with open(file=tracking_file_paths["started"], mode="r") as io:
+                started = set(path.rstrip("\n") for path in io.readlines())
+            with open(file=tracking_file_paths["completed"], mode="r") as io:
+                completed = set(path.rstrip("\n") for path in io.readlines())
+
+            if started != completed:
+                raise ValueError(
+                    "The tracking files do not agree on the state of the binning process. "
+                    "Please clean the binning directory and re-run this function."
+                )
+
+            batch_id = self.start_batch(
+                reduced_s3_log_files=completed, worker_index=worker_index, number_of_workers=number_of_workers
+            )
+            self.commit_batch(batch_id=batch_id)
+
+            for tracking_file_path in tracking_file_paths.values():
+                tracking_file_path.unlink()
+
+    def get_completed_reduced_s3_log_files(self, *, worker_index: int, number_of_workers: int) -> set[str]:
+        """
+        Get the reduced files whose records owned by the given worker have all been binned.
+
+        Files binned by a different number of workers count only if every one of those workers completed them,
+        since the object keys would otherwise be owned differently.
+        """
+        completed_by_worker_by_number_of_workers = dict()
+        for reduced_s3_log_file_path, batch_worker_index, batch_number_of_workers in self._connection.execute(
+            "SELECT batch_reduced_files.reduced_s3_log_file_path, batches.worker_index, batches.number_of_workers "
+            "FROM batch_reduced_files JOIN batches ON batch_reduced_files.batch_id = batches.batch_id "
+            "WHERE batches.is_committed = 1"
+        ):
+            completed_by_worker = completed_by_worker_by_number_of_workers.setdefault(
+                batch_number_of_workers, [set() for _ in range(batch_number_of_workers)]
+            )
+            completed_by_worker[batch_worker_index].add(reduced_s3_log_file_path)
+
+        completed = set()
+        for batch_number_of_workers, completed_by_worker in completed_by_worker_by_number_of_workers.items():
+            if batch_number_of_workers == number_of_workers:
+                completed |= completed_by_worker[worker_index]
+                continue
+
+            completed_by_all_workers = set.intersection(*completed_by_worker)
+            if any(len(worker_completed) != len(completed_by_all_workers) for worker_completed in completed_by_worker):
+                raise ValueError(
+                    f"A previous binning process using {batch_number_of_workers} workers did not finish. "
+                    f"Please re-run this function with `maximum_number_of_workers={batch_number_of_workers}`."
+                )
+            completed |= completed_by_all_workers
+
+        return completed
+
+    def start_batch(
+        self, *, reduced_s3_log_files: Iterable[str | pathlib.Path], worker_index: int, number_of_workers: int
+    ) -> int:
+        """Open a new batch containing the given reduced files and return its ID."""
+        with self._transaction():
+            cursor = self._connection.execute(
+                "INSERT INTO batches (worker_index, number_of_workers, is_committed) VALUES (?, ?, 0)",
+                (worker_index, number_of_workers),
+            )
+            batch_id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO batch_reduced_files (batch_id, reduced_s3_log_file_path) VALUES (?, ?)",
+                ((batch_id, str(reduced_s3_log_file)) for reduced_s3_log_file in reduced_s3_log_files),
+            )
+
+        return batch_id
+
+    def record_binned_file_lengths(self, *, batch_id: int, binned_s3_log_file_paths: Iterable[pathlib.Path]) -> None:
+        """Record the current length of each binned file before the batch appends to it."""
+        binned_file_lengths = []
+        for binned_s3_log_file_path in binned_s3_log_file_paths:
+            try:
+                length_in_bytes = binned_s3_log_file_path.stat().st_size
+            except FileNotFoundError:
+                length_in_bytes = None
+
+            relative_binned_s3_log_file_path = binned_s3_log_file_path.relative_to(self.binned_s3_logs_folder_path)
+            binned_file_lengths.append((batch_id, str(relative_binned_s3_log_file_path), length_in_bytes))
+
+        with self._transaction():
+            self._connection.executemany(
+                "INSERT INTO batch_binned_file_lengths "
+                "(batch_id, relative_binned_s3_log_file_path, length_in_bytes) VALUES (?, ?, ?)",
+                binned_file_lengths,
+            )
+
+    def get_catalog(self) -> dict[str, _CatalogEntry]:
+        """Get the catalog entry of every binned object key."""
+        return _get_catalog_entries(connection=self._connection)
+
+    def get_ip_ids(self, *, ip_addresses: list[str]) -> list[int]:
+        """
+        Get the integer ID of each IP address, adding any new IP addresses to the dictionary.
+
+        New IP addresses are committed right away, before any binned file refers to them, and are kept even if the
+        batch that added them is rolled back; an unused ID is harmless.
+        """
+        with self._transaction():
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO ip_addresses (ip_address) VALUES (?)",
+                ((ip_address,) for ip_address in ip_addresses),
+            )
+        ip_ids = [
+            self._connection.execute("SELECT ip_id FROM ip_addresses WHERE ip_address = ?", (ip_address,)).fetchone()[0]
+            for ip_address in ip_addresses
+        ]
+
+        return ip_ids
+
+    def commit_batch(self, *, batch_id: int, catalog_entries: Iterable[tuple[str, _CatalogEntry]] = ()) -> None:
+        """
+        Mark the batch as fully written; its recorded lengths are no longer needed.
+
+        The new catalog entry of each object key touched by the batch is recorded in the same transaction.
+        """
+        with self._transaction():
+            self._connection.execute("UPDATE batches SET is_committed = 1 WHERE batch_id = ?", (batch_id,))
+            self._connection.execute("DELETE FROM batch_binned_file_lengths WHERE batch_id = ?", (batch_id,))
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO catalog (object_key, {_CATALOG_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((object_key, *catalog_entry) for object_key, catalog_entry in catalog_entries),
+            )
+
+
+def _load_binned_s3_log_catalog(*, binned_s3_logs_folder_path: pathlib.Path) -> dict[str, _CatalogEntry] | None:
+    """
+    Load the catalog entry of every binned object key without writing anything.
+
+    Returns None if the folder holds binned logs that are not all in the catalog, such as those binned before the
+    journal kept one.
+    """
+    journal_file_path = binned_s3_logs_folder_path / _JOURNAL_FILE_NAME
+    if not journal_file_path.exists():
+        return None
+
+    connection = sqlite3.connect(database=f"{journal_file_path.as_uri()}?mode=ro", uri=True)
+    try:
+        is_catalog_complete = connection.execute(
+            "SELECT value FROM settings WHERE name = 'is_catalog_complete'"
+        ).fetchone()
+        if is_catalog_complete is None or is_catalog_complete[0] != "true":
+            return None
+
+        return _get_catalog_entries(connection=connection)
+    finally:
+        connection.close()
+
+
+def _load_ip_address_dictionary(*, binned_s3_logs_folder_path: pathlib.Path) -> numpy.ndarray | None:
+    """
+    Load the dictionary of the IP addresses of logs binned with `ip_address_encoding="dictionary"`, without writing.
+
+    The IP address of each integer ID is at that position of the array; unused positions hold None.
+    Returns None if the IP addresses of the folder are not dictionary encoded.
+    """
+    journal_file_path = binned_s3_logs_folder_path / _JOURNAL_FILE_NAME
+    if not journal_file_path.exists():
+        return None
+
+    connection = sqlite3.connect(database=f"{journal_file_path.as_uri()}?mode=ro", uri=True)
+    try:
+        ip_address_encoding = connection.execute(
+            "SELECT value FROM settings WHERE name = 'ip_address_encoding'"
+        ).fetchone()
+        if ip_address_encoding is None or ip_address_encoding[0] != "dictionary":
+            return None
+
+        (maximum_ip_id,) = connection.execute("SELECT COALESCE(MAX(ip_id), 0) FROM ip_addresses").fetchone()
+        ip_address_dictionary = numpy.full(shape=maximum_ip_id + 1, fill_value=None, dtype=object)
+        for ip_id, ip_address in connection.execute("SELECT ip_id, ip_address FROM ip_addresses"):
+            ip_address_dictionary[ip_id] = ip_address
+
+        return ip_address_dictionary
+    finally:
+        connection.close()
+
+
+def _has_uncommitted_batches(*, binned_s3_logs_folder_path: pathlib.Path) -> bool:
+    """Whether an interrupted call to binning left a batch that the next call still has to roll back."""
+    journal_file_path = binned_s3_logs_folder_path / _JOURNAL_FILE_NAME
+    if not journal_file_path.exists():
+        return False
+
+    connection = sqlite3.connect(database=f"{journal_file_path.as_uri()}?mode=ro", uri=True)
+    try:
+        return connection.execute("SELECT 1 FROM batches WHERE is_committed = 0 LIMIT 1").fetchone() is not None
+    finally:
+        connection.close()
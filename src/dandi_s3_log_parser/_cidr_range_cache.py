@@ -0,0 +1,183 @@
+"""Persistent snapshots of the address ranges published by known services, shared across calls and processes."""
+
+import datetime
+import json
+import os
+import pathlib
+import shutil
+
+import requests
+
+from ._config import _CIDR_RANGE_CACHE_FOLDER_PATH
+from ._globals import _KNOWN_SERVICES
+
+_CIDR_RANGE_CACHE_FORMAT_VERSION = 1
+_CIDR_RANGE_CACHE_TIME_TO_LIVE = datetime.timedelta(days=1)
+_MAXIMUM_NUMBER_OF_CIDR_RANGE_SNAPSHOTS = 10
+_SNAPSHOT_ID_FORMAT = "%Y%m%dT%H%M%SZ"
+_MANIFEST_FILE_NAME = "manifest.json"
+
+
+def _get_cidr_range_snapshot_folder_path(
+    *,
+    cache_folder_path: pathlib.Path = _CIDR_RANGE_CACHE_FOLDER_PATH,
+    pinned_snapshot: str | None = None,
+    time_to_live: datetime.timedelta = _CIDR_RANGE_CACHE_TIME_TO_LIVE,
+) -> pathlib.Path:
+    """
+    Get the folder of the snapshot of address ranges to use, fetching a new one only when needed.
+
+    Each snapshot is a folder named after the UTC time its address ranges were fetched, holding the response of each
+    service and a manifest of the fetch time and cache format. The most recent snapshot is used until it is older than
+    `time_to_live`, at which point the address ranges are fetched again into a new snapshot; only the most recent
+    few snapshots are kept.
+
+    Parameters
+    ----------
+    cache_folder_path : pathlib.Path, optional
+        The folder holding all snapshots.
+    pinned_snapshot : str, optional
+        The ID of a snapshot within `cache_folder_path`, or the path to a snapshot folder anywhere, to use regardless
+        of its age. By default, the most recent snapshot is used.
+    time_to_live : datetime.timedelta, default: 1 day
+        How long the address ranges of a snapshot are used before fetching them again.
+    """
+    if pinned_snapshot is not None:
+        snapshot_folder_path = pathlib.Path(pinned_snapshot)
+        if not snapshot_folder_path.is_dir():
+            snapshot_folder_path = cache_folder_path / pinned_snapshot
+        if _read_cidr_range_snapshot_fetch_time(snapshot_folder_path=snapshot_folder_path) is None:
+            message = f"The pinned CIDR range snapshot '{pinned_snapshot}' was not found or is not valid!"
+            raise ValueError(message)
+
+        return snapshot_folder_path
+
+    snapshot_folder_path = _find_latest_cidr_range_snapshot(cache_folder_path=cache_folder_path)
+    if snapshot_folder_path is not None:
+        fetch_time = _read_cidr_range_snapshot_fetch_time(snapshot_folder_path=snapshot_folder_path)
+        if datetime.datetime.now(tz=datetime.timezone.utc) - fetch_time < time_to_live:
+            return snapshot_folder_path
+
+    cidr_ranges_by_service_name = {
+        service_name: _fetch_cidr_range(service_name=service_name) for service_name in _KNOWN_SERVICES
+    }
+    snapshot_folder_path = _create_cidr_range_snapshot(
+        cache_folder_path=cache_folder_path, cidr_ranges_by_service_name=cidr_ranges_by_service_name
+    )
+    _remove_old_cidr_range_snapshots(cache_folder_path=cache_folder_path)
+
+    return snapshot_folder_path
+
+
+def _load_cidr_range(*, snapshot_folder_path: pathlib.Path, service_name: str) -> dict | list:
+    with (snapshot_folder_path / f"{service_name}.json").open(mode="r") as io:
+        cidr_range = json.load(io)
+
+    return cidr_range
+
+
+def _create_cidr_range_snapshot(
+    *,
+    cache_folder_path: pathlib.Path,
+    cidr_ranges_by_service_name: dict[str, dict | list],
+    fetch_time: datetime.datetime | None = None,
+) -> pathlib.Path:
+    fetch_time = fetch_time or datetime.datetime.now(tz=datetime.timezone.utc)
+    snapshot_id = fetch_time.strftime(_SNAPSHOT_ID_FORMAT)
+    snapshot_folder_path = cache_folder_path / snapshot_id
+
+    # Write to a temporary folder first so that other processes never see a partial snapshot
+    temporary_folder_path = cache_folder_path / f".{snapshot_id}.{os.getpid()}.tmp"
+    temporary_folder_path.mkdir(parents=True, exist_ok=True)
+    for service_name, cidr_range in cidr_ranges_by_service_name.items():
+        with (temporary_folder_path / f"{service_name}.json").open(mode="w") as io:
+            json.dump(obj=cidr_range, fp=io)
+
+    manifest = {
+        "format_version": _CIDR_RANGE_CACHE_FORMAT_VERSION,
+        "fetch_time": fetch_time.isoformat(),
+        "service_names": list(cidr_ranges_by_service_name),
+    }
+    with (temporary_folder_path / _MANIFEST_FILE_NAME).open(mode="w") as io:
+        json.dump(obj=manifest, fp=io, indent=1)
+
+    try:
+        temporary_folder_path.rename(snapshot_folder_path)
+    except OSError:
+        # Another process made a snapshot within the same second
+        shutil.rmtree(path=temporary_folder_path)
+
+    return snapshot_folder_path
+
+
+def _read_cidr_range_snapshot_fetch_time(*, snapshot_folder_path: pathlib.Path) -> datetime.datetime | None:
+    """Get the time the address ranges of a snapshot were fetched, or None if it is not a snapshot of this format."""
+    manifest_file_path = snapshot_folder_path / _MANIFEST_FILE_NAME
+    if not manifest_file_path.exists():
+        return None
+
+    with manifest_file_path.open(mode="r") as io:
+        manifest = json.load(io)
+    if manifest.get("format_version", None) != _CIDR_RANGE_CACHE_FORMAT_VERSION:
+        return None
+
+    return datetime.datetime.fromisoformat(manifest["fetch_time"])
+
+
+def _find_latest_cidr_range_snapshot(*, cache_folder_path: pathlib.Path) -> pathlib.Path | None:
+    snapshot_folder_paths = _get_cidr_range_snapshot_folder_paths(cache_folder_path=cache_folder_path)
+
+    return snapshot_folder_paths[-1] if len(snapshot_folder_paths) != 0 else None
+
+
+def _get_cidr_range_snapshot_folder_paths(*, cache_folder_path: pathlib.Path) -> list[pathlib.Path]:
+    """Get the folders of all valid snapshots, from oldest to newest."""
+    if not cache_folder_path.exists():
+        return []
+
+    # The IDs are fixed-width UTC times, so they sort in the order they were fetched
+    snapshot_folder_paths = [
+        folder_path
+        for folder_path in sorted(cache_folder_path.iterdir())
+        if not folder_path.name.startswith(".")
+        and _read_cidr_range_snapshot_fetch_time(snapshot_folder_path=folder_path) is not None
+    ]
+
+    return snapshot_folder_paths
+
+
+def _remove_old_cidr_range_snapshots(*, cache_folder_path: pathlib.Path) -> None:
+    snapshot_folder_paths = _get_cidr_range_snapshot_folder_paths(cache_folder_path=cache_folder_path)
+    for snapshot_folder_path in snapshot_folder_paths[:-_MAXIMUM_NUMBER_OF_CIDR_RANGE_SNAPSHOTS]:
+        shutil.rmtree(path=snapshot_folder_path, ignore_errors=True)
+
+
+def _fetch_cidr_range(*, service_name: str) -> dict | list:
+    match service_name:
+        case "GitHub":
+            github_cidr_request = requests.get(url="https://api.github.com/meta").json()
+
+            return github_cidr_request
+        case "AWS":
+            aws_cidr_request = requests.get(url="https://ip-ranges.amazonaws.com/ip-ranges.json").json()
+
+            return aws_cidr_request
+        case "GCP":
+            gcp_cidr_request = requests.get(url="https://www.gstatic.com/ipranges/cloud.json").json()
+
+            return gcp_cidr_request
+        case "Azure":
+            raise NotImplementedError("Azure CIDR address fetching is not yet implemented!")
+        case "VPN":
+            # Very nice public and maintained listing! Hope this stays stable.
+            vpn_cidr_request = (
+                requests.get(
+                    url="https://raw.githubusercontent.com/josephrocca/is-vpn/main/vpn-or-datacenter-ipv4-ranges.txt"
+                )
+                .content.decode("utf-8")
+                .splitlines()
+            )
+
+            return vpn_cidr_request
+        case _:
+            raise ValueError(f"Service name '{service_name}' is not supported!")  # pragma: no cover
@@ -7,6 +7,8 @@ import sys
 import click
 
 from ._bin_all_reduced_s3_logs_by_object_key import bin_all_reduced_s3_logs_by_object_key
+from ._binned_s3_log_store import compact_binned_s3_log_store
+from ._compact_reduced_s3_logs import compact_reduced_s3_logs
 from ._dandi_s3_log_file_reducer import (
     reduce_all_dandi_raw_s3_logs,
 )
@@ -14,6 +16,7 @@ from ._generate_all_dandiset_totals import generate_all_dandiset_totals
 from ._generate_archive_summaries import generate_archive_summaries
 from ._generate_archive_totals import generate_archive_totals
 from ._map_binned_s3_logs_to_dandisets import map_binned_s3_logs_to_dandisets
+from ._resolve_regions_of_binned_s3_logs import resolve_regions_of_binned_s3_logs
 from ._update_region_codes_to_coordinates import update_region_codes_to_coordinates
 
 
@@ -64,6 +67,34 @@ from ._update_region_codes_to_coordinates import update_region_codes_to_coordina
     type=str,
     default=None,
 )
+@click.option(
+    "--coordinate_with_other_nodes",
+    help=(
+        "Claim each raw log file through a lease file in the reduced folder before reducing it. "
+        "Allows any number of invocations (e.g., on different nodes mounting the same storage) to split the work."
+    ),
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--lease_duration_in_seconds",
+    help="The number of seconds without renewal after which the lease of another invocation is reclaimed.",
+    required=False,
+    type=click.IntRange(min=1),
+    default=600,
+)
+@click.option(
+    "--maximum_memory_in_mb",
+    help=(
+        "A global ceiling on the memory (in MB) used across all workers. "
+        "If specified, buffer sizes are adapted to the observed memory usage of each worker and new tasks are held "
+        "back while they would risk exceeding the ceiling. "
+        "A summary of these decisions is written to the `run_reports` subfolder of the reduced folder."
+    ),
+    required=False,
+    type=click.IntRange(min=1),
+    default=None,
+)
 def _reduce_all_dandi_raw_s3_logs_cli(
     raw_s3_logs_folder_path: str,
     reduced_s3_logs_folder_path: str,
@@ -71,6 +102,9 @@ def _reduce_all_dandi_raw_s3_logs_cli(
     maximum_buffer_size_in_mb: int,
     excluded_years: str | None,
     excluded_ips: str | None,
+    coordinate_with_other_nodes: bool,
+    lease_duration_in_seconds: int,
+    maximum_memory_in_mb: int | None,
 ) -> None:
     split_excluded_years = excluded_years.split(",") if excluded_years is not None else []
     split_excluded_ips = excluded_ips.split(",") if excluded_ips is not None else []
@@ -78,6 +112,7 @@ def _reduce_all_dandi_raw_s3_logs_cli(
     for excluded_ip in split_excluded_ips:
         handled_excluded_ips[excluded_ip] = True
     maximum_buffer_size_in_bytes = maximum_buffer_size_in_mb * 10**6
+    maximum_memory_in_bytes = maximum_memory_in_mb * 10**6 if maximum_memory_in_mb is not None else None
 
     reduce_all_dandi_raw_s3_logs(
         raw_s3_logs_folder_path=raw_s3_logs_folder_path,
@@ -86,6 +121,43 @@ def _reduce_all_dandi_raw_s3_logs_cli(
         maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
         excluded_years=split_excluded_years,
         excluded_ips=handled_excluded_ips,
+        coordinate_with_other_nodes=coordinate_with_other_nodes,
+        lease_duration_in_seconds=lease_duration_in_seconds,
+        maximum_memory_in_bytes=maximum_memory_in_bytes,
+    )
+
+    return None
+
+
+@click.command(name="compact_reduced_s3_logs")
+@click.option(
+    "--reduced_s3_logs_folder_path",
+    help="The path to the folder containing all reduced S3 log files.",
+    required=True,
+    type=click.Path(writable=False),
+)
+@click.option(
+    "--compacted_s3_logs_folder_path",
+    help="The path to write each compacted partition to. Only partitions with new or changed days are recompacted.",
+    required=True,
+    type=click.Path(writable=True),
+)
+@click.option(
+    "--partition_by",
+    help="The span of time covered by each partition.",
+    required=False,
+    type=click.Choice(["month", "year"]),
+    default="month",
+)
+def _compact_reduced_s3_logs_cli(
+    reduced_s3_logs_folder_path: str,
+    compacted_s3_logs_folder_path: str,
+    partition_by: str,
+) -> None:
+    compact_reduced_s3_logs(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        compacted_s3_logs_folder_path=compacted_s3_logs_folder_path,
+        partition_by=partition_by,
     )
 
     return None
@@ -111,15 +183,152 @@ def _reduce_all_dandi_raw_s3_logs_cli(
     type=int,
     default=None,
 )
+@click.option(
+    "--maximum_number_of_workers",
+    help=(
+        "The maximum number of workers to distribute tasks across. "
+        "Each worker owns a disjoint hash range of the object keys. "
+        "An interrupted call must be resumed with the same number of workers."
+    ),
+    required=False,
+    type=click.IntRange(min=1),
+    default=1,
+)
+@click.option(
+    "--maximum_buffer_size_in_mb",
+    help=(
+        "The approximate amount of memory (in MB) used to accumulate records before flushing them to the binned files. "
+        "This budget is shared evenly between the workers."
+    ),
+    required=False,
+    type=click.IntRange(min=1),
+    default=10**3,
+)
+@click.option(
+    "--storage",
+    help=(
+        "How to store the binned logs: one file per object key ('folder'), "
+        "or a few segment files indexed by object key ('store')."
+    ),
+    required=False,
+    type=click.Choice(["folder", "store"]),
+    default="folder",
+)
+@click.option(
+    "--compression",
+    help="Compress each binned file as appendable gzip members. Only used with the 'folder' storage.",
+    required=False,
+    type=click.Choice(["none", "gzip"]),
+    default="none",
+)
+@click.option(
+    "--ip_address_encoding",
+    help=(
+        "Store each IP address as an integer ID from a dictionary kept in the binning journal ('dictionary'). "
+        "Only used with the 'folder' storage."
+    ),
+    required=False,
+    type=click.Choice(["text", "dictionary"]),
+    default="text",
+)
 def _bin_all_reduced_s3_logs_by_object_key_cli(
     reduced_s3_logs_folder_path: str,
     binned_s3_logs_folder_path: str,
     file_limit: int | None,
+    maximum_number_of_workers: int,
+    maximum_buffer_size_in_mb: int,
+    storage: str,
+    compression: str,
+    ip_address_encoding: str,
 ) -> None:
+    maximum_buffer_size_in_bytes = maximum_buffer_size_in_mb * 10**6
+
     bin_all_reduced_s3_logs_by_object_key(
         reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
         binned_s3_logs_folder_path=binned_s3_logs_folder_path,
         file_limit=file_limit,
+        maximum_number_of_workers=maximum_number_of_workers,
+        maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
+        storage=storage,
+        compression=compression,
+        ip_address_encoding=ip_address_encoding,
+    )
+
+    return None
+
+
+@click.command(name="compact_binned_s3_log_store")
+@click.option(
+    "--binned_s3_logs_folder_path",
+    help="The path to the folder of binned S3 logs, binned with the 'store' storage.",
+    required=True,
+    type=click.Path(writable=True),
+)
+@click.option(
+    "--small_segment_size_in_mb",
+    help="Segments smaller than this (in MB) are merged together, even if none of their object keys are fragmented.",
+    required=False,
+    type=click.IntRange(min=1),
+    default=64,
+)
+def _compact_binned_s3_log_store_cli(binned_s3_logs_folder_path: str, small_segment_size_in_mb: int) -> None:
+    compact_binned_s3_log_store(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+        small_segment_size_in_bytes=small_segment_size_in_mb * 10**6,
+    )
+
+    return None
+
+
+@click.command(name="resolve_regions_of_binned_s3_logs")
+@click.option(
+    "--binned_s3_logs_folder_path",
+    help="",
+    required=True,
+    type=click.Path(writable=False),
+)
+@click.option(
+    "--ip_range_database_file_path",
+    help=(
+        "The path to a CSV file of IP address ranges with the columns 'start_ip', 'end_ip', 'country', and "
+        "optionally 'region', used to look up regions offline before falling back to ipinfo."
+    ),
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--subnet_prefix_lengths",
+    help=(
+        "A comma-separated pair of IPv4 and IPv6 prefix lengths, such as '24,48', of subnets whose IP addresses are "
+        "assumed to share a region, so only one IP address per subnet is looked up."
+    ),
+    required=False,
+    type=str,
+    default=None,
+)
+@click.option(
+    "--ip_lookup_failure_time_to_live_in_seconds",
+    help="The number of seconds after a failed IP lookup during which the IP address is not looked up again.",
+    required=False,
+    type=click.FloatRange(min=0.0),
+    default=3600.0,
+)
+def _resolve_regions_of_binned_s3_logs_cli(
+    binned_s3_logs_folder_path: str,
+    ip_range_database_file_path: str | None,
+    subnet_prefix_lengths: str | None,
+    ip_lookup_failure_time_to_live_in_seconds: float,
+) -> None:
+    resolve_regions_of_binned_s3_logs(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+        ip_range_database_file_path=ip_range_database_file_path,
+        subnet_prefix_lengths=(
+            tuple(int(prefix_length) for prefix_length in subnet_prefix_lengths.split(","))
+            if subnet_prefix_lengths is not None
+            else None
+        ),
+        ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
     )
 
     return None
@@ -159,12 +368,54 @@ def _bin_all_reduced_s3_logs_by_object_key_cli(
     type=int,
     default=None,
 )
+@click.option(
+    "--ip_range_database_file_path",
+    help=(
+        "The path to a CSV file of IP address ranges with the columns 'start_ip', 'end_ip', 'country', and "
+        "optionally 'region', used to look up regions offline before falling back to ipinfo."
+    ),
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--retry_unresolved_regions",
+    help=(
+        "Only map again the Dandisets whose outputs have regions left unresolved by failed IP lookups in earlier calls."
+    ),
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--subnet_prefix_lengths",
+    help=(
+        "A comma-separated pair of IPv4 and IPv6 prefix lengths, such as '24,48', of subnets whose IP addresses are "
+        "assumed to share a region, so only one IP address per subnet is looked up."
+    ),
+    required=False,
+    type=str,
+    default=None,
+)
+@click.option(
+    "--ip_lookup_failure_time_to_live_in_seconds",
+    help=(
+        "The number of seconds after a failed IP lookup during which the IP address is not looked up again. "
+        "Defaults to one hour, or 0 with '--retry_unresolved_regions'."
+    ),
+    required=False,
+    type=click.FloatRange(min=0.0),
+    default=None,
+)
 def _map_binned_s3_logs_to_dandisets_cli(
     binned_s3_logs_folder_path: pathlib.Path,
     mapped_s3_logs_folder_path: pathlib.Path,
     excluded_dandisets: str | None,
     restrict_to_dandisets: str | None,
     dandiset_limit: int | None,
+    ip_range_database_file_path: str | None,
+    retry_unresolved_regions: bool,
+    subnet_prefix_lengths: str | None,
+    ip_lookup_failure_time_to_live_in_seconds: float | None,
 ) -> None:
     split_excluded_dandisets = excluded_dandisets.split(",") if excluded_dandisets is not None else None
     split_restrict_to_dandisets = restrict_to_dandisets.split(",") if restrict_to_dandisets is not None else None
@@ -175,6 +426,14 @@ def _map_binned_s3_logs_to_dandisets_cli(
         excluded_dandisets=split_excluded_dandisets,
         restrict_to_dandisets=split_restrict_to_dandisets,
         dandiset_limit=dandiset_limit,
+        ip_range_database_file_path=ip_range_database_file_path,
+        retry_unresolved_regions=retry_unresolved_regions,
+        subnet_prefix_lengths=(
+            tuple(int(prefix_length) for prefix_length in subnet_prefix_lengths.split(","))
+            if subnet_prefix_lengths is not None
+            else None
+        ),
+        ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
     )
 
     return None
@@ -0,0 +1,243 @@
+"""Compact daily reduced logs into larger partitions sorted by object key."""
+
+import contextlib
+import heapq
+import json
+import pathlib
+import tempfile
+from typing import Literal
+
+import tqdm
+from pydantic import DirectoryPath, Field, validate_call
+
+_REDUCED_S3_LOG_HEADER = ("timestamp", "ip_address", "object_key", "bytes_sent")
+
+
+@validate_call
+def compact_reduced_s3_logs(
+    *,
+    reduced_s3_logs_folder_path: DirectoryPath,
+    compacted_s3_logs_folder_path: DirectoryPath,
+    partition_by: Literal["month", "year"] = "month",
+    minimum_rows_per_index_block: int = Field(ge=1, default=10_000),
+) -> None:
+    """
+    Merge the daily reduced S3 log files into larger partitions, each sorted by object key and then by timestamp.
+
+    Assumes the following folder structure of the reduced logs...
+
+    |- <reduced_s3_logs_folder_path>
+    |-- 2019 (year)
+    |--- 01 (month)
+    |---- 01.tsv (day)
+    | ...
+
+    ...and produces either `<compacted_s3_logs_folder_path>/2019/01.tsv` (by month) or
+    `<compacted_s3_logs_folder_path>/2019.tsv` (by year).
+
+    Each partition is accompanied by a small key-range index (`<partition>.index.json`) that lists the byte range
+    of consecutive blocks of rows along with the first and last object key found in each block.
+    Blocks never split the rows of an object key, so consumers can seek directly to the block containing a key,
+    or stream-merge the partitions in key order.
+
+    Compaction is incremental: a manifest records which daily files (along with their size and modification time)
+    went into each partition, and only partitions whose daily files have changed since are recompacted.
+
+    Parameters
+    ----------
+    reduced_s3_logs_folder_path : DirectoryPath
+        The path to the folder containing the reduced S3 log files.
+    compacted_s3_logs_folder_path : DirectoryPath
+        The path to the folder to write the compacted partitions to.
+    partition_by : "month" or "year", default: "month"
+        The span of time covered by each partition.
+    minimum_rows_per_index_block : int, default: 10,000
+        The minimum number of rows in each block of the key-range index.
+        Blocks are extended beyond this until the end of the last object key in the block.
+    """
+    manifest_file_path = compacted_s3_logs_folder_path / "compaction_manifest.json"
+    manifest = dict(partition_by=partition_by, partitions=dict())
+    if manifest_file_path.exists():
+        with manifest_file_path.open(mode="r") as io:
+            manifest = json.load(fp=io)
+
+    if manifest["partition_by"] != partition_by:
+        message = (
+            f"The compacted folder was previously partitioned by '{manifest['partition_by']}'! "
+            f"Please use a different folder to partition by '{partition_by}'."
+        )
+        raise ValueError(message)
+
+    reduced_s3_log_file_paths_by_partition: dict[str, list[pathlib.Path]] = dict()
+    for reduced_s3_log_file_path in reduced_s3_logs_folder_path.rglob(pattern="*.tsv"):
+        relative_file_path = reduced_s3_log_file_path.relative_to(reduced_s3_logs_folder_path)
+        if len(relative_file_path.parts) != 3 or not relative_file_path.stem.isdigit():
+            continue  # Not a daily reduced log file
+
+        year, month, _ = relative_file_path.parts
+        partition = f"{year}/{month}" if partition_by == "month" else year
+        reduced_s3_log_file_paths_by_partition.setdefault(partition, []).append(reduced_s3_log_file_path)
+
+    partitions_to_compact = dict()
+    for partition, reduced_s3_log_file_paths in reduced_s3_log_file_paths_by_partition.items():
+        daily_file_signatures = {
+            str(reduced_s3_log_file_path.relative_to(reduced_s3_logs_folder_path)): _get_file_signature(
+                file_path=reduced_s3_log_file_path
+            )
+            for reduced_s3_log_file_path in sorted(reduced_s3_log_file_paths)
+        }
+
+        if manifest["partitions"].get(partition, None) != daily_file_signatures:
+            partitions_to_compact[partition] = daily_file_signatures
+
+    for partition, daily_file_signatures in tqdm.tqdm(
+        iterable=partitions_to_compact.items(),
+        total=len(partitions_to_compact),
+        desc="Compacting reduced logs",
+        position=0,
+        leave=True,
+        mininterval=3.0,
+        smoothing=0,
+        unit="partition",
+    ):
+        compacted_s3_log_file_path = compacted_s3_logs_folder_path / f"{partition}.tsv"
+        compacted_s3_log_file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        _compact_partition(
+            reduced_s3_log_file_paths=[
+                reduced_s3_logs_folder_path / relative_file_path for relative_file_path in daily_file_signatures
+            ],
+            compacted_s3_log_file_path=compacted_s3_log_file_path,
+            minimum_rows_per_index_block=minimum_rows_per_index_block,
+        )
+
+        # Only record the partition once it is fully in place, so an interruption just recompacts it next time
+        manifest["partitions"][partition] = daily_file_signatures
+        temporary_manifest_file_path = manifest_file_path.with_suffix(".json.tmp")
+        with temporary_manifest_file_path.open(mode="w") as io:
+            json.dump(obj=manifest, fp=io, indent=1)
+        temporary_manifest_file_path.replace(manifest_file_path)
+
+    return None
+
+
+def _get_file_signature(*, file_path: pathlib.Path) -> list[int]:
+    file_stat = file_path.stat()
+
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+def _compact_partition(
+    *,
+    reduced_s3_log_file_paths: list[pathlib.Path],
+    compacted_s3_log_file_path: pathlib.Path,
+    minimum_rows_per_index_block: int,
+) -> None:
+    """
+    Sort each daily file on its own into a temporary run, then stream-merge the runs into the partition.
+
+    Only a single day is ever held in memory; the key-range index is built while the merged lines are written.
+    Every line is kept as the exact bytes found in the reduced files.
+    """
+    header = "\t".join(_REDUCED_S3_LOG_HEADER).encode(encoding="utf-8") + b"\n"
+
+    with tempfile.TemporaryDirectory(dir=compacted_s3_log_file_path.parent) as temporary_folder_path:
+        run_file_paths = []
+        for reduced_s3_log_file_path in reduced_s3_log_file_paths:
+            if reduced_s3_log_file_path.stat().st_size == 0:
+                continue
+
+            run_file_path = pathlib.Path(temporary_folder_path) / f"{len(run_file_paths)}.tsv"
+            _write_sorted_run(reduced_s3_log_file_path=reduced_s3_log_file_path, run_file_path=run_file_path)
+            run_file_paths.append(run_file_path)
+
+        temporary_compacted_s3_log_file_path = compacted_s3_log_file_path.with_suffix(".tsv.tmp")
+        with contextlib.ExitStack() as stack, temporary_compacted_s3_log_file_path.open(mode="wb") as io:
+            runs = [stack.enter_context(run_file_path.open(mode="rb")) for run_file_path in run_file_paths]
+
+            io.write(header)
+            index_builder = _KeyRangeIndexBuilder(
+                start_offset=len(header), minimum_rows_per_index_block=minimum_rows_per_index_block
+            )
+
+            # The merge is stable, so rows with equal keys keep the order of the days and of the rows within each day
+            for line in heapq.merge(*runs, key=_get_sort_key):
+                io.write(line)
+                index_builder.add(object_key=line.split(b"\t", 3)[2], line_length=len(line))
+        temporary_compacted_s3_log_file_path.replace(compacted_s3_log_file_path)
+
+    index_file_path = compacted_s3_log_file_path.with_suffix(".index.json")
+    with index_file_path.open(mode="w") as io:
+        json.dump(obj=index_builder.finish(), fp=io)
+
+    return None
+
+
+def _get_sort_key(line: bytes) -> tuple[bytes, bytes]:
+    # The byte order of UTF-8 matches the order of code points, so this is the same order as sorting the strings
+    timestamp, _, object_key, _ = line.split(b"\t", 3)
+
+    return object_key, timestamp
+
+
+def _write_sorted_run(*, reduced_s3_log_file_path: pathlib.Path, run_file_path: pathlib.Path) -> None:
+    with reduced_s3_log_file_path.open(mode="rb") as io:
+        # Lines are sorted and merged as they are, so the columns must be in the order written by the reducer
+        header = io.readline().rstrip(b"\r\n").decode(encoding="utf-8")
+        if tuple(header.split("\t")) != _REDUCED_S3_LOG_HEADER:
+            message = f"The reduced S3 log file '{reduced_s3_log_file_path}' has an unexpected header: '{header}'!"
+            raise ValueError(message)
+        lines = [line if line.endswith(b"\n") else line + b"\n" for line in io if line.strip() != b""]
+    lines.sort(key=_get_sort_key)
+
+    with run_file_path.open(mode="wb") as io:
+        io.writelines(lines)
+
+
+class _KeyRangeIndexBuilder:
+    def __init__(self, *, start_offset: int, minimum_rows_per_index_block: int) -> None:
+        """
+        Build the key-range index of a partition one line at a time, as the sorted lines are written.
+
+        A new block is only started where a new object key starts, once the current block holds at least the minimum
+        number of rows.
+        """
+        self.minimum_rows_per_index_block = minimum_rows_per_index_block
+
+        self._byte_offset = start_offset
+        self._number_of_rows = 0
+        self._object_key: bytes | None = None
+        self._block: dict | None = None
+        self._blocks: list[dict] = []
+
+    def add(self, *, object_key: bytes, line_length: int) -> None:
+        if object_key != self._object_key:
+            if self._block is None or self._block["number_of_rows"] >= self.minimum_rows_per_index_block:
+                self._close_block()
+                self._block = dict(
+                    first_object_key=object_key.decode(encoding="utf-8"),
+                    last_object_key=None,
+                    byte_offset=self._byte_offset,
+                    byte_length=0,
+                    number_of_rows=0,
+                )
+            self._object_key = object_key
+
+        self._block["byte_length"] += line_length
+        self._block["number_of_rows"] += 1
+        self._byte_offset += line_length
+        self._number_of_rows += 1
+
+    def finish(self) -> dict:
+        self._close_block()
+
+        index = dict(number_of_rows=self._number_of_rows, blocks=self._blocks)
+        return index
+
+    def _close_block(self) -> None:
+        if self._block is None:
+            return
+
+        self._block["last_object_key"] = self._object_key.decode(encoding="utf-8")
+        self._blocks.append(self._block)
+        self._block = None
@@ -3,5 +3,8 @@ import pathlib
 DANDI_S3_LOG_PARSER_BASE_FOLDER_PATH = pathlib.Path.home() / ".dandi_s3_log_parser"
 DANDI_S3_LOG_PARSER_BASE_FOLDER_PATH.mkdir(exist_ok=True)
 
+_CIDR_RANGE_CACHE_FOLDER_PATH = DANDI_S3_LOG_PARSER_BASE_FOLDER_PATH / "cidr_ranges"
+_IP_HASH_CACHE_FILE_PATH = DANDI_S3_LOG_PARSER_BASE_FOLDER_PATH / "ip_hash_cache.sqlite"
 _IP_HASH_TO_REGION_FILE_PATH = DANDI_S3_LOG_PARSER_BASE_FOLDER_PATH / "ip_hash_to_region.yaml"
 _IP_HASH_NOT_IN_SERVICES_FILE_PATH = DANDI_S3_LOG_PARSER_BASE_FOLDER_PATH / "ip_hash_not_in_services.yaml"
+_DANDI_METADATA_CACHE_FILE_PATH = DANDI_S3_LOG_PARSER_BASE_FOLDER_PATH / "dandi_metadata_cache.sqlite"
@@ -0,0 +1,193 @@
+"""Persistent cache of the versions and assets of Dandisets from the DANDI API, shared across calls."""
+
+import pathlib
+import sqlite3
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+import requests.adapters
+
+from ._config import _DANDI_METADATA_CACHE_FILE_PATH
+
+_DANDI_API_URL = "https://api.dandiarchive.org/api"
+_DANDI_API_PAGE_SIZE = 1000
+
+
+class _DandiAsset(typing.NamedTuple):
+    path: str
+    blob_id: str | None
+    zarr_id: str | None
+
+
+class _DandiVersion(typing.NamedTuple):
+    version_id: str
+    modified: str
+
+
+class _DandiMetadataCache:
+    def __init__(
+        self,
+        *,
+        cache_file_path: pathlib.Path = _DANDI_METADATA_CACHE_FILE_PATH,
+        api_url: str = _DANDI_API_URL,
+        maximum_number_of_workers: int = 8,
+        timeout_in_seconds: float = 60.0,
+    ) -> None:
+        """
+        The versions of Dandisets and the assets of each version, fetched concurrently and kept in an SQLite database.
+
+        The assets of a published version never change, so once fetched they are always read from the cache. The
+        assets of a draft are fetched again whenever the modification time of the draft reported by the API differs
+        from the one they were cached with. The list of versions of each Dandiset is always fetched, since new
+        versions may have been published, but only once per call.
+
+        The assets of a version are committed together with its modification time, so an interrupted call never
+        leaves a partial listing behind.
+
+        Parameters
+        ----------
+        cache_file_path : pathlib.Path, optional
+            The path to the SQLite database holding the cache.
+        api_url : str, default: "https://api.dandiarchive.org/api"
+            The base URL of the DANDI API, or of a stand-in with the same endpoints.
+        maximum_number_of_workers : int, default: 8
+            The maximum number of requests in flight at once.
+        timeout_in_seconds : float, default: 60.0
+            The timeout of each request.
+        """
+        self.api_url = api_url.rstrip("/")
+        self.maximum_number_of_workers = maximum_number_of_workers
+        self.timeout_in_seconds = timeout_in_seconds
+
+        self._session = requests.Session()
+        self._session.headers.update({"Accept": "application/json"})
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=maximum_number_of_workers)
+        self._session.mount(prefix="http://", adapter=adapter)
+        self._session.mount(prefix="https://", adapter=adapter)
+
+        self._connection = sqlite3.connect(database=cache_file_path, timeout=60.0, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS versions ("
+                "dandiset_id TEXT, version_id TEXT, modified TEXT, PRIMARY KEY (dandiset_id, version_id)"
+                ") WITHOUT ROWID"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS assets ("
+                "dandiset_id TEXT, version_id TEXT, position INTEGER, path TEXT, blob_id TEXT, zarr_id TEXT, "
+                "PRIMARY KEY (dandiset_id, version_id, position)"
+                ") WITHOUT ROWID"
+            )
+
+        self._versions_by_dandiset_id: dict[str, list[_DandiVersion]] = dict()
+
+    def close(self) -> None:
+        self._session.close()
+        self._connection.close()
+
+    def __enter__(self) -> "_DandiMetadataCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def prefetch(self, *, dandiset_ids: list[str]) -> None:
+        """
+        Fetch the versions of every Dandiset, then the assets of every version that is not cached or has changed.
+
+        Both stages are requested concurrently; the assets of each version are committed as soon as they arrive.
+        """
+        dandiset_ids = [dandiset_id for dandiset_id in dandiset_ids if dandiset_id not in self._versions_by_dandiset_id]
+        with ThreadPoolExecutor(max_workers=self.maximum_number_of_workers) as executor:
+            future_to_dandiset_id = {
+                executor.submit(self._request_versions, dandiset_id=dandiset_id): dandiset_id
+                for dandiset_id in dandiset_ids
+            }
+            for future in as_completed(future_to_dandiset_id):
+                self._versions_by_dandiset_id[future_to_dandiset_id[future]] = future.result()
+
+            uncached_versions = [
+                (dandiset_id, version)
+                for dandiset_id in dandiset_ids
+                for version in self._versions_by_dandiset_id[dandiset_id]
+                if not self._is_cached(dandiset_id=dandiset_id, version=version)
+            ]
+            future_to_uncached_version = {
+                executor.submit(self._request_assets, dandiset_id=dandiset_id, version_id=version.version_id): index
+                for index, (dandiset_id, version) in enumerate(uncached_versions)
+            }
+            for future in as_completed(future_to_uncached_version):
+                dandiset_id, version = uncached_versions[future_to_uncached_version[future]]
+                self._store_assets(dandiset_id=dandiset_id, version=version, assets=future.result())
+
+    def get_version_ids(self, *, dandiset_id: str) -> list[str]:
+        """Get the IDs of every version of a Dandiset, in the order listed by the API."""
+        self.prefetch(dandiset_ids=[dandiset_id])
+
+        return [version.version_id for version in self._versions_by_dandiset_id[dandiset_id]]
+
+    def get_assets(self, *, dandiset_id: str, version_id: str) -> list[_DandiAsset]:
+        """Get every asset of a version of a Dandiset, in the order listed by the API."""
+        self.prefetch(dandiset_ids=[dandiset_id])
+
+        return [
+            _DandiAsset(*row)
+            for row in self._connection.execute(
+                "SELECT path, blob_id, zarr_id FROM assets WHERE dandiset_id = ? AND version_id = ? ORDER BY position",
+                (dandiset_id, version_id),
+            )
+        ]
+
+    def _is_cached(self, *, dandiset_id: str, version: _DandiVersion) -> bool:
+        row = self._connection.execute(
+            "SELECT modified FROM versions WHERE dandiset_id = ? AND version_id = ?", (dandiset_id, version.version_id)
+        ).fetchone()
+        if row is None:
+            return False
+
+        # Published versions are immutable; only a draft can change under the same version ID
+        return version.version_id != "draft" or row[0] == version.modified
+
+    def _store_assets(self, *, dandiset_id: str, version: _DandiVersion, assets: list[_DandiAsset]) -> None:
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM assets WHERE dandiset_id = ? AND version_id = ?", (dandiset_id, version.version_id)
+            )
+            self._connection.executemany(
+                "INSERT INTO assets (dandiset_id, version_id, position, path, blob_id, zarr_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((dandiset_id, version.version_id, position, *asset) for position, asset in enumerate(assets)),
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO versions (dandiset_id, version_id, modified) VALUES (?, ?, ?)",
+                (dandiset_id, version.version_id, version.modified),
+            )
+
+    def _request_versions(self, *, dandiset_id: str) -> list[_DandiVersion]:
+        return [
+            _DandiVersion(version_id=result["version"], modified=result["modified"])
+            for result in self._paginate(url=f"{self.api_url}/dandisets/{dandiset_id}/versions/")
+        ]
+
+    def _request_assets(self, *, dandiset_id: str, version_id: str) -> list[_DandiAsset]:
+        return [
+            _DandiAsset(path=result["path"], blob_id=result.get("blob", None), zarr_id=result.get("zarr", None))
+            for result in self._paginate(url=f"{self.api_url}/dandisets/{dandiset_id}/versions/{version_id}/assets/")
+        ]
+
+    def _paginate(self, *, url: str) -> typing.Iterator[dict]:
+        params = {"page_size": _DANDI_API_PAGE_SIZE}
+        while url is not None:
+            response = self._session.get(url=url, params=params, timeout=self.timeout_in_seconds)
+            response.raise_for_status()
+            page = response.json()
+            yield from page["results"]
+
+            # The URL of the next page already carries the query parameters
+            url = page["next"]
+            params = None
@@ -1,18 +1,24 @@
 """Primary functions for reducing raw S3 log file for DANDI."""
 
 import collections
+import contextlib
+import datetime
+import json
 import os
+import pathlib
 import random
 import traceback
 import uuid
 from collections.abc import Callable
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 
 import tqdm
 from pydantic import DirectoryPath, Field, FilePath, validate_call
 
 from ._error_collection import _collect_error
+from ._memory_governor import _MemoryGovernor, _PeakMemorySampler
 from ._s3_log_file_reducer import reduce_raw_s3_log
+from ._work_coordination import _hold_lease
 
 
 @validate_call
@@ -24,6 +30,9 @@ def reduce_all_dandi_raw_s3_logs(
     maximum_buffer_size_in_bytes: int = 4 * 10**9,
     excluded_years: list[str] | None = None,
     excluded_ips: collections.defaultdict[str, bool] | None = None,
+    coordinate_with_other_nodes: bool = False,
+    lease_duration_in_seconds: int = Field(ge=1, default=600),
+    maximum_memory_in_bytes: int | None = Field(ge=1, default=None),
 ) -> None:
     """
     Batch parse all raw S3 log files in a folder and write the results to a folder of TSV files.
@@ -55,11 +64,28 @@ def reduce_all_dandi_raw_s3_logs(
         greater than one.
     excluded_ips : collections.defaultdict(bool), optional
         A lookup table whose keys are IP addresses to exclude from reduction.
+    coordinate_with_other_nodes : bool, default: False
+        Whether to claim each raw log file through a lease file before reducing it.
+
+        This allows any number of independent invocations (e.g., on different nodes mounting the same shared storage)
+        to split the work between them without duplicating any of it.
+        The lease files are kept in a `.leases` subfolder of the `reduced_s3_logs_folder_path`.
+    lease_duration_in_seconds : int, default: 600
+        Only used if `coordinate_with_other_nodes` is True.
+        Leases are renewed regularly while their file is being reduced; any lease that has not been renewed for this
+        many seconds is assumed to belong to a dead invocation and is reclaimed.
+    maximum_memory_in_bytes : int, optional
+        A global ceiling on the memory (in bytes) used across all workers.
+
+        If specified, the RSS of each worker is sampled while it reduces a file, and the buffer size of each new task
+        is shrunk or grown (up to `maximum_buffer_size_in_bytes`) to fit the memory expected to be available.
+        New tasks are held back while they would risk exceeding the ceiling.
+        A summary of these decisions is written to the `run_reports` subfolder of `reduced_s3_logs_folder_path`.
     """
     excluded_years = excluded_years or []
     excluded_ips = excluded_ips or collections.defaultdict(bool)
 
-    object_key_handler = _get_default_dandi_object_key_handler()
+    leases_folder_path = reduced_s3_logs_folder_path / ".leases" if coordinate_with_other_nodes else None
 
     relative_s3_log_file_paths = [
         raw_s3_log_file_path.relative_to(raw_s3_logs_folder_path)
@@ -82,9 +108,16 @@ def reduce_all_dandi_raw_s3_logs(
     # The .rglob is not naturally sorted; shuffle for more uniform progress updates
     random.shuffle(relative_s3_log_file_paths_to_reduce)
 
-    fields_to_reduce = ["object_key", "timestamp", "bytes_sent", "ip_address"]
-    object_key_parents_to_reduce = ["blobs", "zarr"]
-    line_buffer_tqdm_kwargs = dict(position=1, leave=False)
+    governor = (
+        _MemoryGovernor(
+            maximum_memory_in_bytes=maximum_memory_in_bytes,
+            maximum_number_of_workers=maximum_number_of_workers,
+            maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
+        )
+        if maximum_memory_in_bytes is not None
+        else None
+    )
+
     if maximum_number_of_workers == 1:
         for relative_s3_log_file_path in tqdm.tqdm(
             iterable=relative_s3_log_file_paths_to_reduce,
@@ -101,17 +134,41 @@ def reduce_all_dandi_raw_s3_logs(
             )
             reduced_s3_log_file_path.parent.mkdir(parents=True, exist_ok=True)
 
-            reduce_raw_s3_log(
+            if governor is None:
+                _reduce_dandi_raw_s3_log_task(
+                    raw_s3_log_file_path=raw_s3_log_file_path,
+                    reduced_s3_log_file_path=reduced_s3_log_file_path,
+                    maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
+                    excluded_ips=excluded_ips,
+                    relative_s3_log_file_path=relative_s3_log_file_path,
+                    leases_folder_path=leases_folder_path,
+                    lease_duration_in_seconds=lease_duration_in_seconds,
+                    line_buffer_tqdm_kwargs=dict(position=1, leave=False),
+                )
+                continue
+
+            # Nothing else is ever in flight, so admission always succeeds here
+            file_size_in_bytes = raw_s3_log_file_path.stat().st_size
+            task_id, buffer_size_in_bytes = governor.try_admit(file_size_in_bytes=file_size_in_bytes)
+            memory_usage = _reduce_dandi_raw_s3_log_task(
                 raw_s3_log_file_path=raw_s3_log_file_path,
                 reduced_s3_log_file_path=reduced_s3_log_file_path,
-                fields_to_reduce=fields_to_reduce,
-                object_key_parents_to_reduce=object_key_parents_to_reduce,
-                maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
+                maximum_buffer_size_in_bytes=buffer_size_in_bytes,
                 excluded_ips=excluded_ips,
-                object_key_handler=object_key_handler,
-                line_buffer_tqdm_kwargs=line_buffer_tqdm_kwargs,
+                relative_s3_log_file_path=relative_s3_log_file_path,
+                leases_folder_path=leases_folder_path,
+                lease_duration_in_seconds=lease_duration_in_seconds,
+                line_buffer_tqdm_kwargs=dict(position=1, leave=False),
+                sample_memory_usage=True,
             )
-    else:
+            governor.release(
+                task_id=task_id,
+                file_size_in_bytes=file_size_in_bytes,
+                buffer_size_in_bytes=buffer_size_in_bytes,
+                file_path=str(relative_s3_log_file_path),
+                **(memory_usage or dict(baseline_rss_in_bytes=None, peak_rss_in_bytes=None)),
+            )
+    elif governor is None:
         maximum_buffer_size_in_bytes_per_worker = maximum_buffer_size_in_bytes // maximum_number_of_workers
 
         futures = []
@@ -133,6 +190,9 @@ def reduce_all_dandi_raw_s3_logs(
                         maximum_number_of_workers=maximum_number_of_workers,
                         maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes_per_worker,
                         excluded_ips=excluded_ips,
+                        relative_s3_log_file_path=relative_s3_log_file_path,
+                        leases_folder_path=leases_folder_path,
+                        lease_duration_in_seconds=lease_duration_in_seconds,
                     ),
                 )
 
@@ -148,6 +208,79 @@ def reduce_all_dandi_raw_s3_logs(
             )
             for future in progress_bar_iterable:
                 future.result()  # This is the call that finally triggers the deployment to the workers
+    else:
+        # Tasks are only submitted once the governor admits them, with a buffer size fit to the memory available
+        pending_relative_s3_log_file_paths = collections.deque(relative_s3_log_file_paths_to_reduce)
+        future_to_task = dict()
+        progress_bar = tqdm.tqdm(
+            total=len(relative_s3_log_file_paths_to_reduce),
+            desc=f"Parsing log files using {maximum_number_of_workers} workers...",
+            position=0,
+            leave=True,
+            mininterval=3.0,
+            smoothing=0,  # Use true historical average, not moving average since shuffling makes it more uniform
+            unit="file",
+        )
+        with ProcessPoolExecutor(max_workers=maximum_number_of_workers) as executor:
+            while len(pending_relative_s3_log_file_paths) != 0 or len(future_to_task) != 0:
+                while len(pending_relative_s3_log_file_paths) != 0:
+                    relative_s3_log_file_path = pending_relative_s3_log_file_paths[0]
+                    raw_s3_log_file_path = raw_s3_logs_folder_path / relative_s3_log_file_path
+                    file_size_in_bytes = raw_s3_log_file_path.stat().st_size
+
+                    admission = governor.try_admit(file_size_in_bytes=file_size_in_bytes)
+                    if admission is None:
+                        break  # Throttled; wait for some in-flight tasks to complete
+                    task_id, buffer_size_in_bytes = admission
+                    pending_relative_s3_log_file_paths.popleft()
+
+                    reduced_s3_log_file_path = (
+                        reduced_s3_logs_folder_path
+                        / relative_s3_log_file_path.parent
+                        / f"{relative_s3_log_file_path.stem}.tsv"
+                    )
+                    reduced_s3_log_file_path.parent.mkdir(parents=True, exist_ok=True)
+
+                    future = executor.submit(
+                        _multi_worker_reduce_dandi_raw_s3_log,
+                        raw_s3_log_file_path=raw_s3_log_file_path,
+                        reduced_s3_log_file_path=reduced_s3_log_file_path,
+                        maximum_number_of_workers=maximum_number_of_workers,
+                        maximum_buffer_size_in_bytes=buffer_size_in_bytes,
+                        excluded_ips=excluded_ips,
+                        relative_s3_log_file_path=relative_s3_log_file_path,
+                        leases_folder_path=leases_folder_path,
+                        lease_duration_in_seconds=lease_duration_in_seconds,
+                        sample_memory_usage=True,
+                    )
+                    future_to_task[future] = (
+                        task_id,
+                        relative_s3_log_file_path,
+                        file_size_in_bytes,
+                        buffer_size_in_bytes,
+                    )
+
+                completed_futures, _ = wait(fs=future_to_task.keys(), return_when=FIRST_COMPLETED)
+                for future in completed_futures:
+                    task_id, relative_s3_log_file_path, file_size_in_bytes, buffer_size_in_bytes = future_to_task.pop(
+                        future
+                    )
+                    memory_usage = future.result()
+                    governor.release(
+                        task_id=task_id,
+                        file_size_in_bytes=file_size_in_bytes,
+                        buffer_size_in_bytes=buffer_size_in_bytes,
+                        file_path=str(relative_s3_log_file_path),
+                        **(memory_usage or dict(baseline_rss_in_bytes=None, peak_rss_in_bytes=None)),
+                    )
+                    progress_bar.update(n=1)
+        progress_bar.close()
+
+    if governor is not None:
+        _write_run_report(
+            reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+            run_report=dict(memory_governor=governor.get_report()),
+        )
 
     # Note that empty files and directories are kept to indicate that the file was already reduced and so can be skipped
     # Even if there is no reduced activity in those files
@@ -164,7 +297,11 @@ def _multi_worker_reduce_dandi_raw_s3_log(
     maximum_number_of_workers: int,
     maximum_buffer_size_in_bytes: int,
     excluded_ips: collections.defaultdict[str, bool],
-) -> None:
+    relative_s3_log_file_path: pathlib.Path,
+    leases_folder_path: pathlib.Path | None,
+    lease_duration_in_seconds: int,
+    sample_memory_usage: bool = False,
+) -> dict[str, int] | None:
     """
     A mostly pass-through function to calculate the worker index on the worker and target the correct subfolder.
 
@@ -174,9 +311,6 @@ def _multi_worker_reduce_dandi_raw_s3_log(
     try:
         worker_index = os.getpid() % maximum_number_of_workers
 
-        fields_to_reduce = ["object_key", "timestamp", "bytes_sent", "ip_address"]
-        object_key_parents_to_reduce = ["blobs", "zarr"]
-        object_key_handler = _get_default_dandi_object_key_handler()
         line_buffer_tqdm_kwargs = dict(
             position=worker_index + 1,
             leave=False,
@@ -184,16 +318,19 @@ def _multi_worker_reduce_dandi_raw_s3_log(
             unit="buffer",
         )
 
-        reduce_raw_s3_log(
+        memory_usage = _reduce_dandi_raw_s3_log_task(
             raw_s3_log_file_path=raw_s3_log_file_path,
             reduced_s3_log_file_path=reduced_s3_log_file_path,
-            fields_to_reduce=fields_to_reduce,
-            object_key_parents_to_reduce=object_key_parents_to_reduce,
             maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
             excluded_ips=excluded_ips,
-            object_key_handler=object_key_handler,
+            relative_s3_log_file_path=relative_s3_log_file_path,
+            leases_folder_path=leases_folder_path,
+            lease_duration_in_seconds=lease_duration_in_seconds,
             line_buffer_tqdm_kwargs=line_buffer_tqdm_kwargs,
+            sample_memory_usage=sample_memory_usage,
         )
+
+        return memory_usage
     except Exception as exception:
         message = (
             f"Worker index {worker_index}/{maximum_number_of_workers} reducing {raw_s3_log_file_path} failed!\n\n"
@@ -206,6 +343,86 @@ def _multi_worker_reduce_dandi_raw_s3_log(
     return None
 
 
+def _reduce_dandi_raw_s3_log_task(
+    *,
+    raw_s3_log_file_path: pathlib.Path,
+    reduced_s3_log_file_path: pathlib.Path,
+    maximum_buffer_size_in_bytes: int,
+    excluded_ips: collections.defaultdict[str, bool],
+    relative_s3_log_file_path: pathlib.Path,
+    leases_folder_path: pathlib.Path | None,
+    lease_duration_in_seconds: int,
+    line_buffer_tqdm_kwargs: dict,
+    sample_memory_usage: bool = False,
+) -> dict[str, int] | None:
+    """
+    Reduce a single raw S3 log file with the DANDI defaults, claiming it first if coordinating with other nodes.
+
+    Returns the baseline and peak RSS of the process during the reduction if `sample_memory_usage` is True;
+    otherwise, or if the file was skipped, returns None.
+    """
+    with _get_lease_context(
+        leases_folder_path=leases_folder_path,
+        relative_s3_log_file_path=relative_s3_log_file_path,
+        lease_duration_in_seconds=lease_duration_in_seconds,
+    ) as is_claimed:
+        # Another invocation may own this file, or may have completed it since the listing was made
+        if not is_claimed or reduced_s3_log_file_path.exists():
+            return None
+
+        memory_sampler_context = _PeakMemorySampler() if sample_memory_usage else contextlib.nullcontext()
+        with memory_sampler_context as memory_sampler:
+            reduce_raw_s3_log(
+                raw_s3_log_file_path=raw_s3_log_file_path,
+                reduced_s3_log_file_path=reduced_s3_log_file_path,
+                fields_to_reduce=["object_key", "timestamp", "bytes_sent", "ip_address"],
+                object_key_parents_to_reduce=["blobs", "zarr"],
+                maximum_buffer_size_in_bytes=maximum_buffer_size_in_bytes,
+                excluded_ips=excluded_ips,
+                object_key_handler=_get_default_dandi_object_key_handler(),
+                line_buffer_tqdm_kwargs=line_buffer_tqdm_kwargs,
+            )
+
+    if memory_sampler is None:
+        return None
+
+    memory_usage = dict(
+        baseline_rss_in_bytes=memory_sampler.baseline_rss_in_bytes, peak_rss_in_bytes=memory_sampler.peak_rss_in_bytes
+    )
+    return memory_usage
+
+
+def _write_run_report(*, reduced_s3_logs_folder_path: pathlib.Path, run_report: dict) -> None:
+    """Write a JSON summary of what happened during this run to the `run_reports` subfolder of the reduced logs."""
+    run_reports_folder_path = reduced_s3_logs_folder_path / "run_reports"
+    run_reports_folder_path.mkdir(exist_ok=True)
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    task_id = str(uuid.uuid4())[:5]
+    run_report_file_path = run_reports_folder_path / f"reduction_{timestamp}_{task_id}.json"
+    with run_report_file_path.open(mode="w") as io:
+        json.dump(obj=run_report, fp=io, indent=1)
+
+    return None
+
+
+def _get_lease_context(
+    *,
+    leases_folder_path: pathlib.Path | None,
+    relative_s3_log_file_path: pathlib.Path,
+    lease_duration_in_seconds: int,
+) -> contextlib.AbstractContextManager[bool]:
+    """Claim the file through a lease if coordinating with other nodes; otherwise, the file is always ours."""
+    if leases_folder_path is None:
+        return contextlib.nullcontext(enter_result=True)
+
+    return _hold_lease(
+        leases_folder_path=leases_folder_path,
+        relative_file_path=relative_s3_log_file_path,
+        lease_duration_in_seconds=lease_duration_in_seconds,
+    )
+
+
 def _get_default_dandi_object_key_handler() -> Callable:
     def object_key_handler(*, object_key: str) -> str:
         split_by_slash = object_key.split("/")
@@ -0,0 +1,151 @@
+"""Persistent caches of lookups by IP hash, shared across calls and processes."""
+
+import pathlib
+import sqlite3
+from collections.abc import Iterator, MutableMapping
+from typing import Literal
+
+import yaml
+
+from ._config import (
+    _IP_HASH_CACHE_FILE_PATH,
+    _IP_HASH_NOT_IN_SERVICES_FILE_PATH,
+    _IP_HASH_TO_REGION_FILE_PATH,
+)
+
+_TABLE_NAMES = {
+    "region": "ip_hash_to_region",
+    "services": "ip_hash_not_in_services",
+    "failures": "ip_hash_to_failure_time",
+    "subnets": "subnet_hash_to_region",
+}
+_VALUE_TYPES = {"region": str, "services": bool, "failures": float, "subnets": str}
+_LEGACY_YAML_FILE_PATHS = {"region": _IP_HASH_TO_REGION_FILE_PATH, "services": _IP_HASH_NOT_IN_SERVICES_FILE_PATH}
+
+
+class _IPHashCache(MutableMapping):
+    def __init__(
+        self,
+        *,
+        name: Literal["region", "services", "failures", "subnets"],
+        cache_file_path: pathlib.Path = _IP_HASH_CACHE_FILE_PATH,
+        legacy_yaml_file_path: pathlib.Path | None = None,
+    ) -> None:
+        """
+        A dictionary of IP hashes to cached values that writes every new entry through to an SQLite database.
+
+        The hex digests used as keys are stored as binary blobs in a table without row IDs, so each lookup is a single
+        primary key search. Values found are also kept in memory for the rest of the call. Each new entry is committed
+        as soon as it is set, so an interrupted call keeps every lookup made so far. Write-ahead logging lets any
+        number of processes read the cache while one of them writes to it.
+
+        The YAML file formerly used for the cache is imported the first time the cache is opened.
+
+        Parameters
+        ----------
+        name : "region", "services", "failures", or "subnets"
+            Which cache to open: the regions of IP hashes, the IP hashes known not to belong to any known service,
+            the time of the last failed lookup of IP hashes that could not be resolved, or the regions of the hashes
+            of whole subnets.
+        cache_file_path : pathlib.Path, optional
+            The path to the SQLite database holding all caches.
+        legacy_yaml_file_path : pathlib.Path, optional
+            The path to the YAML file to import.
+            Defaults to the file formerly used for the cache of this `name`, if any.
+        """
+        self.name = name
+        self._table_name = _TABLE_NAMES[name]
+        self._value_type = _VALUE_TYPES[name]
+
+        self._connection = sqlite3.connect(database=cache_file_path, timeout=60.0, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table_name} (ip_hash BLOB PRIMARY KEY, value) WITHOUT ROWID"
+            )
+            self._connection.execute("CREATE TABLE IF NOT EXISTS imported_files (file_path TEXT PRIMARY KEY)")
+
+        self._memo: dict[str, str | bool | float] = dict()
+
+        legacy_yaml_file_path = legacy_yaml_file_path or _LEGACY_YAML_FILE_PATHS.get(name, None)
+        if legacy_yaml_file_path is not None:
+            self._import_legacy_yaml_file(legacy_yaml_file_path=legacy_yaml_file_path)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "_IPHashCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def get(self, ip_hash: str, default: str | bool | float | None = None) -> str | bool | float | None:
+        value = self._memo.get(ip_hash, None)
+        if value is not None:
+            return value
+
+        row = self._connection.execute(
+            f"SELECT value FROM {self._table_name} WHERE ip_hash = ?", (bytes.fromhex(ip_hash),)
+        ).fetchone()
+        if row is None:
+            return default
+
+        value = self._value_type(row[0])
+        self._memo[ip_hash] = value
+
+        return value
+
+    def __getitem__(self, ip_hash: str) -> str | bool | float:
+        value = self.get(ip_hash, None)
+        if value is None:
+            raise KeyError(ip_hash)
+
+        return value
+
+    def __setitem__(self, ip_hash: str, value: str | bool | float) -> None:
+        self._connection.execute(
+            f"INSERT OR REPLACE INTO {self._table_name} (ip_hash, value) VALUES (?, ?)", (bytes.fromhex(ip_hash), value)
+        )
+        self._memo[ip_hash] = value
+
+    def __delitem__(self, ip_hash: str) -> None:
+        cursor = self._connection.execute(
+            f"DELETE FROM {self._table_name} WHERE ip_hash = ?", (bytes.fromhex(ip_hash),)
+        )
+        self._memo.pop(ip_hash, None)
+        if cursor.rowcount == 0:
+            raise KeyError(ip_hash)
+
+    def __iter__(self) -> Iterator[str]:
+        for (ip_hash,) in self._connection.execute(f"SELECT ip_hash FROM {self._table_name}"):
+            yield ip_hash.hex()
+
+    def __len__(self) -> int:
+        (number_of_entries,) = self._connection.execute(f"SELECT COUNT(*) FROM {self._table_name}").fetchone()
+
+        return number_of_entries
+
+    def _import_legacy_yaml_file(self, *, legacy_yaml_file_path: pathlib.Path) -> None:
+        if not legacy_yaml_file_path.exists():
+            return
+
+        is_imported = self._connection.execute(
+            "SELECT 1 FROM imported_files WHERE file_path = ?", (str(legacy_yaml_file_path),)
+        ).fetchone()
+        if is_imported is not None:
+            return
+
+        with open(file=legacy_yaml_file_path) as stream:
+            legacy_cache = yaml.load(stream=stream, Loader=yaml.SafeLoader) or dict()
+
+        # Entries already in the database are newer than those of the file
+        self._connection.execute("BEGIN IMMEDIATE")
+        with self._connection:
+            self._connection.executemany(
+                f"INSERT OR IGNORE INTO {self._table_name} (ip_hash, value) VALUES (?, ?)",
+                ((bytes.fromhex(ip_hash), value) for ip_hash, value in legacy_cache.items()),
+            )
+            self._connection.execute("INSERT INTO imported_files (file_path) VALUES (?)", (str(legacy_yaml_file_path),))
@@ -0,0 +1,223 @@
+"""Fast matching of IP addresses against the address ranges of many services or regions at once."""
+
+import heapq
+import ipaddress
+import json
+import os
+import pathlib
+import struct
+from collections.abc import Iterable
+
+import numpy
+
+# IPv4 addresses are embedded in the IPv6 space as IPv4-mapped addresses (::ffff:a.b.c.d)
+_IPV4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+_IPV4_MAPPED_START = int.from_bytes(bytes=_IPV4_MAPPED_PREFIX + b"\x00" * 4, byteorder="big")
+_IPV4_MAPPED_STOP = _IPV4_MAPPED_START + 2**32
+_ADDRESS_SPACE_SIZE = 2**128
+_FILE_SIGNATURE = b"IPINTVL2"
+_FILE_HEADER_FORMAT = "<8sQQ"  # Signature, number of intervals, and size of the encoded regions
+
+
+class _IPIntervalIndex:
+    def __init__(self, *, interval_starts: numpy.ndarray, interval_region_indices: numpy.ndarray, regions: list[str]):
+        """
+        A sorted table of disjoint address intervals, each labeled with a region.
+
+        Addresses are 128 bits wide, with IPv4 embedded as IPv4-mapped IPv6, and stored as big-endian 16 byte strings,
+        which sort the same way as the integers they encode. Each lookup is then a binary search over the start of
+        every interval. The IPv4-mapped block (::ffff:0:0/96) is cut out of every IPv6 range, so that IPv4 addresses
+        only ever match IPv4 ranges.
+
+        Use `from_cidr_addresses_and_regions` or `from_address_ranges_and_regions` to build an index, or `load` to map
+        one previously saved with `save`.
+
+        Parameters
+        ----------
+        interval_starts : numpy.ndarray
+            The first address of each interval, in sorted order, as an array of dtype "S16".
+            Each interval ends where the next one starts.
+        interval_region_indices : numpy.ndarray
+            The index into `regions` of the region of each interval, or -1 for intervals between ranges.
+        regions : list of str
+            The distinct region strings.
+        """
+        self._interval_starts = interval_starts
+        self._interval_region_indices = interval_region_indices
+        self.regions = regions
+
+    @classmethod
+    def from_cidr_addresses_and_regions(
+        cls, *, cidr_addresses_and_regions: Iterable[tuple[str, str]]
+    ) -> "_IPIntervalIndex":
+        """
+        Index CIDR ranges given in order of priority.
+
+        Where ranges overlap, an address takes the region of the range listed first, so a lookup returns the same
+        match as scanning the ranges in order.
+        """
+        integer_ranges = []
+        for cidr_address, region in cidr_addresses_and_regions:
+            network = ipaddress.ip_network(address=cidr_address, strict=False)
+            first_address = _get_address_as_integer(packed_address=network.network_address.packed)
+            integer_ranges.extend(
+                _get_integer_ranges(
+                    start=first_address,
+                    stop=first_address + network.num_addresses,
+                    region=region,
+                    is_ipv6=network.version == 6,
+                )
+            )
+
+        return cls._from_integer_ranges(integer_ranges=integer_ranges)
+
+    @classmethod
+    def from_address_ranges_and_regions(
+        cls, *, address_ranges_and_regions: Iterable[tuple[str, str, str]]
+    ) -> "_IPIntervalIndex":
+        """Index inclusive ranges of (first address, last address, region) given in order of priority."""
+        integer_ranges = []
+        for first_ip_address, last_ip_address, region in address_ranges_and_regions:
+            first_address = ipaddress.ip_address(address=first_ip_address)
+            integer_ranges.extend(
+                _get_integer_ranges(
+                    start=_get_address_as_integer(packed_address=first_address.packed),
+                    stop=_get_address_as_integer(packed_address=ipaddress.ip_address(address=last_ip_address).packed)
+                    + 1,
+                    region=region,
+                    is_ipv6=first_address.version == 6,
+                )
+            )
+
+        return cls._from_integer_ranges(integer_ranges=integer_ranges)
+
+    @classmethod
+    def _from_integer_ranges(cls, *, integer_ranges: list[tuple[int, int, str]]) -> "_IPIntervalIndex":
+        region_indices_by_region = dict()
+        intervals = [
+            (start, stop, priority, region_indices_by_region.setdefault(region, len(region_indices_by_region)))
+            for priority, (start, stop, region) in enumerate(integer_ranges)
+        ]
+        intervals.sort()
+
+        boundaries = sorted(
+            {start for start, _, _, _ in intervals}
+            | {stop for _, stop, _, _ in intervals if stop < _ADDRESS_SPACE_SIZE}
+        )
+
+        # Sweep across the boundaries, keeping the ranges open at each one by priority
+        interval_starts = []
+        interval_region_indices = []
+        open_ranges = []
+        next_interval_index = 0
+        for boundary in boundaries:
+            while next_interval_index < len(intervals) and intervals[next_interval_index][0] <= boundary:
+                _, stop, priority, region_index = intervals[next_interval_index]
+                heapq.heappush(open_ranges, (priority, stop, region_index))
+                next_interval_index += 1
+            while len(open_ranges) != 0 and open_ranges[0][1] <= boundary:
+                heapq.heappop(open_ranges)
+
+            region_index = open_ranges[0][2] if len(open_ranges) != 0 else -1
+            if len(interval_region_indices) != 0 and interval_region_indices[-1] == region_index:
+                continue  # Merge neighboring intervals of the same region
+            interval_starts.append(boundary.to_bytes(length=16, byteorder="big"))
+            interval_region_indices.append(region_index)
+
+        return cls(
+            interval_starts=numpy.array(interval_starts, dtype="S16"),
+            interval_region_indices=numpy.array(interval_region_indices, dtype=numpy.int32),
+            regions=list(region_indices_by_region),
+        )
+
+    def save(self, *, file_path: pathlib.Path) -> None:
+        """Write the index to a single binary file that `load` can map back into memory."""
+        encoded_regions = json.dumps(self.regions).encode(encoding="utf-8")
+        header = struct.pack(_FILE_HEADER_FORMAT, _FILE_SIGNATURE, len(self._interval_starts), len(encoded_regions))
+
+        # Write to a temporary file first so that readers never see a partial index
+        temporary_file_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+        with temporary_file_path.open(mode="wb") as io:
+            io.write(header)
+            io.write(numpy.ascontiguousarray(self._interval_starts, dtype="S16").tobytes())
+            io.write(numpy.ascontiguousarray(self._interval_region_indices, dtype="<i4").tobytes())
+            io.write(encoded_regions)
+        temporary_file_path.replace(file_path)
+
+    @staticmethod
+    def is_saved(*, file_path: pathlib.Path) -> bool:
+        """Whether an index was saved at the given path in the current file format, and so can be loaded."""
+        if not file_path.exists():
+            return False
+
+        with file_path.open(mode="rb") as io:
+            return io.read(len(_FILE_SIGNATURE)) == _FILE_SIGNATURE
+
+    @classmethod
+    def load(cls, *, file_path: pathlib.Path) -> "_IPIntervalIndex":
+        """Map an index saved by `save` into memory without parsing it."""
+        memory_map = numpy.memmap(filename=file_path, dtype=numpy.uint8, mode="r")
+
+        header_size = struct.calcsize(_FILE_HEADER_FORMAT)
+        signature, number_of_intervals, encoded_regions_size = struct.unpack(
+            _FILE_HEADER_FORMAT, memory_map[:header_size].tobytes()
+        )
+        if signature != _FILE_SIGNATURE:
+            message = f"The file at {file_path} is not an IP interval index!"
+            raise ValueError(message)
+
+        region_indices_offset = header_size + 16 * number_of_intervals
+        regions_offset = region_indices_offset + 4 * number_of_intervals
+
+        return cls(
+            interval_starts=memory_map[header_size:region_indices_offset].view(dtype="S16"),
+            interval_region_indices=memory_map[region_indices_offset:regions_offset].view(dtype="<i4"),
+            regions=json.loads(memory_map[regions_offset : regions_offset + encoded_regions_size].tobytes()),
+        )
+
+    def lookup(self, *, ip_address: str) -> str | None:
+        """Get the region of an IP address, or None if no range contains it."""
+        return self.lookup_many(ip_addresses=[ip_address])[0]
+
+    def lookup_many(self, *, ip_addresses: Iterable[str]) -> list[str | None]:
+        """Get the region of each IP address, or None for those no range contains."""
+        packed_addresses = numpy.array(
+            [_get_packed_ipv6_address(ip_address=ip_address) for ip_address in ip_addresses], dtype="S16"
+        )
+        if len(packed_addresses) == 0 or len(self._interval_starts) == 0:
+            return [None] * len(packed_addresses)
+
+        interval_indices = numpy.searchsorted(self._interval_starts, packed_addresses, side="right") - 1
+        region_indices = numpy.where(interval_indices >= 0, self._interval_region_indices[interval_indices], -1)
+
+        return [self.regions[region_index] if region_index != -1 else None for region_index in region_indices.tolist()]
+
+
+def _get_packed_ipv6_address(*, ip_address: str) -> bytes:
+    packed_address = ipaddress.ip_address(address=ip_address).packed
+    if len(packed_address) == 4:
+        return _IPV4_MAPPED_PREFIX + packed_address
+
+    return packed_address
+
+
+def _get_address_as_integer(*, packed_address: bytes) -> int:
+    if len(packed_address) == 4:
+        packed_address = _IPV4_MAPPED_PREFIX + packed_address
+
+    return int.from_bytes(bytes=packed_address, byteorder="big")
+
+
+def _get_integer_ranges(*, start: int, stop: int, region: str, is_ipv6: bool) -> list[tuple[int, int, str]]:
+    """Get the integer range of addresses from start to stop, split around the IPv4-mapped block if it is IPv6."""
+    if not is_ipv6:
+        return [(start, stop, region)]
+
+    # Ranges such as ::/0 would otherwise also contain every IPv4 address
+    integer_ranges = [
+        (range_start, range_stop, region)
+        for range_start, range_stop in [(start, min(stop, _IPV4_MAPPED_START)), (max(start, _IPV4_MAPPED_STOP), stop)]
+        if range_start < range_stop
+    ]
+
+    return integer_ranges
@@ -0,0 +1,75 @@
+"""Offline lookups of the regions of IP addresses from a local database of IP address ranges."""
+
+import pathlib
+
+import pandas
+
+from ._ip_interval_index import _IPIntervalIndex
+from ._ipinfo_resolver import _get_region_string_from_details
+
+
+class _IPRangeDatabaseResolver:
+    def __init__(self, *, ip_range_database_file_path: pathlib.Path) -> None:
+        """
+        Look up the regions of IP addresses offline from a CSV file of IP address ranges.
+
+        The CSV file must have a header with the columns `start_ip`, `end_ip`, and `country`, and optionally `region`;
+        IPv4 and IPv6 ranges may be mixed, and other columns are ignored. The region strings are formed the same way as
+        from the `ipinfo` API.
+
+        The first time a CSV file is used, its ranges are compiled into a sorted table of address intervals saved next
+        to it as `<file name>.index`, which later calls memory map instead of parsing the CSV file again. The table is
+        compiled again whenever the CSV file is modified.
+
+        Parameters
+        ----------
+        ip_range_database_file_path : pathlib.Path
+            The path to the CSV file of IP address ranges.
+        """
+        self.ip_range_database_file_path = ip_range_database_file_path
+
+        index_file_path = ip_range_database_file_path.with_name(f"{ip_range_database_file_path.name}.index")
+        if (
+            not _IPIntervalIndex.is_saved(file_path=index_file_path)
+            or index_file_path.stat().st_mtime_ns < ip_range_database_file_path.stat().st_mtime_ns
+        ):
+            _compile_ip_range_database(
+                ip_range_database_file_path=ip_range_database_file_path, index_file_path=index_file_path
+            )
+        self._ip_interval_index = _IPIntervalIndex.load(file_path=index_file_path)
+
+    def close(self) -> None:
+        pass
+
+    def resolve(self, *, ip_addresses: list[str]) -> dict[str, str]:
+        """Get the region string of each IP address within a range of the database."""
+        regions = self._ip_interval_index.lookup_many(ip_addresses=ip_addresses)
+
+        return {ip_address: region for ip_address, region in zip(ip_addresses, regions) if region is not None}
+
+
+def _compile_ip_range_database(*, ip_range_database_file_path: pathlib.Path, index_file_path: pathlib.Path) -> None:
+    # Country codes such as 'NA' (Namibia) must not be read as missing values
+    ip_ranges = pandas.read_csv(
+        filepath_or_buffer=ip_range_database_file_path,
+        usecols=lambda column: column in ("start_ip", "end_ip", "country", "region"),
+        dtype=str,
+        keep_default_na=False,
+    )
+    countries = ip_ranges["country"].tolist()
+    regions = ip_ranges["region"].tolist() if "region" in ip_ranges.columns else [""] * len(ip_ranges)
+
+    address_ranges_and_regions = (
+        (
+            start_ip,
+            end_ip,
+            _get_region_string_from_details(details={"country": country or None, "region": region or None}),
+        )
+        for start_ip, end_ip, country, region in zip(
+            ip_ranges["start_ip"].tolist(), ip_ranges["end_ip"].tolist(), countries, regions
+        )
+    )
+    ip_interval_index = _IPIntervalIndex.from_address_ranges_and_regions(
+        address_ranges_and_regions=address_ranges_and_regions
+    )
+    ip_interval_index.save(file_path=index_file_path)
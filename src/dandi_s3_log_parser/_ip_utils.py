@@ -4,37 +4,340 @@ import functools
 import hashlib
 import ipaddress
 import os
-import traceback
-from typing import Literal
-
-import ipinfo
-import requests
-import yaml
-
-from ._config import (
-    _IP_HASH_NOT_IN_SERVICES_FILE_PATH,
-    _IP_HASH_TO_REGION_FILE_PATH,
-)
-from ._error_collection import _collect_error
+import pathlib
+import time
+from collections.abc import Iterable, MutableMapping
+
+import numpy
+import pandas
+from pydantic import FilePath
+
+from ._cidr_range_cache import _get_cidr_range_snapshot_folder_path, _load_cidr_range
 from ._globals import _KNOWN_SERVICES
+from ._ip_interval_index import _IPIntervalIndex
+from ._ip_range_database_resolver import _IPRangeDatabaseResolver
+from ._ipinfo_resolver import _IPINFO_API_URL, _IPInfoResolver
+
+_IP_LOOKUP_FAILURE_TIME_TO_LIVE_IN_SECONDS = 3600.0
+_INCONSISTENT_SUBNET_REGION = ""  # Marks subnets whose IP addresses were found in more than one region
 
 
 def get_region_from_ip_address(
-    ip_address: str, ip_hash_to_region: dict[str, str], ip_hash_not_in_services: dict[str, bool]
+    ip_address: str,
+    ip_hash_to_region: MutableMapping[str, str],
+    ip_hash_not_in_services: MutableMapping[str, bool],
+    ip_range_database_file_path: FilePath | None = None,
+    ip_hash_to_failure_time: MutableMapping[str, float] | None = None,
+    subnet_hash_to_region: MutableMapping[str, str] | None = None,
+    subnet_prefix_lengths: tuple[int, int] = (24, 48),
+    subnet_consistency_sampling_rate: float = 0.05,
+    ip_lookup_failure_time_to_live_in_seconds: float = _IP_LOOKUP_FAILURE_TIME_TO_LIVE_IN_SECONDS,
 ) -> str | None:
     """
     If the parsed S3 logs are meant to be shared openly, the remote IP could be used to directly identify individuals.
 
     Instead, identify the generic region of the world the request came from and report that instead.
     """
-    if ip_address == "unknown":
-        return "unknown"
+    (region,) = get_regions_from_ip_addresses(
+        ip_addresses=[ip_address],
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+        ip_hash_to_failure_time=ip_hash_to_failure_time,
+        subnet_hash_to_region=subnet_hash_to_region,
+        subnet_prefix_lengths=subnet_prefix_lengths,
+        subnet_consistency_sampling_rate=subnet_consistency_sampling_rate,
+        ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
+    )
+
+    return region
+
+
+def get_regions_from_ip_addresses(
+    ip_addresses: Iterable[str] | numpy.ndarray | pandas.Series,
+    ip_hash_to_region: MutableMapping[str, str],
+    ip_hash_not_in_services: MutableMapping[str, bool],
+    ip_range_database_file_path: FilePath | None = None,
+    ip_hash_to_failure_time: MutableMapping[str, float] | None = None,
+    subnet_hash_to_region: MutableMapping[str, str] | None = None,
+    subnet_prefix_lengths: tuple[int, int] = (24, 48),
+    subnet_consistency_sampling_rate: float = 0.05,
+    ip_lookup_failure_time_to_live_in_seconds: float = _IP_LOOKUP_FAILURE_TIME_TO_LIVE_IN_SECONDS,
+) -> numpy.ndarray:
+    """
+    Get the region of each of many IP addresses, looking up each distinct IP address only once.
+
+    Parameters
+    ----------
+    ip_addresses : iterable of str, numpy.ndarray, or pandas.Series
+        The IP addresses, typically with many repeats.
+    ip_hash_to_region : mapping of str to str
+        The cache of regions by IP hash, updated in place with any new lookups.
+    ip_hash_not_in_services : mapping of str to bool
+        The cache of IP hashes known not to belong to any of the known services, updated in place.
+    ip_range_database_file_path : FilePath, optional
+        The path to a CSV file of IP address ranges with the columns `start_ip`, `end_ip`, `country`, and optionally
+        `region`, used to look up IP addresses offline before falling back to `ipinfo`.
+        By default, only `ipinfo` is used.
+    ip_hash_to_failure_time : mapping of str to float, optional
+        The cache of the time of the last failed lookup of IP hashes that could not be resolved, updated in place.
+        IP hashes that failed within `ip_lookup_failure_time_to_live_in_seconds` are reported as 'unknown' without
+        being looked up again.
+        By default, failed lookups are not remembered.
+    subnet_hash_to_region : mapping of str to str, optional
+        The cache of regions by the salted hash of whole subnets, updated in place with any new lookups.
+        IP addresses missing from `ip_hash_to_region` then take the region of their subnet if it is known, so only
+        one IP address per subnet is looked up. Subnets found to span more than one region are no longer used.
+        By default, every IP address is looked up on its own.
+    subnet_prefix_lengths : tuple of int, default: (24, 48)
+        The prefix lengths of the IPv4 and IPv6 subnets used by `subnet_hash_to_region`.
+    subnet_consistency_sampling_rate : float, default: 0.05
+        The fraction of IP addresses taking the region of their subnet that are still looked up on their own, to
+        check that the subnet does not span more than one region. The sample is a fixed subset of IP hashes.
+    ip_lookup_failure_time_to_live_in_seconds : float, default: 3600.0
+        The number of seconds after a failed lookup during which the IP hash is not looked up again.
+        Set to 0 to look up every IP hash regardless of when it last failed.
+
+    Returns
+    -------
+    regions : numpy.ndarray
+        The region of each IP address, in the same order.
+    """
+    if not isinstance(ip_addresses, pandas.Series):
+        ip_addresses = pandas.Series(data=numpy.asarray(ip_addresses, dtype=object))
+    # Factorizing a categorical series reuses its existing codes
+    codes, unique_ip_addresses = pandas.factorize(values=ip_addresses)
+    unique_ip_addresses = numpy.asarray(unique_ip_addresses, dtype=object)
+
+    unique_regions = numpy.empty(shape=len(unique_ip_addresses), dtype=object)
+    missed_indices = []
+    for index, ip_address in enumerate(unique_ip_addresses):
+        if ip_address == "unknown":
+            unique_regions[index] = "unknown"
+            continue
+
+        # Hash for anonymization within the cache
+        ip_hash = _get_ip_hash(ip_address=ip_address)
+        region = ip_hash_to_region.get(ip_hash, None)
+        if region is not None:
+            unique_regions[index] = region
+        else:
+            missed_indices.append((index, ip_hash))
 
-    if "IPINFO_CREDENTIALS" not in os.environ:
-        message = "The environment variable 'IPINFO_CREDENTIALS' must be set to import `dandi_s3_log_parser`!"
-        raise ValueError(message)  # pragma: no cover
-    ipinfo_credentials = os.environ["IPINFO_CREDENTIALS"]
+    # Determine if IP address belongs to GitHub, AWS, Google, or known VPNs
+    # Azure not yet easily doable; keep an eye on
+    # https://learn.microsoft.com/en-us/answers/questions/1410071/up-to-date-azure-public-api-to-get-azure-ip-ranges
+    # maybe it will change in the future
+    service_missed_indices = [
+        (index, ip_hash) for index, ip_hash in missed_indices if ip_hash_not_in_services.get(ip_hash, None) is None
+    ]
+    region_service_strings = (
+        _get_ip_interval_index().lookup_many(
+            ip_addresses=[unique_ip_addresses[index] for index, _ in service_missed_indices]
+        )
+        if len(service_missed_indices) != 0
+        else []
+    )
+    for (index, ip_hash), region_service_string in zip(service_missed_indices, region_service_strings):
+        if region_service_string is not None:
+            ip_hash_to_region[ip_hash] = region_service_string
+            unique_regions[index] = region_service_string
+        else:
+            ip_hash_not_in_services[ip_hash] = True
+
+    # Then the regions of whole subnets, still looking up a sample of their IP addresses to check for consistency
+    # Of the subnets not yet known, only one IP address each is looked up at first; the rest then take its region
+    subnet_hashes = dict()
+    subnet_regions_to_check = dict()
+    subnet_hashes_to_look_up = set()
+    deferred_indices = dict()
+    if subnet_hash_to_region is not None:
+        for index, ip_hash in missed_indices:
+            if unique_regions[index] is not None:
+                continue
+
+            subnet_hash = _get_subnet_hash(
+                ip_address=unique_ip_addresses[index], subnet_prefix_lengths=subnet_prefix_lengths
+            )
+            subnet_hashes[index] = subnet_hash
+            subnet_region = subnet_hash_to_region.get(subnet_hash, None)
+            if subnet_region is None:
+                if subnet_hash in subnet_hashes_to_look_up:
+                    deferred_indices[index] = ip_hash
+                subnet_hashes_to_look_up.add(subnet_hash)
+            _apply_subnet_region(
+                index=index,
+                ip_hash=ip_hash,
+                unique_regions=unique_regions,
+                subnet_region=subnet_region,
+                subnet_regions_to_check=subnet_regions_to_check,
+                subnet_consistency_sampling_rate=subnet_consistency_sampling_rate,
+            )
+
+    # Then all the others together through each region resolver in turn
+    region_resolvers = _get_region_resolvers(ip_range_database_file_path=ip_range_database_file_path)
+    _resolve_regions(
+        indices_and_ip_hashes=[
+            (index, ip_hash)
+            for index, ip_hash in missed_indices
+            if unique_regions[index] is None and index not in deferred_indices
+        ],
+        unique_ip_addresses=unique_ip_addresses,
+        unique_regions=unique_regions,
+        region_resolvers=region_resolvers,
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_to_failure_time=ip_hash_to_failure_time,
+        subnet_hashes=subnet_hashes,
+        subnet_hash_to_region=subnet_hash_to_region,
+        subnet_regions_to_check=subnet_regions_to_check,
+        ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
+    )
+    if len(deferred_indices) != 0:
+        for index, ip_hash in deferred_indices.items():
+            _apply_subnet_region(
+                index=index,
+                ip_hash=ip_hash,
+                unique_regions=unique_regions,
+                subnet_region=subnet_hash_to_region.get(subnet_hashes[index], None),
+                subnet_regions_to_check=subnet_regions_to_check,
+                subnet_consistency_sampling_rate=subnet_consistency_sampling_rate,
+            )
+        _resolve_regions(
+            indices_and_ip_hashes=[
+                (index, ip_hash) for index, ip_hash in deferred_indices.items() if unique_regions[index] is None
+            ],
+            unique_ip_addresses=unique_ip_addresses,
+            unique_regions=unique_regions,
+            region_resolvers=region_resolvers,
+            ip_hash_to_region=ip_hash_to_region,
+            ip_hash_to_failure_time=ip_hash_to_failure_time,
+            subnet_hashes=subnet_hashes,
+            subnet_hash_to_region=subnet_hash_to_region,
+            subnet_regions_to_check=subnet_regions_to_check,
+            ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
+        )
+
+    regions = unique_regions[codes]
+
+    return regions
+
+
+def _resolve_regions(
+    *,
+    indices_and_ip_hashes: list[tuple[int, str]],
+    unique_ip_addresses: numpy.ndarray,
+    unique_regions: numpy.ndarray,
+    region_resolvers: tuple[_IPRangeDatabaseResolver | _IPInfoResolver, ...],
+    ip_hash_to_region: MutableMapping[str, str],
+    ip_hash_to_failure_time: MutableMapping[str, float] | None,
+    subnet_hashes: dict[int, str],
+    subnet_hash_to_region: MutableMapping[str, str] | None,
+    subnet_regions_to_check: dict[int, str],
+    ip_lookup_failure_time_to_live_in_seconds: float,
+) -> None:
+    """Look up the regions of IP addresses through each region resolver in turn, except those that failed recently."""
+    current_time = time.time()
+    resolver_missed_indices = []
+    for index, ip_hash in indices_and_ip_hashes:
+        failure_time = ip_hash_to_failure_time.get(ip_hash, None) if ip_hash_to_failure_time is not None else None
+        if failure_time is not None and current_time - failure_time < ip_lookup_failure_time_to_live_in_seconds:
+            unique_regions[index] = subnet_regions_to_check.get(index, "unknown")
+        else:
+            resolver_missed_indices.append((index, ip_hash))
+
+    for region_resolver in region_resolvers:
+        if len(resolver_missed_indices) == 0:
+            break
+
+        regions_by_ip_address = region_resolver.resolve(
+            ip_addresses=[unique_ip_addresses[index] for index, _ in resolver_missed_indices]
+        )
+        for index, ip_hash in resolver_missed_indices:
+            region_string = regions_by_ip_address.get(unique_ip_addresses[index], None)
+            if region_string is not None:
+                ip_hash_to_region[ip_hash] = region_string
+                unique_regions[index] = region_string
+                if ip_hash_to_failure_time is not None:
+                    ip_hash_to_failure_time.pop(ip_hash, None)
+                if index in subnet_hashes and region_string != "unknown":
+                    _update_subnet_region(
+                        subnet_hash=subnet_hashes[index],
+                        region=region_string,
+                        subnet_hash_to_region=subnet_hash_to_region,
+                    )
+        resolver_missed_indices = [
+            (index, ip_hash) for index, ip_hash in resolver_missed_indices if unique_regions[index] is None
+        ]
+
+    # Report the generic 'unknown' for the rest but do not cache, so the lookup is tried again once the failure expires
+    # Those sampled from a known subnet keep its region
+    for index, ip_hash in resolver_missed_indices:
+        unique_regions[index] = subnet_regions_to_check.get(index, "unknown")
+        if ip_hash_to_failure_time is not None:
+            ip_hash_to_failure_time[ip_hash] = current_time
+
+
+def _apply_subnet_region(
+    *,
+    index: int,
+    ip_hash: str,
+    unique_regions: numpy.ndarray,
+    subnet_region: str | None,
+    subnet_regions_to_check: dict[int, str],
+    subnet_consistency_sampling_rate: float,
+) -> None:
+    if subnet_region is None or subnet_region == _INCONSISTENT_SUBNET_REGION:
+        return
+
+    if _is_ip_hash_sampled(ip_hash=ip_hash, sampling_rate=subnet_consistency_sampling_rate):
+        subnet_regions_to_check[index] = subnet_region
+    else:
+        unique_regions[index] = subnet_region
+
+
+def _get_subnet_hash(*, ip_address: str, subnet_prefix_lengths: tuple[int, int]) -> str:
+    address = ipaddress.ip_address(address=ip_address)
+    prefix_length = subnet_prefix_lengths[0] if address.version == 4 else subnet_prefix_lengths[1]
+    subnet = ipaddress.ip_network(address=f"{address}/{prefix_length}", strict=False)
+
+    # Salted the same way as single IP addresses; the prefix length keeps subnets of each length apart
+    return _get_ip_hash(ip_address=str(subnet))
+
+
+def _is_ip_hash_sampled(*, ip_hash: str, sampling_rate: float) -> bool:
+    # The salted hashes are uniformly distributed, so their leading bits make a fixed and unbiased sample
+    return int(ip_hash[:8], base=16) < sampling_rate * 2**32
+
+
+def _update_subnet_region(*, subnet_hash: str, region: str, subnet_hash_to_region: MutableMapping[str, str]) -> None:
+    subnet_region = subnet_hash_to_region.get(subnet_hash, None)
+    if subnet_region is None:
+        subnet_hash_to_region[subnet_hash] = region
+    elif subnet_region != region and subnet_region != _INCONSISTENT_SUBNET_REGION:
+        # Mark rather than remove the subnet, so it is not cached again from the next lookup within it
+        subnet_hash_to_region[subnet_hash] = _INCONSISTENT_SUBNET_REGION
+
+
+def _has_failed_ip_addresses(
+    *,
+    ip_addresses: numpy.ndarray | pandas.Series,
+    regions: numpy.ndarray,
+    ip_hash_to_failure_time: MutableMapping[str, float],
+) -> bool:
+    """Check if any of the IP addresses reported as 'unknown' were so because their lookup failed."""
+    ip_addresses = numpy.asarray(ip_addresses, dtype=object)
+    unknown_ip_addresses = pandas.unique(values=ip_addresses[regions == "unknown"])
+
+    return any(
+        _get_ip_hash(ip_address=ip_address) in ip_hash_to_failure_time
+        for ip_address in unknown_ip_addresses
+        if ip_address != "unknown"
+    )
 
+
+@functools.lru_cache
+def _get_ip_hash_salt() -> bytes:
+    """Read the salt of the IP hashes from the environment once per process."""
     if "IP_HASH_SALT" not in os.environ:
         message = (
             "The environment variable 'IP_HASH_SALT' must be set to import `dandi_s3_log_parser`! "
@@ -42,77 +345,84 @@ def get_region_from_ip_address(
             "and then use the `get_hash_salt` helper function and set it to the correct value."
         )
         raise ValueError(message)  # pragma: no cover
-    ip_hash_salt = bytes.fromhex(os.environ["IP_HASH_SALT"])
 
-    # Hash for anonymization within the cache
-    ip_hash = hashlib.sha1(string=bytes(ip_address, "utf-8") + ip_hash_salt).hexdigest()
+    return bytes.fromhex(os.environ["IP_HASH_SALT"])
 
-    # Early return from the cache for faster performance
-    lookup_result = ip_hash_to_region.get(ip_hash, None)
-    if lookup_result is not None:
-        return lookup_result
 
-    # Determine if IP address belongs to GitHub, AWS, Google, or known VPNs
-    # Azure not yet easily doable; keep an eye on
-    # https://learn.microsoft.com/en-us/answers/questions/1410071/up-to-date-azure-public-api-to-get-azure-ip-ranges
-    # maybe it will change in the future
-    if ip_hash_not_in_services.get(ip_hash, None) is None:
-        for service_name in _KNOWN_SERVICES:
-            cidr_addresses_and_subregions = _get_cidr_address_ranges_and_subregions(service_name=service_name)
-
-            matched_cidr_address_and_subregion = next(
-                (
-                    (cidr_address, subregion)
-                    for cidr_address, subregion in cidr_addresses_and_subregions
-                    if ipaddress.ip_address(address=ip_address) in ipaddress.ip_network(address=cidr_address)
-                ),
-                None,
-            )
-            if matched_cidr_address_and_subregion is not None:
-                region_service_string = service_name
-
-                subregion = matched_cidr_address_and_subregion[1]
-                if subregion is not None:
-                    region_service_string += f"/{subregion}"
-
-                ip_hash_to_region[ip_hash] = region_service_string
-                return region_service_string
-    ip_hash_not_in_services[ip_hash] = True
-
-    # Log errors in IP fetching
-    # Lines cannot be covered without testing on a real IP
-    try:  # pragma: no cover
-        handler = ipinfo.getHandler(access_token=ipinfo_credentials)
-        details = handler.getDetails(ip_address=ip_address)
-
-        country = details.details.get("country", None)
-        region = details.details.get("region", None)
-
-        region_string = ""  # Not technically necessary, but quiets the linter
-        match (country is None, region is None):
-            case (True, True):
-                region_string = "unknown"
-            case (True, False):
-                region_string = region
-            case (False, True):
-                region_string = country
-            case (False, False):
-                region_string = f"{country}/{region}"
-        ip_hash_to_region[ip_hash] = region_string
-
-        return region_string
-    except ipinfo.exceptions.RequestQuotaExceededError:  # pragma: no cover
-        # Return the generic 'unknown' but do not cache
-        return "unknown"
-    except Exception as exception:  # pragma: no cover
-        message = (
-            f"Error fetching IP information for {ip_address}!\n\n"
-            f"{type(exception)}: {exception}\n\n"
-            f"{traceback.format_exc()}",
-        )
-        _collect_error(message=message, error_type="ipinfo")
+@functools.lru_cache
+def _get_ipinfo_credentials() -> str:
+    """Read the `ipinfo` credentials from the environment once per process."""
+    if "IPINFO_CREDENTIALS" not in os.environ:
+        message = "The environment variable 'IPINFO_CREDENTIALS' must be set to import `dandi_s3_log_parser`!"
+        raise ValueError(message)  # pragma: no cover
+
+    return os.environ["IPINFO_CREDENTIALS"]
+
+
+def _get_ip_hash(*, ip_address: str) -> str:
+    # The salt is appended after the IP address, so the hasher cannot be pre-seeded with it and copied per address
+    return hashlib.sha1(string=bytes(ip_address, "utf-8") + _get_ip_hash_salt()).hexdigest()
+
+
+@functools.lru_cache
+def _get_ipinfo_resolver() -> _IPInfoResolver:
+    """
+    Share a single `ipinfo` resolver, and its pool of connections, across all lookups of the process.
+
+    The `IPINFO_API_URL` environment variable can point the resolver to a stand-in for the `ipinfo` API.
+    """
+    return _IPInfoResolver(
+        access_token=_get_ipinfo_credentials(), api_url=os.environ.get("IPINFO_API_URL", _IPINFO_API_URL)
+    )
+
+
+@functools.lru_cache
+def _get_region_resolvers(
+    *, ip_range_database_file_path: pathlib.Path | None
+) -> tuple[_IPRangeDatabaseResolver | _IPInfoResolver, ...]:
+    """Get the resolvers used to look up the regions of IP addresses, in the order they are tried."""
+    if ip_range_database_file_path is None:
+        return (_get_ipinfo_resolver(),)
+
+    ip_range_database_resolver = _IPRangeDatabaseResolver(
+        ip_range_database_file_path=pathlib.Path(ip_range_database_file_path)
+    )
+    return (ip_range_database_resolver, _get_ipinfo_resolver())
+
+
+@functools.lru_cache
+def _get_cidr_range_snapshot_folder_path_for_process() -> pathlib.Path:
+    """
+    Choose the snapshot of the address ranges of known services once per process.
 
-        return "unknown"
+    The `CIDR_RANGE_SNAPSHOT` environment variable can pin a snapshot, by ID or by path, to reproduce earlier runs.
+    """
+    return _get_cidr_range_snapshot_folder_path(pinned_snapshot=os.environ.get("CIDR_RANGE_SNAPSHOT", None))
+
+
+@functools.lru_cache
+def _get_ip_interval_index() -> _IPIntervalIndex:
+    """
+    Index the address ranges of all known services, in the order they are checked, once per process.
+
+    The index is compiled once per snapshot and saved alongside it, so later processes only map it into memory.
+    """
+    index_file_path = _get_cidr_range_snapshot_folder_path_for_process() / "services.index"
+    if _IPIntervalIndex.is_saved(file_path=index_file_path):
+        return _IPIntervalIndex.load(file_path=index_file_path)
+
+    cidr_addresses_and_regions = [
+        (cidr_address, service_name if subregion is None else f"{service_name}/{subregion}")
+        for service_name in _KNOWN_SERVICES
+        for cidr_address, subregion in _get_cidr_address_ranges_and_subregions(service_name=service_name)
+    ]
+
+    ip_interval_index = _IPIntervalIndex.from_cidr_addresses_and_regions(
+        cidr_addresses_and_regions=cidr_addresses_and_regions
+    )
+    ip_interval_index.save(file_path=index_file_path)
+
+    return _IPIntervalIndex.load(file_path=index_file_path)
 
 
 @functools.lru_cache
@@ -123,11 +433,7 @@ def _get_cidr_address_ranges_and_subregions(*, service_name: str) -> list[tuple[
             skip_keys = ["domains", "ssh_key_fingerprints", "verifiable_password_authentication", "ssh_keys"]
             keys = set(cidr_request.keys()) - set(skip_keys)
             github_cidr_addresses_and_subregions = [
-                (cidr_address, None)
-                for key in keys
-                for cidr_address in cidr_request[key]
-                if "::" not in cidr_address
-                # Skip IPv6
+                (cidr_address, None) for key in sorted(keys) for cidr_address in cidr_request[key]
             ]
 
             return github_cidr_addresses_and_subregions
@@ -135,14 +441,15 @@ def _get_cidr_address_ranges_and_subregions(*, service_name: str) -> list[tuple[
         case "AWS":
             aws_cidr_addresses_and_subregions = [
                 (prefix["ip_prefix"], prefix.get("region", None)) for prefix in cidr_request["prefixes"]
+            ] + [
+                (prefix["ipv6_prefix"], prefix.get("region", None)) for prefix in cidr_request.get("ipv6_prefixes", [])
             ]
 
             return aws_cidr_addresses_and_subregions
         case "GCP":
             gcp_cidr_addresses_and_subregions = [
-                (prefix["ipv4Prefix"], prefix.get("scope", None))
+                (prefix.get("ipv4Prefix", None) or prefix["ipv6Prefix"], prefix.get("scope", None))
                 for prefix in cidr_request["prefixes"]
-                if "ipv4Prefix" in prefix  # Not handling IPv6 yet
             ]
 
             return gcp_cidr_addresses_and_subregions
@@ -157,65 +464,10 @@ def _get_cidr_address_ranges_and_subregions(*, service_name: str) -> list[tuple[
 
 
 @functools.lru_cache
-def _request_cidr_range(service_name: str) -> dict:
-    """Cache (in-memory) the requests to external services."""
-    match service_name:
-        case "GitHub":
-            github_cidr_request = requests.get(url="https://api.github.com/meta").json()
-
-            return github_cidr_request
-        case "AWS":
-            aws_cidr_request = requests.get(url="https://ip-ranges.amazonaws.com/ip-ranges.json").json()
+def _request_cidr_range(service_name: str) -> dict | list:
+    """Cache (in-memory) the address ranges of a service, as read from the snapshot in use."""
+    cidr_range = _load_cidr_range(
+        snapshot_folder_path=_get_cidr_range_snapshot_folder_path_for_process(), service_name=service_name
+    )
 
-            return aws_cidr_request
-        case "GCP":
-            gcp_cidr_request = requests.get(url="https://www.gstatic.com/ipranges/cloud.json").json()
-
-            return gcp_cidr_request
-        case "Azure":
-            raise NotImplementedError("Azure CIDR address fetching is not yet implemented!")
-        case "VPN":
-            # Very nice public and maintained listing! Hope this stays stable.
-            vpn_cidr_request = (
-                requests.get(
-                    url="https://raw.githubusercontent.com/josephrocca/is-vpn/main/vpn-or-datacenter-ipv4-ranges.txt"
-                )
-                .content.decode("utf-8")
-                .splitlines()
-            )
-
-            return vpn_cidr_request
-        case _:
-            raise ValueError(f"Service name '{service_name}' is not supported!")  # pragma: no cover
-
-
-def _load_ip_hash_cache(*, name: Literal["region", "services"]) -> dict[str, str] | dict[str, bool]:
-    """Load the IP hash to region cache from disk."""
-    match name:
-        case "region":
-            if not _IP_HASH_TO_REGION_FILE_PATH.exists():
-                return dict()  # pragma: no cover
-
-            with open(file=_IP_HASH_TO_REGION_FILE_PATH) as stream:
-                return yaml.load(stream=stream, Loader=yaml.SafeLoader) or dict()
-        case "services":
-            if not _IP_HASH_NOT_IN_SERVICES_FILE_PATH.exists():
-                return dict()  # pragma: no cover
-
-            with open(file=_IP_HASH_NOT_IN_SERVICES_FILE_PATH) as stream:
-                return yaml.load(stream=stream, Loader=yaml.SafeLoader) or dict()
-        case _:
-            raise ValueError(f"Name '{name}' is not recognized!")  # pragma: no cover
-
-
-def _save_ip_hash_cache(*, name: Literal["region", "services"], ip_cache: dict[str, str] | dict[str, bool]) -> None:
-    """Save the IP hash to region cache to disk."""
-    match name:
-        case "region":
-            with open(file=_IP_HASH_TO_REGION_FILE_PATH, mode="w") as stream:
-                yaml.dump(data=ip_cache, stream=stream)
-        case "services":
-            with open(file=_IP_HASH_NOT_IN_SERVICES_FILE_PATH, mode="w") as stream:
-                yaml.dump(data=ip_cache, stream=stream)
-        case _:
-            raise ValueError(f"Name '{name}' is not recognized!")  # pragma: no cover
+    return cidr_range
@@ -0,0 +1,201 @@
+"""Batched and concurrent lookups of the regions of IP addresses from the `ipinfo` API."""
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import requests.adapters
+
+from ._error_collection import _collect_error
+
+_IPINFO_API_URL = "https://ipinfo.io"
+_IPINFO_BATCH_SIZE = 1000  # The most IP addresses allowed per request to the batch endpoint
+_MAXIMUM_NUMBER_OF_QUOTA_RETRIES = 3
+
+
+class _IPInfoQuotaExceededError(Exception):
+    pass
+
+
+class _IPInfoResolver:
+    def __init__(
+        self,
+        *,
+        access_token: str,
+        api_url: str = _IPINFO_API_URL,
+        batch_size: int = _IPINFO_BATCH_SIZE,
+        maximum_number_of_workers: int = 4,
+        maximum_requests_per_second: float = 10.0,
+        timeout_in_seconds: float = 30.0,
+        maximum_retry_wait_in_seconds: float = 60.0,
+    ) -> None:
+        """
+        Look up the regions of many IP addresses through the batch endpoint of the `ipinfo` API.
+
+        The IP addresses are split into batches that are requested by a bounded pool of threads sharing a single
+        pool of connections. The start of each request is spaced out to stay under `maximum_requests_per_second`.
+        If the API reports that the request quota is exceeded, a request is retried after the time it asks to wait,
+        a few times at most, unless it asks to wait longer than `maximum_retry_wait_in_seconds` (as it does once the
+        quota of the billing period is used up); after that no further requests are made by this resolver, and the
+        IP addresses left unresolved are only looked up again once their failure has expired. The errors of all failed
+        requests of a call are collected together as a single entry.
+
+        Parameters
+        ----------
+        access_token : str
+            The `ipinfo` access token.
+        api_url : str, default: "https://ipinfo.io"
+            The base URL of the `ipinfo` API, or of a stand-in with the same endpoints.
+        batch_size : int, default: 1000
+            The number of IP addresses to send per request.
+        maximum_number_of_workers : int, default: 4
+            The maximum number of requests in flight at once.
+        maximum_requests_per_second : float, default: 10.0
+            The maximum rate at which requests are started.
+        timeout_in_seconds : float, default: 30.0
+            The timeout of each request.
+        maximum_retry_wait_in_seconds : float, default: 60.0
+            The longest wait asked for by the API before retrying a request once the quota is exceeded that is
+            honored. Longer waits give up on the request immediately.
+        """
+        self.api_url = api_url.rstrip("/")
+        self.batch_size = batch_size
+        self.maximum_number_of_workers = maximum_number_of_workers
+        self.timeout_in_seconds = timeout_in_seconds
+        self.maximum_retry_wait_in_seconds = maximum_retry_wait_in_seconds
+
+        self._session = requests.Session()
+        self._session.headers.update({"Authorization": f"Bearer {access_token}", "Accept": "application/json"})
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=maximum_number_of_workers)
+        self._session.mount(prefix="http://", adapter=adapter)
+        self._session.mount(prefix="https://", adapter=adapter)
+
+        self._minimum_request_interval_in_seconds = 1.0 / maximum_requests_per_second
+        self._next_request_time = 0.0
+        self._rate_lock = threading.Lock()
+        self._is_quota_exceeded = False
+
+    def close(self) -> None:
+        self._session.close()
+
+    def resolve(self, *, ip_addresses: list[str]) -> dict[str, str]:
+        """
+        Get the region string of each IP address.
+
+        IP addresses that could not be looked up, because the quota was exceeded or their request failed, are left out
+        of the result so they are not cached.
+        """
+        batches = [
+            ip_addresses[start : start + self.batch_size] for start in range(0, len(ip_addresses), self.batch_size)
+        ]
+        if len(batches) == 0:
+            return dict()
+
+        regions_by_ip_address = dict()
+        error_messages = []
+        if len(batches) == 1 or self.maximum_number_of_workers == 1:
+            batch_results = (self._resolve_batch(ip_addresses=batch) for batch in batches)
+            for batch_regions_by_ip_address, error_message in batch_results:
+                regions_by_ip_address.update(batch_regions_by_ip_address)
+                error_messages.append(error_message)
+        else:
+            with ThreadPoolExecutor(max_workers=self.maximum_number_of_workers) as executor:
+                for batch_regions_by_ip_address, error_message in executor.map(
+                    lambda batch: self._resolve_batch(ip_addresses=batch), batches
+                ):
+                    regions_by_ip_address.update(batch_regions_by_ip_address)
+                    error_messages.append(error_message)
+
+        error_messages = [error_message for error_message in error_messages if error_message is not None]
+        if len(error_messages) != 0:
+            message = (
+                f"Error fetching IP information for {len(error_messages)} of {len(batches)} batches "
+                f"({len(ip_addresses) - len(regions_by_ip_address)} of {len(ip_addresses)} IP addresses unresolved)!"
+                "\n\n" + "\n\n".join(error_messages)
+            )
+            _collect_error(message=message, error_type="ipinfo")
+
+        return regions_by_ip_address
+
+    @property
+    def is_quota_exceeded(self) -> bool:
+        """Whether the request quota was exceeded, after which no further requests are made."""
+        return self._is_quota_exceeded
+
+    def _resolve_batch(self, *, ip_addresses: list[str]) -> tuple[dict[str, str], str | None]:
+        if self._is_quota_exceeded:
+            return dict(), None
+
+        try:
+            details_by_ip_address = self._request_batch(ip_addresses=ip_addresses)
+        except _IPInfoQuotaExceededError as exception:
+            # Return nothing so the IP addresses are reported as 'unknown' but not cached
+            # Only the batch that opened the circuit reports the error
+            is_first_to_exceed_quota = not self._is_quota_exceeded
+            self._is_quota_exceeded = True
+            return dict(), str(exception) if is_first_to_exceed_quota else None
+        except Exception as exception:
+            message = (
+                f"Batch of {len(ip_addresses)} IP addresses failed:\n"
+                f"{type(exception)}: {exception}\n\n"
+                f"{traceback.format_exc()}"
+            )
+            return dict(), message
+
+        regions_by_ip_address = dict()
+        for ip_address in ip_addresses:
+            details = details_by_ip_address.get(ip_address, None)
+            if isinstance(details, dict):
+                regions_by_ip_address[ip_address] = _get_region_string_from_details(details=details)
+
+        return regions_by_ip_address, None
+
+    def _request_batch(self, *, ip_addresses: list[str]) -> dict[str, dict]:
+        for _ in range(_MAXIMUM_NUMBER_OF_QUOTA_RETRIES + 1):
+            self._wait_for_rate_limit()
+            response = self._session.post(
+                url=f"{self.api_url}/batch", json=ip_addresses, timeout=self.timeout_in_seconds
+            )
+            if response.status_code != 429:
+                response.raise_for_status()
+                return response.json()
+
+            # Stop waiting as soon as any request gives up, since no further requests will be made
+            retry_after = response.headers.get("Retry-After", None)
+            if (
+                retry_after is None
+                or not retry_after.isdigit()
+                or int(retry_after) > self.maximum_retry_wait_in_seconds
+                or self._is_quota_exceeded
+            ):
+                break
+            time.sleep(int(retry_after))
+
+        raise _IPInfoQuotaExceededError(f"The `ipinfo` request quota was exceeded at {self.api_url}!")
+
+    def _wait_for_rate_limit(self) -> None:
+        with self._rate_lock:
+            current_time = time.monotonic()
+            request_time = max(current_time, self._next_request_time)
+            self._next_request_time = request_time + self._minimum_request_interval_in_seconds
+        time.sleep(request_time - current_time)
+
+
+def _get_region_string_from_details(*, details: dict) -> str:
+    country = details.get("country", None)
+    region = details.get("region", None)
+
+    region_string = ""  # Not technically necessary, but quiets the linter
+    match (country is None, region is None):
+        case (True, True):
+            region_string = "unknown"
+        case (True, False):
+            region_string = region
+        case (False, True):
+            region_string = country
+        case (False, False):
+            region_string = f"{country}/{region}"
+
+    return region_string
@@ -1,15 +1,28 @@
 import collections
 import os
 import pathlib
-from typing import Iterable
+from typing import Iterable, MutableMapping
 
 import dandi.dandiapi
 import natsort
+import numpy
 import pandas
 import tqdm
-from pydantic import DirectoryPath, validate_call
-
-from ._ip_utils import _load_ip_hash_cache, _save_ip_hash_cache, get_region_from_ip_address
+from pydantic import DirectoryPath, FilePath, validate_call
+
+from ._binned_s3_log_store import BinnedS3LogStore, _BinnedS3LogFolderReader, _get_binned_s3_log_reader
+from ._binning_journal import _CatalogEntry, _load_ip_address_dictionary
+from ._dandi_metadata_cache import _DandiMetadataCache
+from ._ip_hash_cache import _IPHashCache
+from ._ip_utils import (
+    _IP_LOOKUP_FAILURE_TIME_TO_LIVE_IN_SECONDS,
+    _get_ip_hash,
+    _has_failed_ip_addresses,
+    get_regions_from_ip_addresses,
+)
+from ._mapped_blob_cache import _link_mapped_file, _MappedBlob, _MappedBlobCache
+from ._resolve_regions_of_binned_s3_logs import _IP_ADDRESS_REGIONS_FILE_NAME, _load_ip_address_regions
+from ._s3_log_table_reader import _TIMESTAMP_FORMAT, _format_timestamps
 
 
 @validate_call
@@ -19,18 +32,34 @@ def map_binned_s3_logs_to_dandisets(
     excluded_dandisets: list[str] | None = None,
     restrict_to_dandisets: list[str] | None = None,
     dandiset_limit: int | None = None,
+    ip_range_database_file_path: FilePath | None = None,
+    retry_unresolved_regions: bool = False,
+    subnet_prefix_lengths: tuple[int, int] | None = None,
+    ip_lookup_failure_time_to_live_in_seconds: float | None = None,
 ) -> None:
     """
     Iterate over all dandisets and create a single .tsv per asset per dandiset version.
 
     Also creates a summary file per dandiset that has binned activity per day.
 
+    The versions and assets of each Dandiset are fetched concurrently and cached on disk; the assets of published
+    versions are never fetched again, and those of drafts only once the draft has been modified.
+
+    Each blob is only mapped once: the mapped file of every other asset of the same blob, in any version or Dandiset,
+    is a hard link to the first one, and its aggregated activity is reused. The mapped blobs are recorded in
+    `mapped_blob_cache.sqlite` in the mapped folder, so later calls only map the blobs whose binned logs have changed.
+
     Requires the `ipinfo` environment variables to be set (`IPINFO_CREDENTIALS` and `IP_HASH_SALT`).
 
     Parameters
     ----------
     binned_s3_logs_folder_path : DirectoryPath
-        The path to the folder containing the reduced S3 log files.
+        The path to the folder containing the binned S3 log files.
+        If binning was done with `storage="store"`, the logs are read from the `BinnedS3LogStore` in this folder.
+        If `resolve_regions_of_binned_s3_logs` was run on this folder, the regions of IP addresses are read from the
+        table it wrote, and only the IP addresses missing from it are looked up.
+        If binning was done with `ip_address_encoding="dictionary"`, the region of each IP address ID is looked up only
+        once across all Dandisets.
     mapped_s3_logs_folder_path : DirectoryPath
         The path to the folder where the mapped logs will be saved.
     excluded_dandisets : list of str, optional
@@ -40,6 +69,23 @@ def map_binned_s3_logs_to_dandisets(
     dandiset_limit : int, optional
         The maximum number of Dandisets to process per call.
         Useful for quick testing.
+    ip_range_database_file_path : FilePath, optional
+        The path to a CSV file of IP address ranges with the columns `start_ip`, `end_ip`, `country`, and optionally
+        `region`, used to look up the regions of IP addresses offline before falling back to `ipinfo`.
+    retry_unresolved_regions : bool, default: False
+        Whether to only map again the Dandisets whose outputs report regions as 'unknown' because of failed IP lookups
+        in earlier calls. These Dandisets are listed in `dandisets_with_unresolved_regions.txt` in the mapped folder,
+        and each is removed from the list once all of its IP addresses are resolved.
+        Each of these Dandisets is mapped again as a whole; the IP addresses that failed are not tracked on their own.
+    subnet_prefix_lengths : tuple of int, optional
+        The prefix lengths of IPv4 and IPv6 subnets, such as (24, 48), whose IP addresses are assumed to share a
+        region, so that only one IP address per subnet needs to be looked up; a sample of the others is still looked
+        up to detect subnets that span more than one region.
+        By default, every IP address is looked up on its own.
+    ip_lookup_failure_time_to_live_in_seconds : float, optional
+        The number of seconds after a failed lookup during which an IP address is not looked up again.
+        By default, one hour, or 0 if `retry_unresolved_regions` is set, so that every IP address whose lookup failed
+        in earlier calls is looked up again however recently it failed.
     """
     if "IPINFO_CREDENTIALS" not in os.environ:  # pragma: no cover
         message = "The environment variable 'IPINFO_CREDENTIALS' must be set to import `dandi_s3_log_parser`!"
@@ -60,65 +106,147 @@ def map_binned_s3_logs_to_dandisets(
     excluded_dandisets = excluded_dandisets or []
     restrict_to_dandisets = restrict_to_dandisets or []
 
-    # TODO: add mtime record for binned files to determine if update is needed
+    if ip_lookup_failure_time_to_live_in_seconds is None:
+        ip_lookup_failure_time_to_live_in_seconds = (
+            0.0 if retry_unresolved_regions else _IP_LOOKUP_FAILURE_TIME_TO_LIVE_IN_SECONDS
+        )
 
     client = dandi.dandiapi.DandiAPIClient()
 
-    ip_hash_to_region = _load_ip_hash_cache(name="region")
-    ip_hash_not_in_services = _load_ip_hash_cache(name="services")
+    unresolved_dandisets_file_path = mapped_s3_logs_folder_path / "dandisets_with_unresolved_regions.txt"
+    unresolved_dandiset_ids = _read_unresolved_dandiset_ids(file_path=unresolved_dandisets_file_path)
+    if retry_unresolved_regions:
+        restrict_to_dandisets = [
+            dandiset_id
+            for dandiset_id in natsort.natsorted(seq=unresolved_dandiset_ids)
+            if dandiset_id not in excluded_dandisets
+            and (len(restrict_to_dandisets) == 0 or dandiset_id in restrict_to_dandisets)
+        ]
+        if len(restrict_to_dandisets) == 0:
+            return None
 
     if len(restrict_to_dandisets) != 0:
-        current_dandisets = [client.get_dandiset(dandiset_id=dandiset_id) for dandiset_id in restrict_to_dandisets]
+        current_dandiset_ids = list(restrict_to_dandisets)
     else:
-        current_dandisets = [
-            dandiset for dandiset in client.get_dandisets() if dandiset.identifier not in excluded_dandisets
+        current_dandiset_ids = [
+            dandiset.identifier for dandiset in client.get_dandisets() if dandiset.identifier not in excluded_dandisets
         ]
-    current_dandisets = current_dandisets[:dandiset_limit]
-
-    for dandiset in tqdm.tqdm(
-        iterable=current_dandisets,
-        total=len(current_dandisets),
-        desc="Mapping reduced logs to Dandisets...",
-        position=0,
-        leave=True,
-        mininterval=5.0,
-        smoothing=0,
-        unit="dandiset",
-    ):
-        _map_binned_logs_to_dandiset(
-            dandiset=dandiset,
-            binned_s3_logs_folder_path=binned_s3_logs_folder_path,
-            dandiset_logs_folder_path=mapped_s3_logs_folder_path,
-            client=client,
-            ip_hash_to_region=ip_hash_to_region,
-            ip_hash_not_in_services=ip_hash_not_in_services,
-        )
+    current_dandiset_ids = current_dandiset_ids[:dandiset_limit]
+
+    # Every new IP lookup is persisted as soon as it is made, so nothing needs saving at the end
+    ip_hash_to_region = _IPHashCache(name="region")
+    ip_hash_not_in_services = _IPHashCache(name="services")
+    ip_hash_to_failure_time = _IPHashCache(name="failures")
+    subnet_hash_to_region = _IPHashCache(name="subnets") if subnet_prefix_lengths is not None else None
+    binned_s3_log_reader = _get_binned_s3_log_reader(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    dandi_metadata_cache = _DandiMetadataCache(api_url=client.api_url)
+    mapped_blob_cache = _MappedBlobCache(mapped_s3_logs_folder_path=mapped_s3_logs_folder_path)
+    region_settings_fingerprint = _get_region_settings_fingerprint(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+        ip_range_database_file_path=ip_range_database_file_path,
+        subnet_prefix_lengths=subnet_prefix_lengths,
+    )
+    ip_address_regions = _load_ip_address_regions(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    ip_address_dictionary = _load_ip_address_dictionary(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    regions_by_ip_id = (
+        numpy.full(shape=len(ip_address_dictionary), fill_value=None, dtype=object)
+        if ip_address_dictionary is not None
+        else None
+    )
+    try:
+        # Fetch the assets of every version not already cached up front, so the requests overlap
+        dandi_metadata_cache.prefetch(dandiset_ids=current_dandiset_ids)
+
+        for dandiset_id in tqdm.tqdm(
+            iterable=current_dandiset_ids,
+            total=len(current_dandiset_ids),
+            desc="Mapping reduced logs to Dandisets...",
+            position=0,
+            leave=True,
+            mininterval=5.0,
+            smoothing=0,
+            unit="dandiset",
+        ):
+            has_unresolved_regions = _map_binned_logs_to_dandiset(
+                dandiset_id=dandiset_id,
+                binned_s3_log_reader=binned_s3_log_reader,
+                dandiset_logs_folder_path=mapped_s3_logs_folder_path,
+                dandi_metadata_cache=dandi_metadata_cache,
+                ip_hash_to_region=ip_hash_to_region,
+                ip_hash_not_in_services=ip_hash_not_in_services,
+                ip_range_database_file_path=ip_range_database_file_path,
+                ip_hash_to_failure_time=ip_hash_to_failure_time,
+                subnet_hash_to_region=subnet_hash_to_region,
+                subnet_prefix_lengths=subnet_prefix_lengths,
+                ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
+                ip_address_regions=ip_address_regions,
+                ip_address_dictionary=ip_address_dictionary,
+                regions_by_ip_id=regions_by_ip_id,
+                mapped_blob_cache=mapped_blob_cache,
+                region_settings_fingerprint=region_settings_fingerprint,
+            )
 
-    _save_ip_hash_cache(name="region", ip_cache=ip_hash_to_region)
-    _save_ip_hash_cache(name="services", ip_cache=ip_hash_not_in_services)
+            # Keep the list up to date after every Dandiset so an interrupted call loses nothing
+            if has_unresolved_regions != (dandiset_id in unresolved_dandiset_ids):
+                unresolved_dandiset_ids ^= {dandiset_id}
+                _write_unresolved_dandiset_ids(
+                    unresolved_dandiset_ids=unresolved_dandiset_ids, file_path=unresolved_dandisets_file_path
+                )
+    finally:
+        binned_s3_log_reader.close()
+        dandi_metadata_cache.close()
+        mapped_blob_cache.close()
+        ip_hash_to_region.close()
+        ip_hash_not_in_services.close()
+        ip_hash_to_failure_time.close()
+        if subnet_hash_to_region is not None:
+            subnet_hash_to_region.close()
 
     return None
 
 
 def _map_binned_logs_to_dandiset(
-    dandiset: dandi.dandiapi.RemoteDandiset,
-    binned_s3_logs_folder_path: pathlib.Path,
+    dandiset_id: str,
+    binned_s3_log_reader: BinnedS3LogStore | _BinnedS3LogFolderReader,
     dandiset_logs_folder_path: pathlib.Path,
-    client: dandi.dandiapi.DandiAPIClient,
-    ip_hash_to_region: dict[str, str],
-    ip_hash_not_in_services: dict[str, bool],
-) -> None:
-    dandiset_id = dandiset.identifier
+    dandi_metadata_cache: _DandiMetadataCache,
+    ip_hash_to_region: MutableMapping[str, str],
+    ip_hash_not_in_services: MutableMapping[str, bool],
+    ip_range_database_file_path: FilePath | None = None,
+    ip_hash_to_failure_time: MutableMapping[str, float] | None = None,
+    subnet_hash_to_region: MutableMapping[str, str] | None = None,
+    subnet_prefix_lengths: tuple[int, int] | None = None,
+    ip_lookup_failure_time_to_live_in_seconds: float = _IP_LOOKUP_FAILURE_TIME_TO_LIVE_IN_SECONDS,
+    ip_address_regions: pandas.Series | None = None,
+    ip_address_dictionary: numpy.ndarray | None = None,
+    regions_by_ip_id: numpy.ndarray | None = None,
+    mapped_blob_cache: _MappedBlobCache | None = None,
+    region_settings_fingerprint: str = "",
+) -> bool:
+    """Map the binned logs of every version of a Dandiset, and report whether any regions were left unresolved."""
+    has_unresolved_regions = False
+
     dandiset_log_folder_path = dandiset_logs_folder_path / dandiset_id
 
+    region_lookup_options = dict(
+        ip_address_regions=ip_address_regions,
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+        ip_hash_to_failure_time=ip_hash_to_failure_time,
+        subnet_hash_to_region=subnet_hash_to_region,
+        subnet_prefix_lengths=subnet_prefix_lengths,
+        ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
+    )
+
     all_reduced_s3_logs_per_blob_id_aggregated_by_day = dict()
     all_reduced_s3_logs_per_blob_id_aggregated_by_region = dict()
     blob_id_to_asset_path = dict()
     total_bytes_across_versions_by_blob_id = dict()
-    dandiset_versions = list(dandiset.get_versions())
-    for version in tqdm.tqdm(
-        iterable=dandiset_versions,
-        total=len(dandiset_versions),
+    dandiset_version_ids = dandi_metadata_cache.get_version_ids(dandiset_id=dandiset_id)
+    for version_id in tqdm.tqdm(
+        iterable=dandiset_version_ids,
+        total=len(dandiset_version_ids),
         desc=f"Mapping Dandiset {dandiset_id} versions",
         position=1,
         leave=False,
@@ -126,19 +254,16 @@ def _map_binned_logs_to_dandiset(
         smoothing=0,
         unit="version",
     ):
-        version_id = version.identifier
         dandiset_version_log_folder_path = dandiset_log_folder_path / version_id
 
-        dandiset_version = client.get_dandiset(dandiset_id=dandiset_id, version_id=version_id)
-
         all_reduced_s3_logs_aggregated_by_day_for_version = []
         all_reduced_s3_logs_aggregated_by_region_for_version = []
         total_bytes_per_asset_path = dict()
-        dandiset_version_assets = list(dandiset_version.get_assets())
+        dandiset_version_assets = dandi_metadata_cache.get_assets(dandiset_id=dandiset_id, version_id=version_id)
         for asset in tqdm.tqdm(
             iterable=dandiset_version_assets,
             total=len(dandiset_version_assets),
-            desc=f"Mapping {dandiset_id}/{version}",
+            desc=f"Mapping {dandiset_id}/{version_id}",
             position=2,
             leave=False,
             mininterval=5.0,
@@ -155,57 +280,54 @@ def _map_binned_logs_to_dandiset(
 
             is_asset_zarr = ".zarr" in asset_suffixes
             if is_asset_zarr:
-                blob_id = asset.zarr
-                binned_s3_log_file_path = binned_s3_logs_folder_path / "zarr" / f"{blob_id}.tsv"
+                blob_id = asset.zarr_id
+                object_key = f"zarr/{blob_id}"
             else:
-                blob_id = asset.blob
-                binned_s3_log_file_path = (
-                    binned_s3_logs_folder_path / "blobs" / blob_id[:3] / blob_id[3:6] / f"{blob_id}.tsv"
-                )
-
-            # TODO: Could add a step here to track which object IDs have been processed, and if encountered again
-            # Just copy the file over instead of reprocessing
+                blob_id = asset.blob_id
+                object_key = f"blobs/{blob_id[:3]}/{blob_id[3:6]}/{blob_id}"
 
-            if not binned_s3_log_file_path.exists():
+            # Where binning kept a catalog, missing keys are known without any file access
+            binned_s3_log_fingerprint = binned_s3_log_reader.get_fingerprint(object_key=object_key)
+            if binned_s3_log_fingerprint is None:
                 continue  # No reduced logs found (possible asset was never accessed); skip to next asset
-
-            reduced_s3_log_binned_by_blob_id = pandas.read_table(filepath_or_buffer=binned_s3_log_file_path, header=0)
-
-            reduced_s3_log_binned_by_blob_id["region"] = [
-                get_region_from_ip_address(
-                    ip_address=ip_address,
-                    ip_hash_to_region=ip_hash_to_region,
-                    ip_hash_not_in_services=ip_hash_not_in_services,
-                )
-                for ip_address in reduced_s3_log_binned_by_blob_id["ip_address"]
-            ]
-
-            reordered_reduced_s3_log = reduced_s3_log_binned_by_blob_id.reindex(
-                columns=("timestamp", "bytes_sent", "region")
-            )
-            reordered_reduced_s3_log.sort_values(by="timestamp", key=natsort.natsort_keygen(), inplace=True)
-            reordered_reduced_s3_log.index = range(len(reordered_reduced_s3_log))
-
-            dandiset_version_log_folder_path.mkdir(parents=True, exist_ok=True)
             version_asset_file_path = dandiset_version_log_folder_path / f"{dandi_filename}.tsv"
-            reordered_reduced_s3_log.to_csv(
-                path_or_buf=version_asset_file_path, mode="w", sep="\t", header=True, index=True
+
+            # The same blob is often an asset of many versions, so it is only mapped again if its binned log changed
+            fingerprint = f"{binned_s3_log_fingerprint}:{region_settings_fingerprint}"
+            mapped_blob = (
+                mapped_blob_cache.get(object_key=object_key, fingerprint=fingerprint)
+                if mapped_blob_cache is not None
+                else None
             )
+            if mapped_blob is not None:
+                dandiset_version_log_folder_path.mkdir(parents=True, exist_ok=True)
+                _link_mapped_file(source_file_path=mapped_blob.file_path, file_path=version_asset_file_path)
+            else:
+                mapped_blob = _map_binned_log(
+                    object_key=object_key,
+                    binned_s3_log_reader=binned_s3_log_reader,
+                    catalog_entry=binned_s3_log_reader.get_catalog_entry(object_key=object_key),
+                    file_path=version_asset_file_path,
+                    region_lookup_options=region_lookup_options,
+                    ip_address_dictionary=ip_address_dictionary,
+                    regions_by_ip_id=regions_by_ip_id,
+                )
+                if mapped_blob is None:
+                    continue  # No reduced logs found (possible asset was never accessed); skip to next asset
 
-            reordered_reduced_s3_log["date"] = [entry[:10] for entry in reordered_reduced_s3_log["timestamp"]]
+                if mapped_blob_cache is not None:
+                    mapped_blob_cache.put(object_key=object_key, fingerprint=fingerprint, mapped_blob=mapped_blob)
+            has_unresolved_regions |= mapped_blob.has_failed_lookups
 
-            # Aggregate per asset to save memory (most impactful for 000108)
-            aggregated_activity_by_day = _aggregate_activity_by_day(reduced_s3_logs_per_day=[reordered_reduced_s3_log])
+            aggregated_activity_by_day = mapped_blob.aggregated_activity_by_day
             all_reduced_s3_logs_aggregated_by_day_for_version.append(aggregated_activity_by_day)
             all_reduced_s3_logs_per_blob_id_aggregated_by_day[blob_id] = aggregated_activity_by_day
 
-            aggregated_activity_by_region = _aggregate_activity_by_region(
-                reduced_s3_logs_per_day=[reordered_reduced_s3_log]
-            )
+            aggregated_activity_by_region = mapped_blob.aggregated_activity_by_region
             all_reduced_s3_logs_aggregated_by_region_for_version.append(aggregated_activity_by_region)
             all_reduced_s3_logs_per_blob_id_aggregated_by_region[blob_id] = aggregated_activity_by_region
 
-            total_bytes = sum(reduced_s3_log_binned_by_blob_id["bytes_sent"])
+            total_bytes = mapped_blob.total_bytes
             total_bytes_per_asset_path[asset.path] = total_bytes
 
             blob_id_to_asset_path[blob_id] = asset.path
@@ -232,7 +354,7 @@ def _map_binned_logs_to_dandiset(
         )
 
     if len(all_reduced_s3_logs_per_blob_id_aggregated_by_day) == 0:
-        return None  # No activity found (possible dandiset was never accessed); skip to next version
+        return has_unresolved_regions  # No activity found (possible dandiset was never accessed); skip to next version
 
     # Single path across versions could have been replaced at various points by a new blob
     total_bytes_across_versions_by_asset = collections.defaultdict(int)
@@ -256,7 +378,169 @@ def _map_binned_logs_to_dandiset(
         total_bytes_per_asset_path=total_bytes_across_versions_by_asset, file_path=dandiset_summary_by_asset_file_path
     )
 
-    return None
+    return has_unresolved_regions
+
+
+def _get_region_settings_fingerprint(
+    *,
+    binned_s3_logs_folder_path: pathlib.Path,
+    ip_range_database_file_path: pathlib.Path | None,
+    subnet_prefix_lengths: tuple[int, int] | None,
+) -> str:
+    """Summarize everything besides the binned log itself that can change the regions of a mapped file."""
+    ip_address_regions_file_path = binned_s3_logs_folder_path / _IP_ADDRESS_REGIONS_FILE_NAME
+    ip_address_regions_mtime = (
+        ip_address_regions_file_path.stat().st_mtime_ns if ip_address_regions_file_path.exists() else None
+    )
+    ip_range_database_mtime = (
+        ip_range_database_file_path.stat().st_mtime_ns if ip_range_database_file_path is not None else None
+    )
+
+    return f"{ip_address_regions_mtime}:{ip_range_database_file_path}:{ip_range_database_mtime}:{subnet_prefix_lengths}"
+
+
+def _map_binned_log(
+    *,
+    object_key: str,
+    binned_s3_log_reader: BinnedS3LogStore | _BinnedS3LogFolderReader,
+    catalog_entry: _CatalogEntry | None,
+    file_path: pathlib.Path,
+    region_lookup_options: dict,
+    ip_address_dictionary: numpy.ndarray | None,
+    regions_by_ip_id: numpy.ndarray | None,
+) -> _MappedBlob | None:
+    """Write the mapped file of a binned log and aggregate its activity, or return None if it has no binned log."""
+    reduced_s3_log_binned_by_blob_id = binned_s3_log_reader.read(object_key=object_key)
+    if reduced_s3_log_binned_by_blob_id is None:
+        return None
+
+    has_failed_lookups = False
+    if "ip_id" in reduced_s3_log_binned_by_blob_id.columns:
+        # Each distinct ID is resolved once per call; the regions of every record are then a single gather
+        ip_ids = reduced_s3_log_binned_by_blob_id["ip_id"].to_numpy()
+        unique_ip_ids = numpy.unique(ip_ids)
+        unique_ip_ids = unique_ip_ids[pandas.isna(regions_by_ip_id[unique_ip_ids])]
+        if len(unique_ip_ids) != 0:
+            new_regions, is_failed = _look_up_regions(
+                ip_addresses=pandas.Series(data=ip_address_dictionary[unique_ip_ids], dtype=object),
+                **region_lookup_options,
+            )
+            has_failed_lookups |= bool(is_failed.any())
+
+            # Failed lookups are not kept, so that every Dandiset they appear in is reported as unresolved
+            regions_by_ip_id[unique_ip_ids] = numpy.where(is_failed, None, new_regions)
+            regions = regions_by_ip_id[ip_ids]
+            regions[pandas.isna(regions)] = "unknown"
+        else:
+            regions = regions_by_ip_id[ip_ids]
+    else:
+        regions, is_failed = _look_up_regions(
+            ip_addresses=reduced_s3_log_binned_by_blob_id["ip_address"], **region_lookup_options
+        )
+        has_failed_lookups |= bool(is_failed.any())
+    reduced_s3_log_binned_by_blob_id["region"] = regions
+
+    reordered_reduced_s3_log = reduced_s3_log_binned_by_blob_id.reindex(columns=("timestamp", "bytes_sent", "region"))
+    # Binning records which object keys were written in timestamp order, so only the others need sorting
+    if not binned_s3_log_reader.is_time_ordered(object_key=object_key):
+        reordered_reduced_s3_log.sort_values(by="timestamp", kind="stable", inplace=True)
+    reordered_reduced_s3_log.index = range(len(reordered_reduced_s3_log))
+
+    # Remove any earlier file first, since it may be a hard link shared with the mapped files of other assets
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.unlink(missing_ok=True)
+    reordered_reduced_s3_log.to_csv(
+        path_or_buf=file_path,
+        mode="w",
+        sep="\t",
+        header=True,
+        index=True,
+        date_format=_TIMESTAMP_FORMAT,
+    )
+
+    reordered_reduced_s3_log["date"] = _format_timestamps(timestamps=reordered_reduced_s3_log["timestamp"], unit="D")
+
+    # Aggregate per asset to save memory (most impactful for 000108)
+    total_bytes = (
+        catalog_entry.total_bytes_sent
+        if catalog_entry is not None
+        else sum(reduced_s3_log_binned_by_blob_id["bytes_sent"])
+    )
+    mapped_blob = _MappedBlob(
+        file_path=file_path,
+        total_bytes=total_bytes,
+        aggregated_activity_by_day=_aggregate_activity_by_day(reduced_s3_logs_per_day=[reordered_reduced_s3_log]),
+        aggregated_activity_by_region=_aggregate_activity_by_region(reduced_s3_logs_per_day=[reordered_reduced_s3_log]),
+        has_failed_lookups=has_failed_lookups,
+    )
+
+    return mapped_blob
+
+
+def _look_up_regions(
+    *,
+    ip_addresses: pandas.Series,
+    ip_address_regions: pandas.Series | None,
+    ip_hash_to_region: MutableMapping[str, str],
+    ip_hash_not_in_services: MutableMapping[str, bool],
+    ip_range_database_file_path: FilePath | None,
+    ip_hash_to_failure_time: MutableMapping[str, float] | None,
+    subnet_hash_to_region: MutableMapping[str, str] | None,
+    subnet_prefix_lengths: tuple[int, int] | None,
+    ip_lookup_failure_time_to_live_in_seconds: float,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Get the region of each IP address, and whether it is 'unknown' because its lookup failed."""
+    # Join against the regions resolved across the whole archive, if any, and only look up the rest
+    if ip_address_regions is not None:
+        regions = numpy.asarray(ip_addresses.map(ip_address_regions), dtype=object)
+        is_missing = pandas.isna(regions)
+    else:
+        regions = numpy.empty(shape=len(ip_addresses), dtype=object)
+        is_missing = numpy.ones(shape=len(ip_addresses), dtype=bool)
+
+    is_failed = numpy.zeros(shape=len(ip_addresses), dtype=bool)
+    if not is_missing.any():
+        return regions, is_failed
+
+    regions[is_missing] = get_regions_from_ip_addresses(
+        ip_addresses=ip_addresses[is_missing],
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+        ip_hash_to_failure_time=ip_hash_to_failure_time,
+        subnet_hash_to_region=subnet_hash_to_region,
+        subnet_prefix_lengths=subnet_prefix_lengths or (24, 48),
+        ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
+    )
+    if ip_hash_to_failure_time is not None and _has_failed_ip_addresses(
+        ip_addresses=ip_addresses[is_missing],
+        regions=regions[is_missing],
+        ip_hash_to_failure_time=ip_hash_to_failure_time,
+    ):
+        unknown_ip_addresses = pandas.unique(values=numpy.asarray(ip_addresses, dtype=object)[regions == "unknown"])
+        failed_ip_addresses = [
+            ip_address
+            for ip_address in unknown_ip_addresses
+            if _get_ip_hash(ip_address=ip_address) in ip_hash_to_failure_time
+        ]
+        is_failed = numpy.asarray(ip_addresses.isin(failed_ip_addresses), dtype=bool)
+
+    return regions, is_failed
+
+
+def _read_unresolved_dandiset_ids(*, file_path: pathlib.Path) -> set[str]:
+    if not file_path.exists():
+        return set()
+
+    return {line for line in file_path.read_text().splitlines() if line != ""}
+
+
+def _write_unresolved_dandiset_ids(*, unresolved_dandiset_ids: set[str], file_path: pathlib.Path) -> None:
+    if len(unresolved_dandiset_ids) == 0:
+        file_path.unlink(missing_ok=True)
+        return
+
+    file_path.write_text("".join(f"{dandiset_id}\n" for dandiset_id in natsort.natsorted(seq=unresolved_dandiset_ids)))
 
 
 def _aggregate_activity_by_day(reduced_s3_logs_per_day: Iterable[pandas.DataFrame]) -> pandas.DataFrame:
@@ -0,0 +1,146 @@
+"""Memoization of the mapped logs of each blob, shared across the versions and Dandisets it appears in."""
+
+import io
+import os
+import pathlib
+import shutil
+import sqlite3
+import typing
+
+import pandas
+
+_MAPPED_BLOB_CACHE_FILE_NAME = "mapped_blob_cache.sqlite"
+
+
+class _MappedBlob(typing.NamedTuple):
+    file_path: pathlib.Path
+    total_bytes: int
+    aggregated_activity_by_day: pandas.DataFrame
+    aggregated_activity_by_region: pandas.DataFrame
+    has_failed_lookups: bool = False
+
+
+class _MappedBlobCache:
+    def __init__(self, *, mapped_s3_logs_folder_path: pathlib.Path) -> None:
+        """
+        The first mapped file of each object key, along with its aggregated activity, kept in an SQLite database.
+
+        The same blob can be an asset of many versions of a Dandiset, and of several Dandisets. Its mapped file is only
+        made once; every other asset of the same blob is then hard linked to it, or copied where hard links are not
+        supported, and its activity by day and by region is taken from the cache instead of being aggregated again.
+
+        Each entry is keyed by the object key and the fingerprint of its binned log, so it is reused across calls
+        until the binned log changes. An entry is no longer used once its mapped file is modified or removed.
+        Blobs with regions left unknown by failed lookups are only memoized for the rest of the call, so that a later
+        call looks them up again.
+
+        Parameters
+        ----------
+        mapped_s3_logs_folder_path : pathlib.Path
+            The folder of the mapped logs, which holds the cache and which all mapped file paths are relative to.
+        """
+        self.mapped_s3_logs_folder_path = mapped_s3_logs_folder_path
+
+        cache_file_path = mapped_s3_logs_folder_path / _MAPPED_BLOB_CACHE_FILE_NAME
+        self._connection = sqlite3.connect(database=cache_file_path, timeout=60.0, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS mapped_blobs ("
+            "object_key TEXT PRIMARY KEY, fingerprint TEXT, relative_file_path TEXT, file_size INTEGER, "
+            "file_mtime INTEGER, total_bytes INTEGER, "
+            "aggregated_activity_by_day TEXT, aggregated_activity_by_region TEXT"
+            ") WITHOUT ROWID"
+        )
+
+        # The aggregates of every blob seen in this call are kept in memory, so repeats need not parse them again
+        self._memo: dict[str, tuple[str, tuple[int, int], _MappedBlob]] = dict()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "_MappedBlobCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def get(self, *, object_key: str, fingerprint: str) -> _MappedBlob | None:
+        """Get the mapped blob of an object key, or None if it was not mapped from a binned log of this fingerprint."""
+        memoized_fingerprint, file_size_and_mtime, mapped_blob = self._memo.get(object_key, (None, None, None))
+        if mapped_blob is None:
+            row = self._connection.execute(
+                "SELECT fingerprint, relative_file_path, file_size, file_mtime, total_bytes, "
+                "aggregated_activity_by_day, aggregated_activity_by_region FROM mapped_blobs WHERE object_key = ?",
+                (object_key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            memoized_fingerprint, relative_file_path, file_size, file_mtime, total_bytes = row[:5]
+            file_size_and_mtime = (file_size, file_mtime)
+            mapped_blob = _MappedBlob(
+                file_path=self.mapped_s3_logs_folder_path / relative_file_path,
+                total_bytes=total_bytes,
+                aggregated_activity_by_day=_read_aggregated_activity(content=row[5]),
+                aggregated_activity_by_region=_read_aggregated_activity(content=row[6]),
+            )
+            self._memo[object_key] = (memoized_fingerprint, file_size_and_mtime, mapped_blob)
+
+        if memoized_fingerprint != fingerprint:
+            return None
+        if (
+            not mapped_blob.file_path.exists()
+            or _get_file_size_and_mtime(file_path=mapped_blob.file_path) != file_size_and_mtime
+        ):
+            return None
+
+        return mapped_blob
+
+    def put(self, *, object_key: str, fingerprint: str, mapped_blob: _MappedBlob) -> None:
+        file_size_and_mtime = _get_file_size_and_mtime(file_path=mapped_blob.file_path)
+        self._memo[object_key] = (fingerprint, file_size_and_mtime, mapped_blob)
+        if mapped_blob.has_failed_lookups:
+            self._connection.execute("DELETE FROM mapped_blobs WHERE object_key = ?", (object_key,))
+            return
+
+        self._connection.execute(
+            "INSERT OR REPLACE INTO mapped_blobs (object_key, fingerprint, relative_file_path, file_size, file_mtime, "
+            "total_bytes, aggregated_activity_by_day, aggregated_activity_by_region) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                object_key,
+                fingerprint,
+                str(mapped_blob.file_path.relative_to(self.mapped_s3_logs_folder_path)),
+                *file_size_and_mtime,
+                mapped_blob.total_bytes,
+                mapped_blob.aggregated_activity_by_day.to_json(orient="split", index=False),
+                mapped_blob.aggregated_activity_by_region.to_json(orient="split", index=False),
+            ),
+        )
+
+
+def _get_file_size_and_mtime(*, file_path: pathlib.Path) -> tuple[int, int]:
+    file_stat = file_path.stat()
+
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+def _read_aggregated_activity(*, content: str) -> pandas.DataFrame:
+    # Dates and region codes such as 'NA' (Namibia) must be kept as the strings they were written as
+    return pandas.read_json(path_or_buf=io.StringIO(content), orient="split", dtype=False, convert_dates=False)
+
+
+def _link_mapped_file(*, source_file_path: pathlib.Path, file_path: pathlib.Path) -> None:
+    """Hard link a mapped file to another path, or copy it where hard links are not supported."""
+    # Renaming onto another link of the same file does nothing, so such a path must be left as it is
+    if file_path.exists() and file_path.samefile(source_file_path):
+        return
+
+    # Link to a temporary path first so an existing file is replaced in one step
+    temporary_file_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+    temporary_file_path.unlink(missing_ok=True)
+    try:
+        os.link(src=source_file_path, dst=temporary_file_path)
+    except OSError:
+        shutil.copyfile(src=source_file_path, dst=temporary_file_path)
+    temporary_file_path.replace(file_path)
@@ -0,0 +1,236 @@
+"""Adaptive control of buffer sizes and task admission to keep the reduction under a global memory ceiling."""
+
+import os
+import pathlib
+import resource
+import sys
+import threading
+from typing import Self
+
+_PROC_STATM_FILE_PATH = pathlib.Path("/proc/self/statm")
+_PAGE_SIZE_IN_BYTES = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _get_current_rss_in_bytes() -> int:
+    """Get the current resident set size (RSS) of this process."""
+    if _PROC_STATM_FILE_PATH.exists():
+        resident_pages = int(_PROC_STATM_FILE_PATH.read_text().split(" ")[1])
+        return resident_pages * _PAGE_SIZE_IN_BYTES
+
+    # Not on Linux; fall back to the peak RSS, which is reported in bytes on macOS and kilobytes elsewhere
+    maximum_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # pragma: no cover
+    return maximum_rss if sys.platform == "darwin" else maximum_rss * 1024  # pragma: no cover
+
+
+class _PeakMemorySampler:
+    def __init__(self, *, sampling_interval_in_seconds: float = 0.25) -> None:
+        """
+        Sample the RSS of the current process on a background thread while the context is active.
+
+        Parameters
+        ----------
+        sampling_interval_in_seconds : float, default: 0.25
+            The number of seconds to wait between samples.
+        """
+        self.sampling_interval_in_seconds = sampling_interval_in_seconds
+
+        self.baseline_rss_in_bytes = 0
+        self.peak_rss_in_bytes = 0
+
+        self._stop_sampling = threading.Event()
+        self._sampling_thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self) -> Self:
+        self.baseline_rss_in_bytes = _get_current_rss_in_bytes()
+        self.peak_rss_in_bytes = self.baseline_rss_in_bytes
+        self._sampling_thread.start()
+
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._stop_sampling.set()
+        self._sampling_thread.join()
+        self.peak_rss_in_bytes = max(self.peak_rss_in_bytes, _get_current_rss_in_bytes())
+
+    def _sample(self) -> None:
+        while not self._stop_sampling.wait(timeout=self.sampling_interval_in_seconds):
+            self.peak_rss_in_bytes = max(self.peak_rss_in_bytes, _get_current_rss_in_bytes())
+
+
+class _MemoryGovernor:
+    def __init__(
+        self,
+        *,
+        maximum_memory_in_bytes: int,
+        maximum_number_of_workers: int,
+        maximum_buffer_size_in_bytes: int,
+        minimum_buffer_size_in_bytes: int = 10**7,
+    ) -> None:
+        """
+        Decide the buffer size and admission of each reduction task from the memory usage observed on prior tasks.
+
+        The memory needed by a task (on top of the baseline RSS of its worker) is modelled as
+
+            usage ratio * (effective buffer size + size of the raw log file)
+
+        where the effective buffer size is the theoretical maximum usage of the `BufferedTextReader` (which can never
+        exceed three times the size of the file) and the file size accounts for the lines that survive the filters and
+        are kept in memory until the reduced file is written.
+        The usage ratio starts at a conservative value and tracks the upper envelope of the observations reported back
+        from the workers, slowly relaxing if the observations come in lower, but never below its starting value.
+
+        Buffer sizes are only decided when a task is admitted; a task keeps its buffer size until it completes, and
+        what is learned from it only applies to the tasks admitted afterwards.
+
+        Parameters
+        ----------
+        maximum_memory_in_bytes : int
+            The global memory ceiling (in bytes) to stay under across all workers.
+        maximum_number_of_workers : int
+            The maximum number of workers that tasks are distributed across.
+        maximum_buffer_size_in_bytes : int
+            The largest buffer size that may be assigned to any single task.
+        minimum_buffer_size_in_bytes : int, default: 10 MB
+            The smallest buffer size that may be assigned to any single task.
+            Tasks are not admitted while less than this would be available to them.
+        """
+        self.maximum_memory_in_bytes = maximum_memory_in_bytes
+        self.maximum_number_of_workers = maximum_number_of_workers
+        self.maximum_buffer_size_in_bytes = maximum_buffer_size_in_bytes
+        self.minimum_buffer_size_in_bytes = min(minimum_buffer_size_in_bytes, maximum_buffer_size_in_bytes)
+
+        self.baseline_rss_in_bytes = _get_current_rss_in_bytes()
+        self.minimum_usage_ratio = 1.0
+        self.usage_ratio = self.minimum_usage_ratio
+        self.relaxation_rate = 0.1
+
+        self._reserved_memory_by_task_id: dict[int, int] = dict()
+        self._next_task_id = 0
+
+        self.number_of_throttled_admissions = 0
+        self.task_records: list[dict] = []
+
+    @property
+    def reserved_memory_in_bytes(self) -> int:
+        return sum(self._reserved_memory_by_task_id.values())
+
+    def try_admit(self, *, file_size_in_bytes: int) -> tuple[int, int] | None:
+        """
+        Attempt to admit a new task for a raw log file of the given size.
+
+        Returns
+        -------
+        tuple of two integers, or None
+            The task ID and the buffer size (in bytes) to use for the task if admitted.
+            None if the task cannot currently be admitted without risking the memory ceiling; the caller should wait
+            for in-flight tasks to complete before trying again.
+        """
+        number_of_tasks_in_flight = len(self._reserved_memory_by_task_id)
+        if number_of_tasks_in_flight >= self.maximum_number_of_workers:
+            return None
+
+        # Every worker process holds onto its baseline, whether or not it is currently busy
+        available_memory_in_bytes = (
+            self.maximum_memory_in_bytes
+            - self.maximum_number_of_workers * self.baseline_rss_in_bytes
+            - self.reserved_memory_in_bytes
+        )
+        # Never ask for a larger buffer than would be needed to read the entire file at once
+        buffer_size_in_bytes = min(
+            int(available_memory_in_bytes / self.usage_ratio) - file_size_in_bytes,
+            self.maximum_buffer_size_in_bytes,
+            max(3 * file_size_in_bytes, self.minimum_buffer_size_in_bytes),
+        )
+
+        # Always admit something if nothing is running, otherwise no progress could ever be made
+        if buffer_size_in_bytes < self.minimum_buffer_size_in_bytes:
+            if number_of_tasks_in_flight != 0:
+                self.number_of_throttled_admissions += 1
+                return None
+            buffer_size_in_bytes = self.minimum_buffer_size_in_bytes
+
+        task_id = self._next_task_id
+        self._next_task_id += 1
+        self._reserved_memory_by_task_id[task_id] = self._estimate_task_memory(
+            file_size_in_bytes=file_size_in_bytes, buffer_size_in_bytes=buffer_size_in_bytes
+        )
+
+        return task_id, buffer_size_in_bytes
+
+    def release(
+        self,
+        *,
+        task_id: int,
+        file_size_in_bytes: int,
+        buffer_size_in_bytes: int,
+        baseline_rss_in_bytes: int | None,
+        peak_rss_in_bytes: int | None,
+        file_path: str | None = None,
+    ) -> None:
+        """Release the memory reserved by a completed task and learn from its observed memory usage, if reported."""
+        estimated_task_memory_in_bytes = self._reserved_memory_by_task_id.pop(task_id, None)
+
+        record = dict(
+            file_path=file_path,
+            file_size_in_bytes=file_size_in_bytes,
+            buffer_size_in_bytes=buffer_size_in_bytes,
+            estimated_task_memory_in_bytes=estimated_task_memory_in_bytes,
+            baseline_rss_in_bytes=baseline_rss_in_bytes,
+            peak_rss_in_bytes=peak_rss_in_bytes,
+        )
+        self.task_records.append(record)
+
+        if baseline_rss_in_bytes is None or peak_rss_in_bytes is None:
+            return None  # The task failed or was skipped before it could report back
+
+        self.baseline_rss_in_bytes = max(self.baseline_rss_in_bytes, baseline_rss_in_bytes)
+
+        # The RSS of small tasks is dominated by allocator and page granularity, so there is nothing to learn from them
+        effective_buffer_size_in_bytes = min(buffer_size_in_bytes, 3 * file_size_in_bytes)
+        modelled_size_in_bytes = effective_buffer_size_in_bytes + file_size_in_bytes
+        if modelled_size_in_bytes < self.minimum_buffer_size_in_bytes:
+            return None
+
+        task_memory_in_bytes = max(peak_rss_in_bytes - baseline_rss_in_bytes, 0)
+        observed_usage_ratio = task_memory_in_bytes / modelled_size_in_bytes
+
+        if observed_usage_ratio >= self.usage_ratio:
+            self.usage_ratio = observed_usage_ratio
+        else:
+            # Many tiny observations in a row would otherwise let the ratio decay toward zero and the buffers grow
+            # without bound
+            self.usage_ratio = max(
+                self.usage_ratio - self.relaxation_rate * (self.usage_ratio - observed_usage_ratio),
+                self.minimum_usage_ratio,
+            )
+
+        return None
+
+    def _estimate_task_memory(self, *, file_size_in_bytes: int, buffer_size_in_bytes: int) -> int:
+        effective_buffer_size_in_bytes = min(buffer_size_in_bytes, 3 * file_size_in_bytes)
+
+        return int(self.usage_ratio * (effective_buffer_size_in_bytes + file_size_in_bytes))
+
+    def get_report(self) -> dict:
+        """Summarize the decisions made by the governor, for inclusion in the run report."""
+        buffer_sizes_in_bytes = [record["buffer_size_in_bytes"] for record in self.task_records]
+        peak_rss_in_bytes = [
+            record["peak_rss_in_bytes"] for record in self.task_records if record["peak_rss_in_bytes"] is not None
+        ]
+
+        report = dict(
+            maximum_memory_in_bytes=self.maximum_memory_in_bytes,
+            maximum_number_of_workers=self.maximum_number_of_workers,
+            minimum_buffer_size_in_bytes=self.minimum_buffer_size_in_bytes,
+            maximum_buffer_size_in_bytes=self.maximum_buffer_size_in_bytes,
+            final_baseline_rss_in_bytes=self.baseline_rss_in_bytes,
+            final_usage_ratio=self.usage_ratio,
+            number_of_tasks=len(self.task_records),
+            number_of_throttled_admissions=self.number_of_throttled_admissions,
+            smallest_assigned_buffer_size_in_bytes=min(buffer_sizes_in_bytes, default=None),
+            largest_assigned_buffer_size_in_bytes=max(buffer_sizes_in_bytes, default=None),
+            largest_observed_peak_rss_in_bytes=max(peak_rss_in_bytes, default=None),
+            tasks=self.task_records,
+        )
+
+        return report
@@ -0,0 +1,152 @@
+"""Resolve the region of every distinct IP address across all binned logs at once."""
+
+import pathlib
+
+import numpy
+import pandas
+import tqdm
+from pydantic import DirectoryPath, FilePath, validate_call
+
+from ._binned_s3_log_store import _get_binned_s3_log_reader
+from ._binning_journal import _load_ip_address_dictionary
+from ._ip_hash_cache import _IPHashCache
+from ._ip_utils import _IP_LOOKUP_FAILURE_TIME_TO_LIVE_IN_SECONDS, _get_ip_hash, get_regions_from_ip_addresses
+
+_IP_ADDRESS_REGIONS_FILE_NAME = "ip_address_regions.tsv"
+_RESOLUTION_CHUNK_SIZE = 100_000
+
+
+@validate_call
+def resolve_regions_of_binned_s3_logs(
+    *,
+    binned_s3_logs_folder_path: DirectoryPath,
+    ip_range_database_file_path: FilePath | None = None,
+    subnet_prefix_lengths: tuple[int, int] | None = None,
+    ip_lookup_failure_time_to_live_in_seconds: float = _IP_LOOKUP_FAILURE_TIME_TO_LIVE_IN_SECONDS,
+) -> None:
+    """
+    Resolve the region of every distinct IP address in the binned S3 logs and save them as a single table.
+
+    The IP addresses of all binned logs are gathered in one pass, or taken from the dictionary of the binning journal
+    if the logs were binned with `ip_address_encoding="dictionary"`, then resolved in bulk. The table is written to
+    `ip_address_regions.tsv` in the binned folder, which `map_binned_s3_logs_to_dandisets` then joins against instead
+    of resolving the IP addresses of each asset in turn. IP addresses whose lookup failed are left out of the table, so
+    they are resolved again during mapping; so are any IP addresses binned after the table was written.
+
+    Requires the `ipinfo` environment variables to be set (`IPINFO_CREDENTIALS` and `IP_HASH_SALT`).
+
+    Parameters
+    ----------
+    binned_s3_logs_folder_path : DirectoryPath
+        The path to the folder containing the binned S3 logs, from either storage layout.
+    ip_range_database_file_path : FilePath, optional
+        The path to a CSV file of IP address ranges with the columns `start_ip`, `end_ip`, `country`, and optionally
+        `region`, used to look up the regions of IP addresses offline before falling back to `ipinfo`.
+    subnet_prefix_lengths : tuple of int, optional
+        The prefix lengths of IPv4 and IPv6 subnets, such as (24, 48), whose IP addresses are assumed to share a
+        region, so that only one IP address per subnet needs to be looked up.
+        By default, every IP address is looked up on its own.
+    ip_lookup_failure_time_to_live_in_seconds : float, default: 3600.0
+        The number of seconds after a failed lookup during which an IP address is not looked up again.
+        Set to 0 to look up every IP address whose lookup failed in earlier calls again.
+    """
+    ip_address_dictionary = _load_ip_address_dictionary(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    if ip_address_dictionary is not None:
+        # Dictionary encoded logs already list every distinct IP address, so no binned log needs reading
+        unique_ip_addresses = set(ip_address_dictionary[pandas.notna(ip_address_dictionary)])
+    else:
+        unique_ip_addresses = _gather_unique_ip_addresses(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    unique_ip_addresses.discard("unknown")
+    unique_ip_addresses = sorted(unique_ip_addresses)
+
+    regions = numpy.empty(shape=len(unique_ip_addresses), dtype=object)
+    is_resolved = numpy.ones(shape=len(unique_ip_addresses), dtype=bool)
+    ip_hash_to_region = _IPHashCache(name="region")
+    ip_hash_not_in_services = _IPHashCache(name="services")
+    ip_hash_to_failure_time = _IPHashCache(name="failures")
+    subnet_hash_to_region = _IPHashCache(name="subnets") if subnet_prefix_lengths is not None else None
+    try:
+        # Resolve in chunks to bound the size of each batch of lookups
+        for start in tqdm.tqdm(
+            iterable=range(0, len(unique_ip_addresses), _RESOLUTION_CHUNK_SIZE),
+            desc="Resolving regions of IP addresses...",
+            position=0,
+            leave=True,
+            mininterval=5.0,
+            smoothing=0,
+            unit="chunk",
+        ):
+            ip_addresses = unique_ip_addresses[start : start + _RESOLUTION_CHUNK_SIZE]
+            regions[start : start + len(ip_addresses)] = get_regions_from_ip_addresses(
+                ip_addresses=ip_addresses,
+                ip_hash_to_region=ip_hash_to_region,
+                ip_hash_not_in_services=ip_hash_not_in_services,
+                ip_range_database_file_path=ip_range_database_file_path,
+                ip_hash_to_failure_time=ip_hash_to_failure_time,
+                subnet_hash_to_region=subnet_hash_to_region,
+                subnet_prefix_lengths=subnet_prefix_lengths or (24, 48),
+                ip_lookup_failure_time_to_live_in_seconds=ip_lookup_failure_time_to_live_in_seconds,
+            )
+            for index, ip_address in enumerate(ip_addresses, start=start):
+                if regions[index] == "unknown" and _get_ip_hash(ip_address=ip_address) in ip_hash_to_failure_time:
+                    is_resolved[index] = False
+    finally:
+        ip_hash_to_region.close()
+        ip_hash_not_in_services.close()
+        ip_hash_to_failure_time.close()
+        if subnet_hash_to_region is not None:
+            subnet_hash_to_region.close()
+
+    ip_address_regions = pandas.DataFrame(
+        data={
+            "ip_address": numpy.asarray(unique_ip_addresses, dtype=object)[is_resolved],
+            "region": regions[is_resolved],
+        }
+    )
+
+    # Write to a temporary file first so that mapping never reads a partial table
+    ip_address_regions_file_path = binned_s3_logs_folder_path / _IP_ADDRESS_REGIONS_FILE_NAME
+    temporary_file_path = ip_address_regions_file_path.with_name(f"{_IP_ADDRESS_REGIONS_FILE_NAME}.tmp")
+    ip_address_regions.to_csv(path_or_buf=temporary_file_path, mode="w", sep="\t", header=True, index=False)
+    temporary_file_path.replace(ip_address_regions_file_path)
+
+
+def _gather_unique_ip_addresses(*, binned_s3_logs_folder_path: pathlib.Path) -> set[str]:
+    unique_ip_addresses = set()
+    binned_s3_log_reader = _get_binned_s3_log_reader(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    try:
+        for object_key in tqdm.tqdm(
+            iterable=binned_s3_log_reader.get_object_keys(),
+            desc="Gathering IP addresses of binned logs...",
+            position=0,
+            leave=True,
+            mininterval=5.0,
+            smoothing=0,
+            unit="object key",
+        ):
+            binned_s3_log = binned_s3_log_reader.read(object_key=object_key, columns=["ip_address"])
+            if binned_s3_log is None:
+                continue
+
+            # The IP addresses are read as categories, so only the distinct values of each log are visited
+            unique_ip_addresses.update(binned_s3_log["ip_address"].cat.categories)
+    finally:
+        binned_s3_log_reader.close()
+
+    return unique_ip_addresses
+
+
+def _load_ip_address_regions(*, binned_s3_logs_folder_path: pathlib.Path) -> pandas.Series | None:
+    """Load the table of the regions of IP addresses as a series indexed by IP address, or None if not resolved."""
+    ip_address_regions_file_path = binned_s3_logs_folder_path / _IP_ADDRESS_REGIONS_FILE_NAME
+    if not ip_address_regions_file_path.exists():
+        return None
+
+    # Region codes such as 'NA' (Namibia) must not be read as missing values
+    ip_address_regions = pandas.read_table(
+        filepath_or_buffer=ip_address_regions_file_path,
+        dtype={"ip_address": str, "region": "category"},
+        keep_default_na=False,
+    )
+
+    return pandas.Series(data=ip_address_regions["region"].array, index=ip_address_regions["ip_address"])
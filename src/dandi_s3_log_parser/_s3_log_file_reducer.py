@@ -148,9 +148,17 @@ def reduce_raw_s3_log(
 
     # TODO: generalize header to rely on the selected fields and ensure order matches
     header = "timestamp\tip_address\tobject_key\tbytes_sent\n" if len(reduced_s3_log_lines) != 0 else ""
-    with open(file=reduced_s3_log_file_path, mode="w") as io:
+
+    # The existence of the reduced file is used to indicate completion (possibly to other nodes on shared storage)
+    # So write to a temporary file first and only move it into place once fully written
+    reduced_s3_log_file_path = pathlib.Path(reduced_s3_log_file_path)
+    temporary_reduced_s3_log_file_path = reduced_s3_log_file_path.with_name(
+        f"{reduced_s3_log_file_path.name}.{task_id}"
+    )
+    with open(file=temporary_reduced_s3_log_file_path, mode="w") as io:
         io.write(header)
         io.writelines(reduced_s3_log_lines)
+    temporary_reduced_s3_log_file_path.replace(reduced_s3_log_file_path)
 
     return None
 
@@ -0,0 +1,90 @@
+"""Typed reading of the TSV files of reduced and binned S3 logs."""
+
+import importlib.util
+import io
+import pathlib
+from typing import Literal
+
+import numpy
+import pandas
+
+# The timestamps written by reduction are always ISO formatted to the second
+_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+_S3_LOG_TABLE_DTYPES = {
+    "timestamp": "str",
+    "bytes_sent": "int64",
+    "ip_address": "category",
+    "ip_id": "int64",
+    "object_key": "category",
+}
+_IS_PYARROW_AVAILABLE = importlib.util.find_spec(name="pyarrow") is not None
+
+
+def _read_s3_log_table(
+    *,
+    file_path_or_buffer: pathlib.Path | io.BytesIO,
+    columns: list[str] | None = None,
+    names: list[str] | None = None,
+    engine: Literal["c", "pyarrow"] | None = None,
+) -> pandas.DataFrame:
+    """
+    Read a TSV file of reduced or binned S3 logs with an explicit schema.
+
+    No types are inferred per file: timestamps are parsed to datetime64 as ISO 8601, bytes sent to int64,
+    and IP addresses and object keys to categoricals, so each distinct string is stored only once. The integer IDs of
+    IP addresses encoded by a dictionary are read to int64.
+
+    Parameters
+    ----------
+    file_path_or_buffer : pathlib.Path or io.BytesIO
+        The file to read. Compression is inferred from the suffix of a file path.
+    columns : list of str, optional
+        The only columns to read. By default, all columns are read.
+    names : list of str, optional
+        The names of the columns of a file written without a header.
+        By default, the names are taken from the header of the file.
+    engine : "c" or "pyarrow", optional
+        The parsing engine to use.
+        By default, the multithreaded "pyarrow" engine is used if `pyarrow` is installed, otherwise "c".
+
+    Returns
+    -------
+    s3_log_table : pandas.DataFrame
+        The records of the file, with only the requested columns.
+    """
+    engine = engine or ("pyarrow" if _IS_PYARROW_AVAILABLE else "c")
+    column_names = columns or names
+    dtype = (
+        {name: dtype for name, dtype in _S3_LOG_TABLE_DTYPES.items() if name in column_names}
+        if column_names is not None
+        else _S3_LOG_TABLE_DTYPES
+    )
+
+    s3_log_table = pandas.read_csv(
+        filepath_or_buffer=file_path_or_buffer,
+        sep="\t",
+        header=0 if names is None else None,
+        names=names,
+        usecols=columns,
+        dtype=dtype,
+        engine=engine,
+    )
+    if "timestamp" in s3_log_table.columns:
+        # The "pyarrow" engine recognizes the timestamps even when asked for strings, and gives them back with a space
+        # in place of the 'T', so only the ISO 8601 layout is assumed rather than the exact format they were written in
+        s3_log_table["timestamp"] = pandas.to_datetime(arg=s3_log_table["timestamp"], format="ISO8601")
+
+    return s3_log_table
+
+
+def _format_timestamps(*, timestamps: pandas.Series, unit: Literal["s", "D"] = "s") -> numpy.ndarray:
+    """
+    Format timestamps the way they are written in the TSV files, or only their dates if `unit` is "D".
+
+    Timestamps that are already strings are truncated to the same length.
+    """
+    if not pandas.api.types.is_datetime64_any_dtype(timestamps):
+        formatted_timestamps = timestamps.astype(str).to_numpy(dtype=str)
+        return formatted_timestamps if unit == "s" else formatted_timestamps.astype("<U10")
+
+    return numpy.datetime_as_string(arr=timestamps.to_numpy(dtype=f"datetime64[{unit}]"), unit=unit)
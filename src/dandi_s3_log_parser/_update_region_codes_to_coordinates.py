@@ -1,5 +1,6 @@
 import copy
 import functools
+import ipaddress
 import json
 import os
 import pathlib
@@ -149,7 +150,12 @@ def _get_service_coordinates_from_ipinfo(
         return coordinates
 
     cidr_addresses_and_subregions = _get_cidr_address_ranges_and_subregions(service_name=service_name)
-    subregion_to_cidr_address = {subregion: cidr_address for cidr_address, subregion in cidr_addresses_and_subregions}
+    # Geolocate through an IPv4 range of each subregion, as was done before IPv6 ranges were listed alongside them
+    subregion_to_cidr_address = {
+        subregion: cidr_address
+        for cidr_address, subregion in cidr_addresses_and_subregions
+        if ipaddress.ip_network(address=cidr_address, strict=False).version == 4
+    }
 
     handler = ipinfo.getHandler(access_token=ipinfo_api_key)
 
@@ -0,0 +1,137 @@
+"""Coordination of work across independent invocations (possibly on different nodes) that share the same storage."""
+
+import contextlib
+import os
+import pathlib
+import socket
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+
+
+@contextlib.contextmanager
+def _hold_lease(
+    *,
+    leases_folder_path: pathlib.Path,
+    relative_file_path: pathlib.Path,
+    lease_duration_in_seconds: int,
+) -> Iterator[bool]:
+    """
+    Attempt to claim the lease on a unit of work and keep it renewed for as long as the context is active.
+
+    The lease is a file created atomically (`O_CREAT | O_EXCL`) on the shared storage.
+    Its modification time is refreshed periodically by a background thread, so that a lease whose modification time
+    is older than the lease duration can be assumed to belong to a dead node and is reclaimed by the next claimant.
+
+    Parameters
+    ----------
+    leases_folder_path : pathlib.Path
+        The folder on the shared storage where all lease files are kept.
+    relative_file_path : pathlib.Path
+        The relative path of the unit of work (e.g., `2020/01/01.log`); used to name the lease file.
+    lease_duration_in_seconds : int
+        The number of seconds without renewal after which a lease is considered expired.
+
+    Yields
+    ------
+    bool
+        Whether the lease was successfully claimed.
+        If False, another invocation currently owns this unit of work and it should be skipped.
+    """
+    lease_file_path = leases_folder_path / relative_file_path.parent / f"{relative_file_path.stem}.lease"
+    lease_file_path.parent.mkdir(parents=True, exist_ok=True)
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    is_claimed = _try_claim_lease(
+        lease_file_path=lease_file_path, owner=owner, lease_duration_in_seconds=lease_duration_in_seconds
+    )
+    if not is_claimed:
+        yield False
+        return
+
+    stop_renewal = threading.Event()
+    renewal_thread = threading.Thread(
+        target=_renew_lease,
+        kwargs=dict(
+            lease_file_path=lease_file_path,
+            renewal_interval_in_seconds=lease_duration_in_seconds / 3,
+            stop_renewal=stop_renewal,
+        ),
+        daemon=True,
+    )
+    renewal_thread.start()
+    try:
+        yield True
+    finally:
+        stop_renewal.set()
+        renewal_thread.join()
+        _release_lease(lease_file_path=lease_file_path, owner=owner)
+
+
+def _try_claim_lease(*, lease_file_path: pathlib.Path, owner: str, lease_duration_in_seconds: int) -> bool:
+    try:
+        file_descriptor = os.open(lease_file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if not _is_lease_expired(lease_file_path=lease_file_path, lease_duration_in_seconds=lease_duration_in_seconds):
+            return False
+
+        # Break the expired lease by atomically moving it aside; only one contender can succeed at this rename
+        expired_lease_file_path = lease_file_path.with_name(f"{lease_file_path.name}.{uuid.uuid4().hex[:8]}.expired")
+        try:
+            os.rename(lease_file_path, expired_lease_file_path)
+        except FileNotFoundError:
+            return False  # Another contender broke it first
+
+        # Between our check and the rename, another contender may have already replaced the expired lease
+        # In that case we just moved a live lease aside and need to put it back
+        if not _is_lease_expired(
+            lease_file_path=expired_lease_file_path, lease_duration_in_seconds=lease_duration_in_seconds
+        ):
+            with contextlib.suppress(FileExistsError):
+                os.link(expired_lease_file_path, lease_file_path)
+            expired_lease_file_path.unlink(missing_ok=True)
+            return False
+        expired_lease_file_path.unlink(missing_ok=True)
+
+        try:
+            file_descriptor = os.open(lease_file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+
+    with os.fdopen(file_descriptor, mode="w") as io:
+        io.write(owner)
+
+    return True
+
+
+def _is_lease_expired(*, lease_file_path: pathlib.Path, lease_duration_in_seconds: int) -> bool:
+    try:
+        last_renewal_time = lease_file_path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+    return time.time() - last_renewal_time > lease_duration_in_seconds
+
+
+def _renew_lease(
+    *, lease_file_path: pathlib.Path, renewal_interval_in_seconds: float, stop_renewal: threading.Event
+) -> None:
+    while not stop_renewal.wait(timeout=renewal_interval_in_seconds):
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(lease_file_path)
+
+    return None
+
+
+def _release_lease(*, lease_file_path: pathlib.Path, owner: str) -> None:
+    # Only remove the lease if it is still ours; it may have expired and been reclaimed by another node meanwhile
+    try:
+        current_owner = lease_file_path.read_text()
+    except FileNotFoundError:
+        return None
+
+    if current_owner == owner:
+        lease_file_path.unlink(missing_ok=True)
+
+    return None
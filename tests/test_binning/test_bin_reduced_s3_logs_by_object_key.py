@@ -1,9 +1,16 @@
+import gzip
 import pathlib
+import shutil
 
 import pandas
 import py
+import pytest
 
 import dandi_s3_log_parser
+from dandi_s3_log_parser import _bin_all_reduced_s3_logs_by_object_key
+from dandi_s3_log_parser._binned_s3_log_store import _get_binned_s3_log_reader
+from dandi_s3_log_parser._binning_journal import _load_ip_address_dictionary
+from dandi_s3_log_parser._s3_log_table_reader import _read_s3_log_table
 
 
 def test_bin_reduced_s3_logs_by_object_key_example_0(tmpdir: py.path.local) -> None:
@@ -37,3 +44,338 @@ def test_bin_reduced_s3_logs_by_object_key_example_0(tmpdir: py.path.local) -> N
         expected_binned_s3_log = pandas.read_table(filepath_or_buffer=expected_binned_s3_log_file_path)
 
         pandas.testing.assert_frame_equal(left=test_binned_s3_log, right=expected_binned_s3_log)
+
+
+def test_bin_reduced_s3_logs_by_object_key_example_0_external_sort(tmpdir: py.path.local) -> None:
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_binned_s3_logs_folder_path = example_folder_path / "expected_output"
+    expected_binned_s3_log_file_paths = list(expected_binned_s3_logs_folder_path.rglob("*.tsv"))
+
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        engine="external_sort",
+        number_of_spill_partitions=2,
+    )
+
+    assert not (test_binned_s3_logs_folder_path / ".spill").exists()
+
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        # Pandas assertion makes no reference to the file being tested when it fails
+        print(f"Testing binning of {expected_binned_s3_log_file_path}...")
+
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        test_binned_s3_log_file_path = test_binned_s3_logs_folder_path / relative_file_path
+
+        assert test_binned_s3_log_file_path.exists()
+
+        test_binned_s3_log = pandas.read_table(filepath_or_buffer=test_binned_s3_log_file_path)
+        expected_binned_s3_log = pandas.read_table(filepath_or_buffer=expected_binned_s3_log_file_path)
+
+        pandas.testing.assert_frame_equal(left=test_binned_s3_log, right=expected_binned_s3_log)
+
+
+def test_bin_reduced_s3_logs_by_object_key_example_0_parallel(tmpdir: py.path.local) -> None:
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_binned_s3_logs_folder_path = example_folder_path / "expected_output"
+    expected_binned_s3_log_file_paths = list(expected_binned_s3_logs_folder_path.rglob("*.tsv"))
+
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        maximum_number_of_workers=2,
+    )
+
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        # Pandas assertion makes no reference to the file being tested when it fails
+        print(f"Testing binning of {expected_binned_s3_log_file_path}...")
+
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        test_binned_s3_log_file_path = test_binned_s3_logs_folder_path / relative_file_path
+
+        assert test_binned_s3_log_file_path.exists()
+
+        test_binned_s3_log = pandas.read_table(filepath_or_buffer=test_binned_s3_log_file_path)
+        expected_binned_s3_log = pandas.read_table(filepath_or_buffer=expected_binned_s3_log_file_path)
+
+        pandas.testing.assert_frame_equal(left=test_binned_s3_log, right=expected_binned_s3_log)
+
+    # Resuming with a different number of workers carries over the completed files without rebinning them
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+    )
+
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        test_binned_s3_log = pandas.read_table(filepath_or_buffer=test_binned_s3_logs_folder_path / relative_file_path)
+        expected_binned_s3_log = pandas.read_table(filepath_or_buffer=expected_binned_s3_log_file_path)
+
+        pandas.testing.assert_frame_equal(left=test_binned_s3_log, right=expected_binned_s3_log)
+
+
+def test_bin_reduced_s3_logs_by_object_key_example_0_small_buffer(tmpdir: py.path.local) -> None:
+    """A buffer smaller than any reduced file flushes after every file, which must give the same result."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_binned_s3_logs_folder_path = example_folder_path / "expected_output"
+    expected_binned_s3_log_file_paths = list(expected_binned_s3_logs_folder_path.rglob("*.tsv"))
+
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        maximum_buffer_size_in_bytes=1,
+    )
+
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        # Pandas assertion makes no reference to the file being tested when it fails
+        print(f"Testing binning of {expected_binned_s3_log_file_path}...")
+
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        test_binned_s3_log_file_path = test_binned_s3_logs_folder_path / relative_file_path
+
+        assert test_binned_s3_log_file_path.exists()
+
+        test_binned_s3_log = pandas.read_table(filepath_or_buffer=test_binned_s3_log_file_path)
+        expected_binned_s3_log = pandas.read_table(filepath_or_buffer=expected_binned_s3_log_file_path)
+
+        pandas.testing.assert_frame_equal(left=test_binned_s3_log, right=expected_binned_s3_log)
+
+
+def test_bin_reduced_s3_logs_by_object_key_example_0_recovery(
+    tmpdir: py.path.local, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """An interruption after a batch was written but before it was committed should be rolled back and rebinned."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_binned_s3_logs_folder_path = example_folder_path / "expected_output"
+    expected_binned_s3_log_file_paths = list(expected_binned_s3_logs_folder_path.rglob("*.tsv"))
+
+    original_write_binned_s3_logs = _bin_all_reduced_s3_logs_by_object_key._write_binned_s3_logs
+
+    def write_binned_s3_logs_then_crash(**kwargs) -> None:
+        original_write_binned_s3_logs(**kwargs)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(
+        _bin_all_reduced_s3_logs_by_object_key, "_write_binned_s3_logs", write_binned_s3_logs_then_crash
+    )
+    with pytest.raises(KeyboardInterrupt):
+        dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+            reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+            binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        )
+    monkeypatch.undo()
+
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+    )
+
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        test_binned_s3_log_file_path = test_binned_s3_logs_folder_path / relative_file_path
+
+        assert test_binned_s3_log_file_path.read_text() == expected_binned_s3_log_file_path.read_text()
+
+
+def test_bin_reduced_s3_logs_by_object_key_example_0_gzip(tmpdir: py.path.local) -> None:
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_binned_s3_logs_folder_path = example_folder_path / "expected_output"
+    expected_binned_s3_log_file_paths = list(expected_binned_s3_logs_folder_path.rglob("*.tsv"))
+
+    # Flushing after every reduced file appends several gzip members to some of the binned files
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        maximum_buffer_size_in_bytes=1,
+        compression="gzip",
+    )
+
+    binned_s3_log_reader = _get_binned_s3_log_reader(binned_s3_logs_folder_path=test_binned_s3_logs_folder_path)
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        test_binned_s3_log_file_path = test_binned_s3_logs_folder_path / f"{relative_file_path}.gz"
+
+        assert (
+            gzip.decompress(test_binned_s3_log_file_path.read_bytes()) == expected_binned_s3_log_file_path.read_bytes()
+        )
+
+        object_key = str(relative_file_path.parent / relative_file_path.stem)
+        test_binned_s3_log = binned_s3_log_reader.read(object_key=object_key)
+        expected_binned_s3_log = _read_s3_log_table(file_path_or_buffer=expected_binned_s3_log_file_path)
+
+        pandas.testing.assert_frame_equal(left=test_binned_s3_log, right=expected_binned_s3_log)
+        assert test_binned_s3_log["timestamp"].dtype.kind == "M"
+        assert test_binned_s3_log["bytes_sent"].dtype == "int64"
+        assert isinstance(test_binned_s3_log["ip_address"].dtype, pandas.CategoricalDtype)
+
+    with pytest.raises(ValueError, match="compression='gzip'"):
+        dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+            reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+            binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        )
+
+
+def test_bin_reduced_s3_logs_by_object_key_example_0_dictionary(tmpdir: py.path.local) -> None:
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_binned_s3_logs_folder_path = example_folder_path / "expected_output"
+    expected_binned_s3_log_file_paths = list(expected_binned_s3_logs_folder_path.rglob("*.tsv"))
+
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        maximum_buffer_size_in_bytes=1,
+        ip_address_encoding="dictionary",
+    )
+
+    ip_address_dictionary = _load_ip_address_dictionary(binned_s3_logs_folder_path=test_binned_s3_logs_folder_path)
+    binned_s3_log_reader = _get_binned_s3_log_reader(binned_s3_logs_folder_path=test_binned_s3_logs_folder_path)
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        test_binned_s3_log_file_path = test_binned_s3_logs_folder_path / relative_file_path
+
+        with test_binned_s3_log_file_path.open(mode="r") as io:
+            assert io.readline() == "timestamp\tbytes_sent\tip_id\n"
+
+        object_key = str(relative_file_path.parent / relative_file_path.stem)
+        test_binned_s3_log = binned_s3_log_reader.read(object_key=object_key)
+        expected_binned_s3_log = _read_s3_log_table(file_path_or_buffer=expected_binned_s3_log_file_path)
+
+        assert test_binned_s3_log["ip_id"].dtype == "int64"
+        assert (
+            ip_address_dictionary[test_binned_s3_log["ip_id"]].tolist()
+            == expected_binned_s3_log["ip_address"].astype(str).tolist()
+        )
+        pandas.testing.assert_frame_equal(
+            left=test_binned_s3_log.drop(columns="ip_id"), right=expected_binned_s3_log.drop(columns="ip_address")
+        )
+
+    with pytest.raises(ValueError, match="ip_address_encoding='dictionary'"):
+        dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+            reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+            binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        )
+
+
+def test_bin_reduced_s3_logs_by_object_key_time_ordering(tmpdir: py.path.local) -> None:
+    """Object keys stay guaranteed to be in timestamp order until a later call appends older records to them."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+
+    test_reduced_s3_logs_folder_path = tmpdir / "reduced_logs"
+    shutil.copytree(src=example_folder_path / "reduced_logs", dst=test_reduced_s3_logs_folder_path)
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=test_reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+    )
+
+    blob_object_key = "blobs/11e/c89/11ec8933-1456-4942-922b-94e5878bb991"
+    zarr_object_key = "zarr/cb65c877-882b-4554-8fa1-8f4e986e13a6"
+    binned_s3_log_reader = _get_binned_s3_log_reader(binned_s3_logs_folder_path=test_binned_s3_logs_folder_path)
+    assert binned_s3_log_reader.is_time_ordered(object_key=blob_object_key)
+    assert binned_s3_log_reader.is_time_ordered(object_key=zarr_object_key)
+
+    older_reduced_s3_log_file_path = test_reduced_s3_logs_folder_path / "2019" / "12" / "31.tsv"
+    older_reduced_s3_log_file_path.parent.mkdir(parents=True)
+    older_reduced_s3_log_file_path.write_text(
+        "timestamp\tip_address\tobject_key\tbytes_sent\n" f"2019-12-31T00:00:00\t192.0.2.0\t{blob_object_key}\t10\n"
+    )
+
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=test_reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+    )
+
+    binned_s3_log_reader = _get_binned_s3_log_reader(binned_s3_logs_folder_path=test_binned_s3_logs_folder_path)
+    assert not binned_s3_log_reader.is_time_ordered(object_key=blob_object_key)
+    assert binned_s3_log_reader.is_time_ordered(object_key=zarr_object_key)
+
+
+def test_bin_reduced_s3_logs_by_object_key_catalog(tmpdir: py.path.local) -> None:
+    """The catalog kept while binning summarizes each binned file without reading it."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+    expected_binned_s3_logs_folder_path = example_folder_path / "expected_output"
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    # A tiny buffer bins each reduced file as its own batch, so the entries are accumulated across batches
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        maximum_buffer_size_in_bytes=1,
+    )
+
+    binned_s3_log_reader = _get_binned_s3_log_reader(binned_s3_logs_folder_path=test_binned_s3_logs_folder_path)
+    expected_binned_s3_log_file_paths = list(expected_binned_s3_logs_folder_path.rglob("*.tsv"))
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        object_key = relative_file_path.with_suffix("").as_posix()
+        expected_binned_s3_log = pandas.read_table(filepath_or_buffer=expected_binned_s3_log_file_path)
+
+        catalog_entry = binned_s3_log_reader.get_catalog_entry(object_key=object_key)
+        assert catalog_entry.number_of_rows == len(expected_binned_s3_log)
+        assert catalog_entry.size_in_bytes == (test_binned_s3_logs_folder_path / relative_file_path).stat().st_size
+        assert catalog_entry.first_timestamp == expected_binned_s3_log["timestamp"].min()
+        assert catalog_entry.last_timestamp == expected_binned_s3_log["timestamp"].max()
+        assert catalog_entry.total_bytes_sent == expected_binned_s3_log["bytes_sent"].sum()
+
+    assert binned_s3_log_reader.get_catalog_entry(object_key="blobs/000/000/00000000-never-accessed") is None
+    assert "blobs/000/000/00000000-never-accessed" not in binned_s3_log_reader
@@ -0,0 +1,141 @@
+import pathlib
+
+import py
+import pytest
+
+import dandi_s3_log_parser
+from dandi_s3_log_parser._binned_s3_log_store import _hold_binned_s3_log_store_lease
+from dandi_s3_log_parser._binned_s3_log_writer import _BINNED_S3_LOG_HEADER
+from dandi_s3_log_parser._binning_journal import _BinningJournal
+
+
+def test_binned_s3_log_store_example_0(tmpdir: py.path.local) -> None:
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    test_binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    test_binned_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_binned_s3_logs_folder_path = example_folder_path / "expected_output"
+    expected_binned_s3_log_file_paths = list(expected_binned_s3_logs_folder_path.rglob("*.tsv"))
+
+    # Flushing after every reduced file leaves the records of some object keys spread over several extents
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path,
+        maximum_buffer_size_in_bytes=1,
+        storage="store",
+    )
+
+    assert not (test_binned_s3_logs_folder_path / "blobs").exists()
+
+    with dandi_s3_log_parser.BinnedS3LogStore(
+        binned_s3_logs_folder_path=test_binned_s3_logs_folder_path
+    ) as binned_s3_log_store:
+        assert "blobs/000/000/00000000-0000-0000-0000-000000000000" not in binned_s3_log_store
+        assert binned_s3_log_store.read(object_key="blobs/000/000/00000000-0000-0000-0000-000000000000") is None
+
+        for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+            relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+            object_key = str(relative_file_path.parent / relative_file_path.stem)
+
+            assert (
+                binned_s3_log_store.read_bytes(object_key=object_key) == expected_binned_s3_log_file_path.read_bytes()
+            )
+
+        binned_s3_log_store.compact()
+
+        number_of_segment_files = len(list(binned_s3_log_store.segments_folder_path.iterdir()))
+        assert number_of_segment_files == 1
+
+        exported_binned_s3_logs_folder_path = tmpdir / "exported_example_0"
+        exported_binned_s3_logs_folder_path.mkdir()
+        binned_s3_log_store.export_to_folder(binned_s3_logs_folder_path=exported_binned_s3_logs_folder_path)
+
+    for expected_binned_s3_log_file_path in expected_binned_s3_log_file_paths:
+        relative_file_path = expected_binned_s3_log_file_path.relative_to(expected_binned_s3_logs_folder_path)
+        exported_binned_s3_log_file_path = exported_binned_s3_logs_folder_path / relative_file_path
+
+        assert exported_binned_s3_log_file_path.read_bytes() == expected_binned_s3_log_file_path.read_bytes()
+
+
+def test_binned_s3_log_store_incremental_compaction(tmpdir: py.path.local) -> None:
+    """Only fragmented object keys and small segments are rewritten; other segments are left as they are."""
+    tmpdir = pathlib.Path(tmpdir)
+    header = _BINNED_S3_LOG_HEADER.encode(encoding="utf-8")
+
+    with dandi_s3_log_parser.BinnedS3LogStore(binned_s3_logs_folder_path=tmpdir) as binned_s3_log_store:
+        binned_s3_log_store._append(batch_id=0, contents=[("blobs/a", b"1\n"), ("blobs/b", b"2\n")])
+    with dandi_s3_log_parser.BinnedS3LogStore(binned_s3_logs_folder_path=tmpdir) as binned_s3_log_store:
+        binned_s3_log_store._append(batch_id=1, contents=[("blobs/a", b"3\n")])
+        first_segment_file_path, second_segment_file_path = sorted(binned_s3_log_store.segments_folder_path.iterdir())
+
+    dandi_s3_log_parser.compact_binned_s3_log_store(binned_s3_logs_folder_path=tmpdir, small_segment_size_in_bytes=3)
+
+    with dandi_s3_log_parser.BinnedS3LogStore(binned_s3_logs_folder_path=tmpdir) as binned_s3_log_store:
+        assert binned_s3_log_store.read_bytes(object_key="blobs/a") == header + b"1\n3\n"
+        assert binned_s3_log_store.read_bytes(object_key="blobs/b") == header + b"2\n"
+
+        # The first segment still holds the only extent of 'blobs/b'; the small second one was drained
+        segment_file_paths = sorted(binned_s3_log_store.segments_folder_path.iterdir())
+        assert first_segment_file_path in segment_file_paths
+        assert second_segment_file_path not in segment_file_paths
+        assert len(segment_file_paths) == 2
+
+        # Nothing is left to rewrite
+        binned_s3_log_store.compact(small_segment_size_in_bytes=3)
+        assert sorted(binned_s3_log_store.segments_folder_path.iterdir()) == segment_file_paths
+
+    with pytest.raises(ValueError):
+        dandi_s3_log_parser.compact_binned_s3_log_store(binned_s3_logs_folder_path=tmpdir / "binned_s3_log_store")
+
+
+def test_binned_s3_log_store_compaction_during_binning(tmpdir: py.path.local) -> None:
+    """Compaction leaves the segments alone while binning is running or an interrupted batch is still to roll back."""
+    tmpdir = pathlib.Path(tmpdir)
+    header = _BINNED_S3_LOG_HEADER.encode(encoding="utf-8")
+    reduced_s3_logs_folder_path = pathlib.Path(__file__).parent / "examples" / "binning_example_0" / "reduced_logs"
+
+    journal = _BinningJournal(binned_s3_logs_folder_path=tmpdir)
+    for reduced_s3_log_file, contents in [("2020-01-01.tsv", b"1\n"), ("2020-01-02.tsv", b"2\n")]:
+        batch_id = journal.start_batch(reduced_s3_log_files=[reduced_s3_log_file], worker_index=0, number_of_workers=1)
+        with dandi_s3_log_parser.BinnedS3LogStore(binned_s3_logs_folder_path=tmpdir) as binned_s3_log_store:
+            binned_s3_log_store._append(batch_id=batch_id, contents=[("blobs/a", contents)])
+            segments_folder_path = binned_s3_log_store.segments_folder_path
+        journal.commit_batch(batch_id=batch_id)
+    segment_file_paths = sorted(segments_folder_path.iterdir())
+
+    # Binning holds the lease on the store for as long as it runs
+    with _hold_binned_s3_log_store_lease(binned_s3_logs_folder_path=tmpdir) as is_claimed:
+        assert is_claimed
+        with pytest.raises(ValueError):
+            dandi_s3_log_parser.compact_binned_s3_log_store(binned_s3_logs_folder_path=tmpdir)
+        with pytest.raises(ValueError):
+            dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+                reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+                binned_s3_logs_folder_path=tmpdir,
+                storage="store",
+            )
+    assert sorted(segments_folder_path.iterdir()) == segment_file_paths
+
+    # An interrupted call to binning left its batch uncommitted
+    batch_id = journal.start_batch(reduced_s3_log_files=["2020-01-03.tsv"], worker_index=0, number_of_workers=1)
+    with dandi_s3_log_parser.BinnedS3LogStore(binned_s3_logs_folder_path=tmpdir) as binned_s3_log_store:
+        binned_s3_log_store._append(batch_id=batch_id, contents=[("blobs/a", b"3\n")])
+    segment_file_paths = sorted(segments_folder_path.iterdir())
+
+    with pytest.raises(ValueError):
+        dandi_s3_log_parser.compact_binned_s3_log_store(binned_s3_logs_folder_path=tmpdir)
+    assert sorted(segments_folder_path.iterdir()) == segment_file_paths
+
+    # Once the batch is rolled back, compaction goes ahead without the records of that batch
+    with dandi_s3_log_parser.BinnedS3LogStore(binned_s3_logs_folder_path=tmpdir) as binned_s3_log_store:
+        journal.recover(on_rollback=binned_s3_log_store._discard_batch)
+    journal.close()
+
+    dandi_s3_log_parser.compact_binned_s3_log_store(binned_s3_logs_folder_path=tmpdir)
+    with dandi_s3_log_parser.BinnedS3LogStore(binned_s3_logs_folder_path=tmpdir) as binned_s3_log_store:
+        assert binned_s3_log_store.read_bytes(object_key="blobs/a") == header + b"1\n2\n"
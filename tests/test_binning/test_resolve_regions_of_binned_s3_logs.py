@@ -0,0 +1,103 @@
+import pathlib
+from collections.abc import Iterator
+
+import py
+import pytest
+
+import dandi_s3_log_parser
+from dandi_s3_log_parser import _ip_utils
+from dandi_s3_log_parser._binning_journal import _BinningJournal
+from dandi_s3_log_parser._cidr_range_cache import _create_cidr_range_snapshot
+from dandi_s3_log_parser._resolve_regions_of_binned_s3_logs import _load_ip_address_regions
+
+
+def _clear_service_caches() -> None:
+    _ip_utils._get_cidr_range_snapshot_folder_path_for_process.cache_clear()
+    _ip_utils._request_cidr_range.cache_clear()
+    _ip_utils._get_cidr_address_ranges_and_subregions.cache_clear()
+    _ip_utils._get_ip_interval_index.cache_clear()
+
+
+@pytest.fixture
+def pinned_cidr_range_snapshot(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[pathlib.Path]:
+    """Pin the address ranges of the known services to a local snapshot instead of fetching them."""
+    snapshot_folder_path = _create_cidr_range_snapshot(
+        cache_folder_path=tmp_path / "cidr_ranges",
+        cidr_ranges_by_service_name={
+            "GitHub": dict(),
+            "AWS": {"prefixes": []},
+            "GCP": {"prefixes": []},
+            "VPN": ["203.0.113.0/24"],
+        },
+    )
+    monkeypatch.setenv(name="CIDR_RANGE_SNAPSHOT", value=str(snapshot_folder_path))
+    _clear_service_caches()
+    yield snapshot_folder_path
+    _clear_service_caches()
+
+
+def test_resolve_regions_of_binned_s3_logs(tmpdir: py.path.local, pinned_cidr_range_snapshot: pathlib.Path) -> None:
+    """The distinct IP addresses of all binned logs are resolved into a single table."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    binned_s3_logs_folder_path = tmpdir / "binned"
+    blob_file_path = binned_s3_logs_folder_path / "blobs" / "a7b" / "032" / "a7b032b8-1e31-429f-975f-52a28cec6629.tsv"
+    blob_file_path.parent.mkdir(parents=True)
+    blob_file_path.write_text(
+        "timestamp\tbytes_sent\tip_address\n"
+        "2020-01-01T22:42:58\t512\t192.0.2.1\n"
+        "2020-01-02T22:42:58\t512\tunknown\n"
+        "2020-01-03T22:42:58\t512\t198.51.100.7\n"
+    )
+    zarr_file_path = binned_s3_logs_folder_path / "zarr" / "cb65c877-882b-4554-8fa1-8f4e986e13a6.tsv"
+    zarr_file_path.parent.mkdir(parents=True)
+    zarr_file_path.write_text(
+        "timestamp\tbytes_sent\tip_address\n"
+        "2020-01-01T22:42:58\t512\t192.0.2.1\n"
+        "2020-01-02T22:42:58\t512\t203.0.113.5\n"
+    )
+
+    ip_range_database_file_path = tmpdir / "ip_ranges.csv"
+    ip_range_database_file_path.write_text(
+        "start_ip,end_ip,country,region\n192.0.2.0,192.0.2.255,US,California\n198.51.100.0,198.51.100.255,NA,\n"
+    )
+
+    dandi_s3_log_parser.resolve_regions_of_binned_s3_logs(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path, ip_range_database_file_path=ip_range_database_file_path
+    )
+
+    ip_address_regions = _load_ip_address_regions(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    assert ip_address_regions.to_dict() == {"192.0.2.1": "US/California", "198.51.100.7": "NA", "203.0.113.5": "VPN"}
+
+    # The table itself is not mistaken for a binned log
+    dandi_s3_log_parser.resolve_regions_of_binned_s3_logs(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path, ip_range_database_file_path=ip_range_database_file_path
+    )
+    assert _load_ip_address_regions(binned_s3_logs_folder_path=binned_s3_logs_folder_path).equals(ip_address_regions)
+
+
+def test_resolve_regions_of_binned_s3_logs_dictionary(
+    tmpdir: py.path.local, pinned_cidr_range_snapshot: pathlib.Path
+) -> None:
+    """The IP addresses of dictionary encoded logs are taken from the binning journal."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    binned_s3_logs_folder_path = tmpdir / "binned"
+    binned_s3_logs_folder_path.mkdir()
+    journal = _BinningJournal(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    try:
+        journal.check_setting(name="ip_address_encoding", value="dictionary")
+        ip_ids = journal.get_ip_ids(ip_addresses=["192.0.2.1", "unknown", "203.0.113.5"])
+    finally:
+        journal.close()
+    assert ip_ids == [1, 2, 3]
+
+    ip_range_database_file_path = tmpdir / "ip_ranges.csv"
+    ip_range_database_file_path.write_text("start_ip,end_ip,country,region\n192.0.2.0,192.0.2.255,US,California\n")
+
+    dandi_s3_log_parser.resolve_regions_of_binned_s3_logs(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path, ip_range_database_file_path=ip_range_database_file_path
+    )
+
+    ip_address_regions = _load_ip_address_regions(binned_s3_logs_folder_path=binned_s3_logs_folder_path)
+    assert ip_address_regions.to_dict() == {"192.0.2.1": "US/California", "203.0.113.5": "VPN"}
@@ -0,0 +1,44 @@
+import datetime
+
+import pytest
+
+from dandi_s3_log_parser._cidr_range_cache import (
+    _create_cidr_range_snapshot,
+    _get_cidr_range_snapshot_folder_path,
+    _load_cidr_range,
+)
+
+
+def test_cidr_range_cache(tmp_path) -> None:
+    """The most recent snapshot is used while fresh, and any snapshot can be pinned by ID or path."""
+    cache_folder_path = tmp_path / "cidr_ranges"
+    fetch_time = datetime.datetime.now(tz=datetime.timezone.utc)
+    old_snapshot_folder_path = _create_cidr_range_snapshot(
+        cache_folder_path=cache_folder_path,
+        cidr_ranges_by_service_name={"VPN": ["192.0.2.0/24"]},
+        fetch_time=fetch_time - datetime.timedelta(days=3),
+    )
+    snapshot_folder_path = _create_cidr_range_snapshot(
+        cache_folder_path=cache_folder_path,
+        cidr_ranges_by_service_name={"VPN": ["198.51.100.0/24"]},
+        fetch_time=fetch_time,
+    )
+    assert snapshot_folder_path.name == fetch_time.strftime("%Y%m%dT%H%M%SZ")
+    (cache_folder_path / "not_a_snapshot").mkdir()
+
+    assert _get_cidr_range_snapshot_folder_path(cache_folder_path=cache_folder_path) == snapshot_folder_path
+    assert _load_cidr_range(snapshot_folder_path=snapshot_folder_path, service_name="VPN") == ["198.51.100.0/24"]
+
+    pinned_snapshot_folder_path = _get_cidr_range_snapshot_folder_path(
+        cache_folder_path=cache_folder_path, pinned_snapshot=old_snapshot_folder_path.name
+    )
+    assert pinned_snapshot_folder_path == old_snapshot_folder_path
+    assert _load_cidr_range(snapshot_folder_path=pinned_snapshot_folder_path, service_name="VPN") == ["192.0.2.0/24"]
+
+    pinned_snapshot_folder_path = _get_cidr_range_snapshot_folder_path(
+        cache_folder_path=tmp_path / "elsewhere", pinned_snapshot=str(old_snapshot_folder_path)
+    )
+    assert pinned_snapshot_folder_path == old_snapshot_folder_path
+
+    with pytest.raises(ValueError, match="was not found or is not valid"):
+        _get_cidr_range_snapshot_folder_path(cache_folder_path=cache_folder_path, pinned_snapshot="not_a_snapshot")
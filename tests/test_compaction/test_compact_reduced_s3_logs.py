@@ -0,0 +1,114 @@
+import bisect
+import json
+import pathlib
+import shutil
+
+import pandas
+import py
+
+import dandi_s3_log_parser
+from dandi_s3_log_parser._compact_reduced_s3_logs import _REDUCED_S3_LOG_HEADER
+
+
+def _read_object_key_from_compacted_partition(
+    *, compacted_s3_log_file_path: pathlib.Path, object_key: str
+) -> pandas.DataFrame:
+    """Read only the rows of a single object key from a compacted partition by seeking through its index."""
+    index_file_path = compacted_s3_log_file_path.with_suffix(".index.json")
+    with index_file_path.open(mode="r") as io:
+        index = json.load(fp=io)
+
+    blocks = index["blocks"]
+    block_index = bisect.bisect_right([block["first_object_key"] for block in blocks], object_key) - 1
+    if block_index < 0 or blocks[block_index]["last_object_key"] < object_key:
+        return pandas.DataFrame(columns=_REDUCED_S3_LOG_HEADER, dtype=str)
+
+    block = blocks[block_index]
+    with compacted_s3_log_file_path.open(mode="rb") as io:
+        io.seek(block["byte_offset"])
+        block_bytes = io.read(block["byte_length"])
+
+    rows = [line.split("\t") for line in block_bytes.decode(encoding="utf-8").splitlines()]
+    block_data_frame = pandas.DataFrame(data=rows, columns=_REDUCED_S3_LOG_HEADER, dtype=str)
+    object_key_data_frame = block_data_frame[block_data_frame["object_key"] == object_key].reset_index(drop=True)
+
+    return object_key_data_frame
+
+
+def test_compact_reduced_s3_logs_example_0(tmpdir: py.path.local) -> None:
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "compaction_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    test_compacted_s3_logs_folder_path = tmpdir / "compacted_example_0"
+    test_compacted_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_compacted_s3_logs_folder_path = example_folder_path / "expected_output"
+
+    dandi_s3_log_parser.compact_reduced_s3_logs(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        compacted_s3_logs_folder_path=test_compacted_s3_logs_folder_path,
+        minimum_rows_per_index_block=2,
+    )
+
+    for expected_compacted_s3_log_file_path in expected_compacted_s3_logs_folder_path.rglob("*.tsv"):
+        relative_file_path = expected_compacted_s3_log_file_path.relative_to(expected_compacted_s3_logs_folder_path)
+        test_compacted_s3_log_file_path = test_compacted_s3_logs_folder_path / relative_file_path
+
+        assert test_compacted_s3_log_file_path.read_text() == expected_compacted_s3_log_file_path.read_text()
+
+    # Blocks of at least two rows that never split an object key
+    with (test_compacted_s3_logs_folder_path / "2020" / "01.index.json").open(mode="r") as io:
+        index = json.load(fp=io)
+    assert index["number_of_rows"] == 5
+    assert [(block["first_object_key"], block["number_of_rows"]) for block in index["blocks"]] == [
+        ("blobs/11e/c89/11ec8933-1456-4942-922b-94e5878bb991", 2),
+        ("blobs/a7b/032/a7b032b8-1e31-429f-975f-52a28cec6629", 3),
+    ]
+
+    zarr_data_frame = _read_object_key_from_compacted_partition(
+        compacted_s3_log_file_path=test_compacted_s3_logs_folder_path / "2020" / "01.tsv",
+        object_key="zarr/cb65c877-882b-4554-8fa1-8f4e986e13a6",
+    )
+    assert zarr_data_frame["timestamp"].tolist() == ["2020-01-01T22:42:58", "2020-01-02T01:00:00"]
+
+
+def test_compact_reduced_s3_logs_incremental(tmpdir: py.path.local) -> None:
+    """Only the partitions that received new days should be recompacted."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "compaction_example_0"
+
+    test_reduced_s3_logs_folder_path = tmpdir / "reduced_logs"
+    shutil.copytree(src=example_folder_path / "reduced_logs", dst=test_reduced_s3_logs_folder_path)
+
+    test_compacted_s3_logs_folder_path = tmpdir / "compacted_example_0"
+    test_compacted_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    dandi_s3_log_parser.compact_reduced_s3_logs(
+        reduced_s3_logs_folder_path=test_reduced_s3_logs_folder_path,
+        compacted_s3_logs_folder_path=test_compacted_s3_logs_folder_path,
+    )
+
+    first_partition_file_path = test_compacted_s3_logs_folder_path / "2020" / "01.tsv"
+    second_partition_file_path = test_compacted_s3_logs_folder_path / "2022" / "06.tsv"
+    first_partition_mtime = first_partition_file_path.stat().st_mtime_ns
+    second_partition_mtime = second_partition_file_path.stat().st_mtime_ns
+
+    new_day_file_path = test_reduced_s3_logs_folder_path / "2022" / "06" / "13.tsv"
+    new_day_file_path.write_text(
+        "timestamp\tip_address\tobject_key\tbytes_sent\n"
+        "2022-06-13T00:00:00\t192.0.2.0\tblobs/11e/c89/11ec8933-1456-4942-922b-94e5878bb991\t10\n"
+    )
+
+    dandi_s3_log_parser.compact_reduced_s3_logs(
+        reduced_s3_logs_folder_path=test_reduced_s3_logs_folder_path,
+        compacted_s3_logs_folder_path=test_compacted_s3_logs_folder_path,
+    )
+
+    assert first_partition_file_path.stat().st_mtime_ns == first_partition_mtime
+    assert second_partition_file_path.stat().st_mtime_ns != second_partition_mtime
+    assert second_partition_file_path.read_text() == new_day_file_path.read_text()
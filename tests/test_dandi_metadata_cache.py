@@ -0,0 +1,108 @@
+import http.server
+import json
+import pathlib
+import threading
+import urllib.parse
+from collections.abc import Iterator
+
+import pytest
+
+from dandi_s3_log_parser._dandi_metadata_cache import _DandiAsset, _DandiMetadataCache
+
+_ASSETS_BY_VERSION = {
+    ("000001", "0.210812.1448"): [
+        {"path": "sub-1/sub-1.nwb", "blob": "a7b032b8-1e31-429f-975f-52a28cec6629", "zarr": None},
+        {"path": "sub-2/sub-2.nwb", "blob": "cbcf1d6d-7f64-4d1f-8692-6ef0e8c9ba7f", "zarr": None},
+        {"path": "sub-3/sub-3.ome.zarr", "blob": None, "zarr": "cb65c877-882b-4554-8fa1-8f4e986e13a6"},
+    ],
+    ("000001", "draft"): [
+        {"path": "sub-1/sub-1.nwb", "blob": "a7b032b8-1e31-429f-975f-52a28cec6629", "zarr": None},
+    ],
+}
+
+
+class _DandiStandInRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Mimic the paginated version and asset endpoints of the DANDI API, with one result per page."""
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlparse(self.path)
+        page = int(urllib.parse.parse_qs(url.query).get("page", ["1"])[0])
+        path_parts = url.path.strip("/").split("/")
+        self.server.requested_paths.append(url.path)
+
+        match path_parts:
+            case ["api", "dandisets", "000001", "versions"]:
+                results = [
+                    {"version": "0.210812.1448", "modified": "2021-08-12T14:48:00Z"},
+                    {"version": "draft", "modified": self.server.draft_modified},
+                ]
+            case ["api", "dandisets", dandiset_id, "versions", version_id, "assets"]:
+                results = _ASSETS_BY_VERSION[(dandiset_id, version_id)]
+            case _:
+                self.send_response(code=404)
+                self.end_headers()
+                return
+
+        next_url = (
+            f"http://127.0.0.1:{self.server.server_port}{url.path}?page={page + 1}" if page < len(results) else None
+        )
+        content = json.dumps({"count": len(results), "next": next_url, "results": results[page - 1 : page]}).encode()
+        self.send_response(code=200)
+        self.send_header(keyword="Content-Type", value="application/json")
+        self.send_header(keyword="Content-Length", value=str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def dandi_stand_in() -> Iterator[http.server.ThreadingHTTPServer]:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _DandiStandInRequestHandler)
+    server.requested_paths = []
+    server.draft_modified = "2024-01-01T00:00:00Z"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_dandi_metadata_cache(tmp_path: pathlib.Path, dandi_stand_in: http.server.ThreadingHTTPServer) -> None:
+    """Published versions are fetched once; drafts are fetched again only after they are modified."""
+    cache_file_path = tmp_path / "dandi_metadata_cache.sqlite"
+    api_url = f"http://127.0.0.1:{dandi_stand_in.server_port}/api"
+    published_assets_path = "/api/dandisets/000001/versions/0.210812.1448/assets/"
+    draft_assets_path = "/api/dandisets/000001/versions/draft/assets/"
+
+    with _DandiMetadataCache(cache_file_path=cache_file_path, api_url=api_url, maximum_number_of_workers=2) as cache:
+        cache.prefetch(dandiset_ids=["000001"])
+        assert cache.get_version_ids(dandiset_id="000001") == ["0.210812.1448", "draft"]
+        assert cache.get_assets(dandiset_id="000001", version_id="0.210812.1448") == [
+            _DandiAsset(path="sub-1/sub-1.nwb", blob_id="a7b032b8-1e31-429f-975f-52a28cec6629", zarr_id=None),
+            _DandiAsset(path="sub-2/sub-2.nwb", blob_id="cbcf1d6d-7f64-4d1f-8692-6ef0e8c9ba7f", zarr_id=None),
+            _DandiAsset(path="sub-3/sub-3.ome.zarr", blob_id=None, zarr_id="cb65c877-882b-4554-8fa1-8f4e986e13a6"),
+        ]
+    assert dandi_stand_in.requested_paths.count(published_assets_path) == 3  # One request per page
+    assert dandi_stand_in.requested_paths.count(draft_assets_path) == 1
+
+    # Only the list of versions is fetched again while nothing has changed
+    dandi_stand_in.requested_paths.clear()
+    with _DandiMetadataCache(cache_file_path=cache_file_path, api_url=api_url) as cache:
+        assert len(cache.get_assets(dandiset_id="000001", version_id="draft")) == 1
+    assert set(dandi_stand_in.requested_paths) == {"/api/dandisets/000001/versions/"}
+
+    dandi_stand_in.requested_paths.clear()
+    dandi_stand_in.draft_modified = "2024-02-01T00:00:00Z"
+    _ASSETS_BY_VERSION[("000001", "draft")].append(
+        {"path": "sub-4/sub-4.nwb", "blob": "58c53789-eec4-4080-ad3b-207cf2a1a1d9", "zarr": None}
+    )
+    try:
+        with _DandiMetadataCache(cache_file_path=cache_file_path, api_url=api_url) as cache:
+            assert len(cache.get_assets(dandiset_id="000001", version_id="draft")) == 2
+            assert len(cache.get_assets(dandiset_id="000001", version_id="0.210812.1448")) == 3
+    finally:
+        _ASSETS_BY_VERSION[("000001", "draft")].pop()
+    assert published_assets_path not in dandi_stand_in.requested_paths
+    assert dandi_stand_in.requested_paths.count(draft_assets_path) == 2
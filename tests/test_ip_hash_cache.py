@@ -0,0 +1,55 @@
+import pathlib
+
+import py
+import yaml
+
+from dandi_s3_log_parser._ip_hash_cache import _IPHashCache
+
+
+def test_ip_hash_cache(tmpdir: py.path.local) -> None:
+    """New entries persist as soon as they are set, and the legacy YAML cache is imported only once."""
+    tmpdir = pathlib.Path(tmpdir)
+    cache_file_path = tmpdir / "ip_hash_cache.sqlite"
+    legacy_yaml_file_path = tmpdir / "ip_hash_to_region.yaml"
+
+    imported_ip_hash = "0" * 40
+    new_ip_hash = "f" * 40
+    with legacy_yaml_file_path.open(mode="w") as stream:
+        yaml.dump(data={imported_ip_hash: "US/California"}, stream=stream)
+
+    ip_hash_to_region = _IPHashCache(
+        name="region", cache_file_path=cache_file_path, legacy_yaml_file_path=legacy_yaml_file_path
+    )
+    assert ip_hash_to_region.get(imported_ip_hash) == "US/California"
+    assert ip_hash_to_region.get(new_ip_hash) is None
+
+    # Another reader sees the new entry without the first cache being closed
+    ip_hash_to_region[new_ip_hash] = "AWS/us-east-2"
+    with _IPHashCache(
+        name="region", cache_file_path=cache_file_path, legacy_yaml_file_path=legacy_yaml_file_path
+    ) as other_ip_hash_to_region:
+        assert other_ip_hash_to_region[new_ip_hash] == "AWS/us-east-2"
+        assert dict(other_ip_hash_to_region) == {imported_ip_hash: "US/California", new_ip_hash: "AWS/us-east-2"}
+    ip_hash_to_region.close()
+
+    # Later changes to the legacy file are not imported again
+    with legacy_yaml_file_path.open(mode="w") as stream:
+        yaml.dump(data={imported_ip_hash: "unknown", "1" * 40: "unknown"}, stream=stream)
+    with _IPHashCache(
+        name="region", cache_file_path=cache_file_path, legacy_yaml_file_path=legacy_yaml_file_path
+    ) as ip_hash_to_region:
+        assert len(ip_hash_to_region) == 2
+        assert ip_hash_to_region[imported_ip_hash] == "US/California"
+
+    # Each name is kept separately in the same database
+    with _IPHashCache(
+        name="services", cache_file_path=cache_file_path, legacy_yaml_file_path=tmpdir / "missing.yaml"
+    ) as ip_hash_not_in_services:
+        assert len(ip_hash_not_in_services) == 0
+        ip_hash_not_in_services[new_ip_hash] = True
+        assert ip_hash_not_in_services.get(new_ip_hash) is True
+
+    with _IPHashCache(name="failures", cache_file_path=cache_file_path) as ip_hash_to_failure_time:
+        ip_hash_to_failure_time[new_ip_hash] = 1_700_000_000.5
+        assert ip_hash_to_failure_time.pop(new_ip_hash) == 1_700_000_000.5
+        assert len(ip_hash_to_failure_time) == 0
@@ -0,0 +1,91 @@
+import ipaddress
+import random
+
+from dandi_s3_log_parser._ip_interval_index import _IPIntervalIndex
+
+
+def test_ip_interval_index_matches_first_range_in_order() -> None:
+    """Lookups return the same region as scanning the ranges in order, for both IPv4 and IPv6."""
+    cidr_addresses_and_regions = [
+        ("10.0.0.0/16", "GitHub"),
+        ("10.0.0.0/8", "AWS/us-east-2"),  # Contains the previous range, which takes priority
+        ("10.0.128.0/24", "AWS/us-west-1"),  # Entirely hidden by the first range
+        ("192.0.2.0/24", "GCP/europe-west1"),
+        ("192.0.2.128/25", "VPN"),
+        ("2001:db8::/32", "AWS/eu-central-1"),
+        ("2001:db8:1::/48", "GCP/us-central1"),
+        ("255.255.255.255/32", "VPN"),
+    ]
+    ip_interval_index = _IPIntervalIndex.from_cidr_addresses_and_regions(
+        cidr_addresses_and_regions=cidr_addresses_and_regions
+    )
+
+    assert ip_interval_index.lookup(ip_address="10.0.0.1") == "GitHub"
+    assert ip_interval_index.lookup(ip_address="10.0.128.1") == "GitHub"
+    assert ip_interval_index.lookup(ip_address="10.1.0.1") == "AWS/us-east-2"
+    assert ip_interval_index.lookup(ip_address="192.0.2.200") == "GCP/europe-west1"
+    assert ip_interval_index.lookup(ip_address="2001:db8:1::1") == "AWS/eu-central-1"
+    assert ip_interval_index.lookup(ip_address="255.255.255.255") == "VPN"
+    assert ip_interval_index.lookup(ip_address="198.51.100.0") is None
+    assert ip_interval_index.lookup(ip_address="2001:db9::") is None
+
+    random_generator = random.Random(0)
+    ip_addresses = [
+        str(ipaddress.ip_address(random_generator.choice([167772160, 3221225984]) + random_generator.randrange(2**17)))
+        for _ in range(1_000)
+    ] + [str(ipaddress.ip_address((0x20010DB8 << 96) + random_generator.randrange(2**82))) for _ in range(1_000)]
+    expected_regions = [
+        next(
+            (
+                region
+                for cidr_address, region in cidr_addresses_and_regions
+                if ipaddress.ip_address(address=ip_address) in ipaddress.ip_network(address=cidr_address)
+            ),
+            None,
+        )
+        for ip_address in ip_addresses
+    ]
+
+    assert ip_interval_index.lookup_many(ip_addresses=ip_addresses) == expected_regions
+
+
+def test_ip_interval_index_save_and_load(tmp_path) -> None:
+    """A saved index maps back into memory with the same lookups."""
+    ip_interval_index = _IPIntervalIndex.from_address_ranges_and_regions(
+        address_ranges_and_regions=[
+            ("192.0.2.0", "192.0.2.255", "US/California"),
+            ("192.0.2.100", "198.51.100.9", "NA"),
+            ("2001:db8::", "2001:db8::ffff", "DE/Hesse"),
+        ]
+    )
+    index_file_path = tmp_path / "test.index"
+    ip_interval_index.save(file_path=index_file_path)
+    loaded_ip_interval_index = _IPIntervalIndex.load(file_path=index_file_path)
+
+    ip_addresses = ["192.0.2.255", "192.0.3.0", "198.51.100.9", "198.51.100.10", "2001:db8::1", "::1"]
+    expected_regions = ["US/California", "NA", "NA", None, "DE/Hesse", None]
+    assert ip_interval_index.lookup_many(ip_addresses=ip_addresses) == expected_regions
+    assert loaded_ip_interval_index.lookup_many(ip_addresses=ip_addresses) == expected_regions
+
+
+def test_ip_interval_index_keeps_ipv4_out_of_ipv6_ranges(tmp_path) -> None:
+    """IPv6 ranges that span the IPv4-mapped block (::ffff:0:0/96) never match IPv4 addresses."""
+    ip_interval_index = _IPIntervalIndex.from_cidr_addresses_and_regions(
+        cidr_addresses_and_regions=[("::/2", "AWS/eu-central-1"), ("132.221.0.0/16", "US/California")]
+    )
+    assert ip_interval_index.lookup(ip_address="132.221.109.160") == "US/California"
+    assert ip_interval_index.lookup(ip_address="132.222.0.1") is None
+    assert ip_interval_index.lookup(ip_address="::1") == "AWS/eu-central-1"
+    assert ip_interval_index.lookup(ip_address="::1:0:0:0") == "AWS/eu-central-1"
+
+    ip_interval_index = _IPIntervalIndex.from_address_ranges_and_regions(
+        address_ranges_and_regions=[("::", "3fff:ffff:ffff:ffff:ffff:ffff:ffff:ffff", "DE/Hesse")]
+    )
+    assert ip_interval_index.lookup_many(ip_addresses=["132.221.109.160", "2001:db8::1"]) == [None, "DE/Hesse"]
+
+    # Indexes saved in an earlier file format are built again rather than loaded
+    index_file_path = tmp_path / "test.index"
+    index_file_path.write_bytes(b"IPINTVL1")
+    assert not _IPIntervalIndex.is_saved(file_path=index_file_path)
+    ip_interval_index.save(file_path=index_file_path)
+    assert _IPIntervalIndex.is_saved(file_path=index_file_path)
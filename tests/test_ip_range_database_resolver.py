@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+import dandi_s3_log_parser
+from dandi_s3_log_parser._ip_range_database_resolver import _IPRangeDatabaseResolver
+
+
+def test_ip_range_database_resolver(tmp_path) -> None:
+    """Regions are read from a CSV file of IP address ranges, which is compiled again once modified."""
+    ip_range_database_file_path = tmp_path / "ip_ranges.csv"
+    ip_range_database_file_path.write_text(
+        "start_ip,end_ip,country,region,asn\n"
+        "192.0.2.0,192.0.2.127,US,California,AS64496\n"
+        "192.0.2.128,192.0.2.255,NA,,AS64497\n"
+        "2001:db8::,2001:db8::ffff,DE,Hesse,AS64498\n"
+    )
+
+    ip_range_database_resolver = _IPRangeDatabaseResolver(ip_range_database_file_path=ip_range_database_file_path)
+    assert (tmp_path / "ip_ranges.csv.index").exists()
+
+    ip_addresses = ["192.0.2.1", "192.0.2.200", "2001:db8::1", "198.51.100.0"]
+    expected_regions_by_ip_address = {"192.0.2.1": "US/California", "192.0.2.200": "NA", "2001:db8::1": "DE/Hesse"}
+    assert ip_range_database_resolver.resolve(ip_addresses=ip_addresses) == expected_regions_by_ip_address
+
+    # Make sure the modification is seen even on file systems with coarse timestamps
+    ip_range_database_file_path.write_text("start_ip,end_ip,country\n198.51.100.0,198.51.100.255,GB\n")
+    index_modification_time = (tmp_path / "ip_ranges.csv.index").stat().st_mtime_ns
+    os.utime(ip_range_database_file_path, ns=(index_modification_time + 10**9, index_modification_time + 10**9))
+
+    ip_range_database_resolver = _IPRangeDatabaseResolver(ip_range_database_file_path=ip_range_database_file_path)
+    assert ip_range_database_resolver.resolve(ip_addresses=ip_addresses) == {"198.51.100.0": "GB"}
+
+
+def test_get_regions_from_ip_addresses_with_ip_range_database(tmp_path) -> None:
+    """IP addresses found in the database are resolved offline and cached."""
+    ip_range_database_file_path = tmp_path / "ip_ranges.csv"
+    ip_range_database_file_path.write_text("start_ip,end_ip,country,region\n192.0.2.0,192.0.2.255,US,California\n")
+
+    ip_hash_salt = bytes.fromhex("a1")  # Set for the tests in the `pyproject.toml`
+    ip_hash = hashlib.sha1(string=b"192.0.2.1" + ip_hash_salt).hexdigest()
+    ip_hash_to_region = dict()
+    ip_hash_not_in_services = {ip_hash: True}  # Skip fetching the address ranges of the known services
+
+    regions = dandi_s3_log_parser.get_regions_from_ip_addresses(
+        ip_addresses=["192.0.2.1", "unknown", "192.0.2.1"],
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+    )
+    assert regions.tolist() == ["US/California", "unknown", "US/California"]
+    assert ip_hash_to_region == {ip_hash: "US/California"}
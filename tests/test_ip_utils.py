@@ -0,0 +1,134 @@
+import hashlib
+import time
+
+import numpy
+import pandas
+
+import dandi_s3_log_parser
+from dandi_s3_log_parser._ip_utils import _has_failed_ip_addresses
+
+
+def test_get_regions_from_ip_addresses() -> None:
+    """Each distinct IP address is resolved once from the cache and mapped back to every row in order."""
+    ip_hash_salt = bytes.fromhex("a1")  # Set for the tests in the `pyproject.toml`
+    ip_hash_to_region = {
+        hashlib.sha1(string=b"192.0.2.0" + ip_hash_salt).hexdigest(): "US/California",
+        hashlib.sha1(string=b"198.51.100.0" + ip_hash_salt).hexdigest(): "AWS/us-east-2",
+    }
+    ip_addresses = ["192.0.2.0", "198.51.100.0", "unknown", "192.0.2.0", "192.0.2.0"]
+    expected_regions = ["US/California", "AWS/us-east-2", "unknown", "US/California", "US/California"]
+
+    regions = dandi_s3_log_parser.get_regions_from_ip_addresses(
+        ip_addresses=ip_addresses, ip_hash_to_region=ip_hash_to_region, ip_hash_not_in_services=dict()
+    )
+    assert regions.tolist() == expected_regions
+
+    categorical_regions = dandi_s3_log_parser.get_regions_from_ip_addresses(
+        ip_addresses=pandas.Series(data=ip_addresses, dtype="category"),
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=dict(),
+    )
+    numpy.testing.assert_array_equal(categorical_regions, regions)
+
+    assert [
+        dandi_s3_log_parser.get_region_from_ip_address(
+            ip_address=ip_address, ip_hash_to_region=ip_hash_to_region, ip_hash_not_in_services=dict()
+        )
+        for ip_address in ip_addresses
+    ] == expected_regions
+
+
+def test_get_regions_from_ip_addresses_with_failures(tmp_path) -> None:
+    """IP addresses whose lookup failed recently are not looked up again, and a later success clears the failure."""
+    ip_range_database_file_path = tmp_path / "ip_ranges.csv"
+    ip_range_database_file_path.write_text("start_ip,end_ip,country\n192.0.2.0,192.0.2.255,US\n")
+
+    ip_hash_salt = bytes.fromhex("a1")  # Set for the tests in the `pyproject.toml`
+    recent_ip_hash = hashlib.sha1(string=b"192.0.2.1" + ip_hash_salt).hexdigest()
+    expired_ip_hash = hashlib.sha1(string=b"192.0.2.2" + ip_hash_salt).hexdigest()
+    ip_hash_to_region = dict()
+    ip_hash_not_in_services = {recent_ip_hash: True, expired_ip_hash: True}  # Skip fetching the service ranges
+    ip_hash_to_failure_time = {recent_ip_hash: time.time() - 60.0, expired_ip_hash: time.time() - 7200.0}
+
+    ip_addresses = ["192.0.2.1", "192.0.2.2", "unknown"]
+    regions = dandi_s3_log_parser.get_regions_from_ip_addresses(
+        ip_addresses=ip_addresses,
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+        ip_hash_to_failure_time=ip_hash_to_failure_time,
+    )
+    assert regions.tolist() == ["unknown", "US", "unknown"]
+    assert ip_hash_to_region == {expired_ip_hash: "US"}
+    assert list(ip_hash_to_failure_time) == [recent_ip_hash]
+
+    assert _has_failed_ip_addresses(
+        ip_addresses=numpy.array(ip_addresses), regions=regions, ip_hash_to_failure_time=ip_hash_to_failure_time
+    )
+    assert not _has_failed_ip_addresses(
+        ip_addresses=numpy.array(ip_addresses[1:]), regions=regions[1:], ip_hash_to_failure_time=ip_hash_to_failure_time
+    )
+
+    # Without a time to live, as when retrying unresolved regions, a recent failure is looked up again
+    regions = dandi_s3_log_parser.get_regions_from_ip_addresses(
+        ip_addresses=ip_addresses,
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+        ip_hash_to_failure_time=ip_hash_to_failure_time,
+        ip_lookup_failure_time_to_live_in_seconds=0.0,
+    )
+    assert regions.tolist() == ["US", "US", "unknown"]
+    assert len(ip_hash_to_failure_time) == 0
+
+
+def test_get_regions_from_ip_addresses_with_subnets(tmp_path) -> None:
+    """Only one IP address per subnet is looked up, and sampled lookups retire subnets spanning several regions."""
+    ip_range_database_file_path = tmp_path / "ip_ranges.csv"
+    ip_range_database_file_path.write_text(
+        "start_ip,end_ip,country,region\n192.0.2.0,192.0.2.127,US,California\n192.0.2.128,192.0.2.255,DE,\n"
+    )
+
+    ip_hash_salt = bytes.fromhex("a1")  # Set for the tests in the `pyproject.toml`
+    ip_addresses = ["192.0.2.1", "192.0.2.2", "192.0.2.3", "192.0.2.200", "192.0.2.201"]
+    ip_hashes = [hashlib.sha1(string=ip_address.encode() + ip_hash_salt).hexdigest() for ip_address in ip_addresses]
+    ip_hash_to_region = dict()
+    ip_hash_not_in_services = {ip_hash: True for ip_hash in ip_hashes}  # Skip fetching the service ranges
+    subnet_hash_to_region = dict()
+
+    regions = dandi_s3_log_parser.get_regions_from_ip_addresses(
+        ip_addresses=ip_addresses[:3],
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+        subnet_hash_to_region=subnet_hash_to_region,
+        subnet_consistency_sampling_rate=0.0,
+    )
+    assert regions.tolist() == ["US/California"] * 3
+    assert list(ip_hash_to_region) == [ip_hashes[0]]
+    (subnet_hash,) = subnet_hash_to_region
+    assert subnet_hash_to_region[subnet_hash] == "US/California"
+    assert subnet_hash == hashlib.sha1(string=b"192.0.2.0/24" + ip_hash_salt).hexdigest()
+
+    # A sampled lookup that disagrees with its subnet stops the subnet from being used
+    regions = dandi_s3_log_parser.get_regions_from_ip_addresses(
+        ip_addresses=ip_addresses[3:4],
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+        subnet_hash_to_region=subnet_hash_to_region,
+        subnet_consistency_sampling_rate=1.0,
+    )
+    assert regions.tolist() == ["DE"]
+    assert subnet_hash_to_region[subnet_hash] == ""
+
+    regions = dandi_s3_log_parser.get_regions_from_ip_addresses(
+        ip_addresses=ip_addresses[4:],
+        ip_hash_to_region=ip_hash_to_region,
+        ip_hash_not_in_services=ip_hash_not_in_services,
+        ip_range_database_file_path=ip_range_database_file_path,
+        subnet_hash_to_region=subnet_hash_to_region,
+        subnet_consistency_sampling_rate=0.0,
+    )
+    assert regions.tolist() == ["DE"]
+    assert ip_hash_to_region[ip_hashes[4]] == "DE"
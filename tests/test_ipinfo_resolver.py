@@ -0,0 +1,114 @@
+import http.server
+import json
+import threading
+from collections.abc import Iterator
+
+import pytest
+
+from dandi_s3_log_parser._ipinfo_resolver import _IPInfoResolver
+
+_REGIONS_BY_IP_ADDRESS = {"192.0.2.0": ("US", "California"), "198.51.100.0": ("DE", None)}
+
+
+class _IPInfoStandInRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Mimic the batch endpoint of the `ipinfo` API."""
+
+    def do_POST(self) -> None:
+        self.server.batch_sizes.append(None)
+        if self.server.is_quota_exceeded:
+            self.send_response(code=429)
+            if self.server.retry_after is not None:
+                self.send_header(keyword="Retry-After", value=self.server.retry_after)
+            self.end_headers()
+            return
+
+        assert self.path == "/batch"
+        assert self.headers["Authorization"] == "Bearer test_token"
+
+        ip_addresses = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.batch_sizes[-1] = len(ip_addresses)
+        details_by_ip_address = dict()
+        for ip_address in ip_addresses:
+            country, region = _REGIONS_BY_IP_ADDRESS.get(ip_address, (None, None))
+            details_by_ip_address[ip_address] = {"ip": ip_address, "country": country, "region": region}
+
+        content = json.dumps(details_by_ip_address).encode()
+        self.send_response(code=200)
+        self.send_header(keyword="Content-Type", value="application/json")
+        self.send_header(keyword="Content-Length", value=str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def ipinfo_stand_in() -> Iterator[http.server.ThreadingHTTPServer]:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _IPInfoStandInRequestHandler)
+    server.batch_sizes = []
+    server.is_quota_exceeded = False
+    server.retry_after = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_ipinfo_resolver_batches(ipinfo_stand_in: http.server.ThreadingHTTPServer) -> None:
+    """IP addresses are resolved in batches of at most the batch size, across concurrent requests."""
+    ip_addresses = ["192.0.2.0", "198.51.100.0"] + [f"203.0.113.{index}" for index in range(8)]
+    resolver = _IPInfoResolver(
+        access_token="test_token",
+        api_url=f"http://127.0.0.1:{ipinfo_stand_in.server_port}",
+        batch_size=3,
+        maximum_number_of_workers=2,
+        maximum_requests_per_second=100.0,
+    )
+    regions_by_ip_address = resolver.resolve(ip_addresses=ip_addresses)
+    resolver.close()
+
+    assert regions_by_ip_address["192.0.2.0"] == "US/California"
+    assert regions_by_ip_address["198.51.100.0"] == "DE"
+    assert all(regions_by_ip_address[f"203.0.113.{index}"] == "unknown" for index in range(8))
+    assert sorted(ipinfo_stand_in.batch_sizes) == [1, 3, 3, 3]
+
+
+def test_ipinfo_resolver_quota_exceeded(ipinfo_stand_in: http.server.ThreadingHTTPServer) -> None:
+    """Once the quota is exceeded, nothing is resolved and no further requests are made."""
+    ipinfo_stand_in.is_quota_exceeded = True
+    resolver = _IPInfoResolver(
+        access_token="test_token",
+        api_url=f"http://127.0.0.1:{ipinfo_stand_in.server_port}",
+        batch_size=1,
+        maximum_number_of_workers=1,
+        maximum_requests_per_second=100.0,
+    )
+    regions_by_ip_address = resolver.resolve(ip_addresses=["192.0.2.0", "198.51.100.0"])
+    resolver.close()
+
+    assert regions_by_ip_address == dict()
+    assert resolver.is_quota_exceeded
+    assert len(ipinfo_stand_in.batch_sizes) == 1
+
+
+@pytest.mark.parametrize("retry_after, expected_number_of_requests", [("0", 4), ("2592000", 1)])
+def test_ipinfo_resolver_quota_exceeded_retry_after(
+    ipinfo_stand_in: http.server.ThreadingHTTPServer, retry_after: str, expected_number_of_requests: int
+) -> None:
+    """Short waits asked for by the API are honored a few times; waits longer than the maximum give up at once."""
+    ipinfo_stand_in.is_quota_exceeded = True
+    ipinfo_stand_in.retry_after = retry_after
+    resolver = _IPInfoResolver(
+        access_token="test_token",
+        api_url=f"http://127.0.0.1:{ipinfo_stand_in.server_port}",
+        maximum_requests_per_second=100.0,
+        maximum_retry_wait_in_seconds=1.0,
+    )
+    regions_by_ip_address = resolver.resolve(ip_addresses=["192.0.2.0"])
+    resolver.close()
+
+    assert regions_by_ip_address == dict()
+    assert resolver.is_quota_exceeded
+    assert len(ipinfo_stand_in.batch_sizes) == expected_number_of_requests
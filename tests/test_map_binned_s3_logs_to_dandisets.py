@@ -0,0 +1,99 @@
+import pathlib
+
+import pandas
+import py
+import pytest
+
+import dandi_s3_log_parser
+from dandi_s3_log_parser import _map_binned_s3_logs_to_dandisets
+from dandi_s3_log_parser._dandi_metadata_cache import _DandiAsset
+
+_VERSION_IDS = ["0.210812.1448", "draft"]
+_ASSETS = [
+    _DandiAsset(path="sub-1/sub-1.nwb", blob_id="a7b032b8-1e31-429f-975f-52a28cec6629", zarr_id=None),
+    _DandiAsset(path="sub-2/sub-2.ome.zarr", blob_id=None, zarr_id="cb65c877-882b-4554-8fa1-8f4e986e13a6"),
+    _DandiAsset(path="sub-3/sub-3.nwb", blob_id="58c53789-eec4-4080-ad3b-207cf2a1a1d9", zarr_id=None),
+]
+
+
+class _DandiMetadataStandIn:
+    """Every version of Dandiset 000001 lists the same assets, so each blob is shared across versions."""
+
+    def __init__(self, **kwargs) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def prefetch(self, *, dandiset_ids: list[str]) -> None:
+        pass
+
+    def get_version_ids(self, *, dandiset_id: str) -> list[str]:
+        return _VERSION_IDS
+
+    def get_assets(self, *, dandiset_id: str, version_id: str) -> list[_DandiAsset]:
+        return _ASSETS
+
+
+def test_map_binned_s3_logs_to_dandisets_without_catalog(
+    tmpdir: py.path.local, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Blobs are mapped once per call and reused by later calls, even when binning kept no catalog."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    example_folder_path = pathlib.Path(__file__).parent / "test_binning" / "examples" / "binning_example_0"
+    reduced_s3_logs_folder_path = example_folder_path / "reduced_logs"
+
+    binned_s3_logs_folder_path = tmpdir / "binned_example_0"
+    binned_s3_logs_folder_path.mkdir()
+    mapped_s3_logs_folder_path = tmpdir / "mapped_example_0"
+    mapped_s3_logs_folder_path.mkdir()
+
+    dandi_s3_log_parser.bin_all_reduced_s3_logs_by_object_key(
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+    )
+
+    # Folders binned before the journal existed have no catalog
+    (binned_s3_logs_folder_path / "binning_journal.sqlite").unlink()
+
+    # Resolve every IP address up front so that mapping makes no lookups
+    ip_addresses = pandas.concat(
+        objs=[
+            pandas.read_table(filepath_or_buffer=binned_s3_log_file_path, usecols=["ip_address"])
+            for binned_s3_log_file_path in binned_s3_logs_folder_path.rglob("*.tsv")
+        ]
+    )["ip_address"].unique()
+    pandas.DataFrame(data={"ip_address": ip_addresses, "region": "US/California"}).to_csv(
+        path_or_buf=binned_s3_logs_folder_path / "ip_address_regions.tsv", sep="\t", index=False
+    )
+
+    monkeypatch.setattr(_map_binned_s3_logs_to_dandisets, "_DandiMetadataCache", _DandiMetadataStandIn)
+    dandi_s3_log_parser.map_binned_s3_logs_to_dandisets(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+        mapped_s3_logs_folder_path=mapped_s3_logs_folder_path,
+        restrict_to_dandisets=["000001"],
+    )
+
+    dandiset_folder_path = mapped_s3_logs_folder_path / "000001"
+    mapped_file_stats = dict()
+    for file_name in ["sub-1_nwb.tsv", "sub-2_ome_zarr.tsv"]:
+        published_file_path, draft_file_path = (
+            dandiset_folder_path / version_id / file_name for version_id in _VERSION_IDS
+        )
+        assert published_file_path.samefile(draft_file_path)
+        mapped_file_stats[file_name] = published_file_path.stat()
+
+    # The blob that was never accessed has no mapped file
+    assert not (dandiset_folder_path / "draft" / "sub-3_nwb.tsv").exists()
+
+    dandi_s3_log_parser.map_binned_s3_logs_to_dandisets(
+        binned_s3_logs_folder_path=binned_s3_logs_folder_path,
+        mapped_s3_logs_folder_path=mapped_s3_logs_folder_path,
+        restrict_to_dandisets=["000001"],
+    )
+
+    for file_name, mapped_file_stat in mapped_file_stats.items():
+        for version_id in _VERSION_IDS:
+            file_stat = (dandiset_folder_path / version_id / file_name).stat()
+            assert (file_stat.st_ino, file_stat.st_mtime_ns) == (mapped_file_stat.st_ino, mapped_file_stat.st_mtime_ns)
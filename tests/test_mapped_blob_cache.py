@@ -0,0 +1,61 @@
+import pathlib
+
+import pandas
+
+from dandi_s3_log_parser._mapped_blob_cache import _link_mapped_file, _MappedBlob, _MappedBlobCache
+
+
+def test_mapped_blob_cache(tmp_path: pathlib.Path) -> None:
+    """A mapped blob is reused across calls until its fingerprint or its mapped file changes."""
+    object_key = "blobs/a7b/032/a7b032b8-1e31-429f-975f-52a28cec6629"
+    file_path = tmp_path / "000001" / "0.210812.1448" / "sub-1_nwb.tsv"
+    file_path.parent.mkdir(parents=True)
+    file_path.write_text("\ttimestamp\tbytes_sent\tregion\n0\t2020-01-01 22:42:58\t512\tNA\n")
+
+    mapped_blob = _MappedBlob(
+        file_path=file_path,
+        total_bytes=512,
+        aggregated_activity_by_day=pandas.DataFrame(data={"date": ["2020-01-01"], "bytes_sent": [512]}),
+        aggregated_activity_by_region=pandas.DataFrame(data={"region": ["NA"], "bytes_sent": [512]}),
+    )
+    with _MappedBlobCache(mapped_s3_logs_folder_path=tmp_path) as mapped_blob_cache:
+        assert mapped_blob_cache.get(object_key=object_key, fingerprint="1") is None
+        mapped_blob_cache.put(object_key=object_key, fingerprint="1", mapped_blob=mapped_blob)
+        assert mapped_blob_cache.get(object_key=object_key, fingerprint="1") is mapped_blob
+
+    with _MappedBlobCache(mapped_s3_logs_folder_path=tmp_path) as mapped_blob_cache:
+        assert mapped_blob_cache.get(object_key=object_key, fingerprint="2") is None
+
+        cached_mapped_blob = mapped_blob_cache.get(object_key=object_key, fingerprint="1")
+        assert cached_mapped_blob.file_path == file_path
+        assert cached_mapped_blob.total_bytes == 512
+        pandas.testing.assert_frame_equal(
+            left=cached_mapped_blob.aggregated_activity_by_day, right=mapped_blob.aggregated_activity_by_day
+        )
+        pandas.testing.assert_frame_equal(
+            left=cached_mapped_blob.aggregated_activity_by_region, right=mapped_blob.aggregated_activity_by_region
+        )
+
+        linked_file_path = tmp_path / "000002" / "draft" / "sub-1_nwb.tsv"
+        linked_file_path.parent.mkdir(parents=True)
+        linked_file_path.write_text("outdated")
+        _link_mapped_file(source_file_path=cached_mapped_blob.file_path, file_path=linked_file_path)
+        assert linked_file_path.read_text() == file_path.read_text()
+
+        # Linking again onto a link of the same file leaves nothing behind
+        _link_mapped_file(source_file_path=cached_mapped_blob.file_path, file_path=linked_file_path)
+        assert list(linked_file_path.parent.iterdir()) == [linked_file_path]
+
+        file_path.unlink()
+        file_path.write_text("\ttimestamp\tbytes_sent\tregion\n")
+        assert mapped_blob_cache.get(object_key=object_key, fingerprint="1") is None
+        assert linked_file_path.read_text() != file_path.read_text()
+
+    # Blobs with failed lookups are only reused within the same call
+    unresolved_mapped_blob = mapped_blob._replace(has_failed_lookups=True)
+    with _MappedBlobCache(mapped_s3_logs_folder_path=tmp_path) as mapped_blob_cache:
+        mapped_blob_cache.put(object_key=object_key, fingerprint="3", mapped_blob=unresolved_mapped_blob)
+        assert mapped_blob_cache.get(object_key=object_key, fingerprint="3") is unresolved_mapped_blob
+
+    with _MappedBlobCache(mapped_s3_logs_folder_path=tmp_path) as mapped_blob_cache:
+        assert mapped_blob_cache.get(object_key=object_key, fingerprint="3") is None
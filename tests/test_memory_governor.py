@@ -0,0 +1,28 @@
+from dandi_s3_log_parser._memory_governor import _MemoryGovernor
+
+
+def test_memory_governor_usage_ratio_floor() -> None:
+    """The usage ratio never relaxes below its starting value, so buffer sizes stay bounded by the memory ceiling."""
+    maximum_memory_in_bytes = 10**12
+    memory_governor = _MemoryGovernor(
+        maximum_memory_in_bytes=maximum_memory_in_bytes,
+        maximum_number_of_workers=1,
+        maximum_buffer_size_in_bytes=10**15,
+    )
+    memory_governor.baseline_rss_in_bytes = 0
+
+    # Tasks that report no memory usage at all
+    file_size_in_bytes = 10**8
+    for _ in range(1_000):
+        task_id, buffer_size_in_bytes = memory_governor.try_admit(file_size_in_bytes=file_size_in_bytes)
+        memory_governor.release(
+            task_id=task_id,
+            file_size_in_bytes=file_size_in_bytes,
+            buffer_size_in_bytes=buffer_size_in_bytes,
+            baseline_rss_in_bytes=0,
+            peak_rss_in_bytes=0,
+        )
+    assert memory_governor.usage_ratio == memory_governor.minimum_usage_ratio
+
+    _, buffer_size_in_bytes = memory_governor.try_admit(file_size_in_bytes=maximum_memory_in_bytes)
+    assert buffer_size_in_bytes <= maximum_memory_in_bytes
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import pathlib
+import time
+
+import pandas
+import py
+
+import dandi_s3_log_parser
+
+
+def _reduce_with_coordination(raw_s3_logs_folder_path: pathlib.Path, reduced_s3_logs_folder_path: pathlib.Path):
+    dandi_s3_log_parser.reduce_all_dandi_raw_s3_logs(
+        raw_s3_logs_folder_path=raw_s3_logs_folder_path,
+        reduced_s3_logs_folder_path=reduced_s3_logs_folder_path,
+        coordinate_with_other_nodes=True,
+    )
+
+
+def test_reduce_all_dandi_raw_s3_logs_coordinated_example_1(tmpdir: py.path.local) -> None:
+    """Several independent invocations sharing the same output folder should split the work between them."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "reduction_example_1"
+    example_raw_s3_logs_folder_path = example_folder_path / "raw_logs"
+
+    test_reduced_s3_logs_folder_path = tmpdir / "reduction_example_1"
+    test_reduced_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_reduced_s3_logs_folder_path = example_folder_path / "expected_output"
+
+    processes = [
+        multiprocessing.Process(
+            target=_reduce_with_coordination,
+            args=(example_raw_s3_logs_folder_path, test_reduced_s3_logs_folder_path),
+        )
+        for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    # All leases should have been released
+    leases_folder_path = test_reduced_s3_logs_folder_path / ".leases"
+    assert len(list(leases_folder_path.rglob("*.lease"))) == 0
+
+    test_output_file_paths = list(test_reduced_s3_logs_folder_path.rglob("*.tsv"))
+    assert len(test_output_file_paths) == 2
+
+    for relative_file_path in [pathlib.Path("2020") / "01" / "01.tsv", pathlib.Path("2021") / "02" / "03.tsv"]:
+        test_reduced_s3_log = pandas.read_table(
+            filepath_or_buffer=test_reduced_s3_logs_folder_path / relative_file_path
+        )
+        expected_reduced_s3_log = pandas.read_table(
+            filepath_or_buffer=expected_reduced_s3_logs_folder_path / relative_file_path
+        )
+
+        pandas.testing.assert_frame_equal(left=test_reduced_s3_log, right=expected_reduced_s3_log)
+
+
+def test_reduce_all_dandi_raw_s3_logs_coordinated_expired_lease(tmpdir: py.path.local) -> None:
+    """Expired leases (from dead invocations) should be reclaimed, while live leases should be respected."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "reduction_example_1"
+    example_raw_s3_logs_folder_path = example_folder_path / "raw_logs"
+
+    test_reduced_s3_logs_folder_path = tmpdir / "reduction_example_1"
+    leases_folder_path = test_reduced_s3_logs_folder_path / ".leases"
+
+    expired_lease_file_path = leases_folder_path / "2020" / "01" / "01.lease"
+    expired_lease_file_path.parent.mkdir(parents=True)
+    expired_lease_file_path.write_text("dead-node:1:abcdefgh")
+    an_hour_ago = time.time() - 3_600
+    os.utime(expired_lease_file_path, times=(an_hour_ago, an_hour_ago))
+
+    live_lease_file_path = leases_folder_path / "2021" / "02" / "03.lease"
+    live_lease_file_path.parent.mkdir(parents=True)
+    live_lease_file_path.write_text("live-node:1:abcdefgh")
+
+    dandi_s3_log_parser.reduce_all_dandi_raw_s3_logs(
+        raw_s3_logs_folder_path=example_raw_s3_logs_folder_path,
+        reduced_s3_logs_folder_path=test_reduced_s3_logs_folder_path,
+        coordinate_with_other_nodes=True,
+        lease_duration_in_seconds=60,
+    )
+
+    assert (test_reduced_s3_logs_folder_path / "2020" / "01" / "01.tsv").exists()
+    assert not expired_lease_file_path.exists()
+
+    assert not (test_reduced_s3_logs_folder_path / "2021" / "02" / "03.tsv").exists()
+    assert live_lease_file_path.read_text() == "live-node:1:abcdefgh"
@@ -1,3 +1,4 @@
+import json
 import pathlib
 
 import pandas
@@ -51,4 +52,46 @@ def test_reduce_all_dandi_raw_s3_logs_example_1(tmpdir: py.path.local) -> None:
     pandas.testing.assert_frame_equal(left=test_reduced_s3_log, right=expected_reduced_s3_log)
 
 
+def test_reduce_all_dandi_raw_s3_logs_example_1_with_memory_governor(tmpdir: py.path.local) -> None:
+    """Parallel reduction under a memory ceiling should give identical results and report on the governor."""
+    tmpdir = pathlib.Path(tmpdir)
+
+    file_parent = pathlib.Path(__file__).parent
+    example_folder_path = file_parent / "examples" / "reduction_example_1"
+    example_raw_s3_logs_folder_path = example_folder_path / "raw_logs"
+
+    test_reduced_s3_logs_folder_path = tmpdir / "reduction_example_1"
+    test_reduced_s3_logs_folder_path.mkdir(exist_ok=True)
+
+    expected_reduced_s3_logs_folder_path = example_folder_path / "expected_output"
+
+    # A ceiling this low forces the governor to throttle admission down to a single task at a time
+    dandi_s3_log_parser.reduce_all_dandi_raw_s3_logs(
+        raw_s3_logs_folder_path=example_raw_s3_logs_folder_path,
+        reduced_s3_logs_folder_path=test_reduced_s3_logs_folder_path,
+        maximum_number_of_workers=2,
+        maximum_memory_in_bytes=10**6,
+    )
+
+    for relative_file_path in [pathlib.Path("2020") / "01" / "01.tsv", pathlib.Path("2021") / "02" / "03.tsv"]:
+        test_reduced_s3_log = pandas.read_table(
+            filepath_or_buffer=test_reduced_s3_logs_folder_path / relative_file_path
+        )
+        expected_reduced_s3_log = pandas.read_table(
+            filepath_or_buffer=expected_reduced_s3_logs_folder_path / relative_file_path
+        )
+
+        pandas.testing.assert_frame_equal(left=test_reduced_s3_log, right=expected_reduced_s3_log)
+
+    run_report_file_paths = list((test_reduced_s3_logs_folder_path / "run_reports").iterdir())
+    assert len(run_report_file_paths) == 1
+
+    with run_report_file_paths[0].open(mode="r") as io:
+        run_report = json.load(fp=io)
+    memory_governor_report = run_report["memory_governor"]
+    assert memory_governor_report["number_of_tasks"] == 2
+    assert all(task["peak_rss_in_bytes"] is not None for task in memory_governor_report["tasks"])
+    assert memory_governor_report["number_of_throttled_admissions"] >= 1
+
+
 # TODO: add CLI
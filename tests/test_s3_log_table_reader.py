@@ -0,0 +1,61 @@
+import gzip
+import io
+import pathlib
+
+import pandas
+import pytest
+
+from dandi_s3_log_parser._s3_log_table_reader import _format_timestamps, _read_s3_log_table
+
+_REDUCED_S3_LOG_CONTENT = (
+    "timestamp\tip_address\tobject_key\tbytes_sent\n"
+    "2020-01-01T05:06:35\t192.0.2.0\tblobs/11e/c89/11ec8933-1456-4942-922b-94e5878bb991\t512\n"
+    "2020-01-01T22:42:58\t192.0.2.0\tzarr/cb65c877-882b-4554-8fa1-8f4e986e13a6\t1526223\n"
+)
+
+
+@pytest.fixture(params=["c", "pyarrow"])
+def engine(request: pytest.FixtureRequest) -> str:
+    if request.param == "pyarrow":
+        pytest.importorskip(modname="pyarrow")
+
+    return request.param
+
+
+def test_read_s3_log_table(tmp_path: pathlib.Path, engine: str) -> None:
+    """Every engine reads the same types and timestamps, from plain or compressed files and from buffers."""
+    reduced_s3_log_file_path = tmp_path / "01.tsv"
+    reduced_s3_log_file_path.write_text(_REDUCED_S3_LOG_CONTENT)
+    compressed_reduced_s3_log_file_path = tmp_path / "01.tsv.gz"
+    compressed_reduced_s3_log_file_path.write_bytes(gzip.compress(data=_REDUCED_S3_LOG_CONTENT.encode()))
+
+    for file_path_or_buffer in [reduced_s3_log_file_path, compressed_reduced_s3_log_file_path]:
+        s3_log_table = _read_s3_log_table(file_path_or_buffer=file_path_or_buffer, engine=engine)
+
+        assert pandas.api.types.is_datetime64_any_dtype(s3_log_table["timestamp"])
+        assert _format_timestamps(timestamps=s3_log_table["timestamp"]).tolist() == [
+            "2020-01-01T05:06:35",
+            "2020-01-01T22:42:58",
+        ]
+        assert s3_log_table["bytes_sent"].dtype == "int64"
+        assert isinstance(s3_log_table["ip_address"].dtype, pandas.CategoricalDtype)
+        assert isinstance(s3_log_table["object_key"].dtype, pandas.CategoricalDtype)
+
+    s3_log_table = _read_s3_log_table(
+        file_path_or_buffer=reduced_s3_log_file_path, columns=["timestamp", "bytes_sent"], engine=engine
+    )
+    assert list(s3_log_table.columns) == ["timestamp", "bytes_sent"]
+    assert s3_log_table["timestamp"].tolist() == [
+        pandas.Timestamp("2020-01-01T05:06:35"),
+        pandas.Timestamp("2020-01-01T22:42:58"),
+    ]
+
+    # Binned records are appended without a header, and IP addresses may be encoded as integer IDs
+    s3_log_table = _read_s3_log_table(
+        file_path_or_buffer=io.BytesIO(b"2020-01-01T05:06:35\t512\t0\n2022-06-12T00:00:00\t10\t1\n"),
+        names=["timestamp", "bytes_sent", "ip_id"],
+        engine=engine,
+    )
+    assert _format_timestamps(timestamps=s3_log_table["timestamp"], unit="D").tolist() == ["2020-01-01", "2022-06-12"]
+    assert s3_log_table["ip_id"].tolist() == [0, 1]
+    assert s3_log_table["ip_id"].dtype == "int64"
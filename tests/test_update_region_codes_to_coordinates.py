@@ -0,0 +1,38 @@
+import pathlib
+import types
+
+import pytest
+
+from dandi_s3_log_parser import _update_region_codes_to_coordinates
+
+
+def test_get_service_coordinates_from_ipinfo_uses_ipv4_ranges(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Subregions are geolocated through one of their IPv4 ranges, even when IPv6 ranges are listed after them."""
+    cidr_addresses_and_subregions = [
+        ("192.0.2.0/24", "us-east-2"),
+        ("198.51.100.0/24", "eu-west-1"),
+        ("2001:db8::/32", "us-east-2"),
+    ]
+    monkeypatch.setattr(
+        _update_region_codes_to_coordinates,
+        "_get_cidr_address_ranges_and_subregions",
+        lambda service_name: cidr_addresses_and_subregions,
+    )
+
+    requested_ip_addresses = []
+
+    class _Handler:
+        def getDetails(self, ip_address: str) -> types.SimpleNamespace:
+            requested_ip_addresses.append(ip_address)
+            return types.SimpleNamespace(details={"latitude": 40.0, "longitude": -83.0})
+
+    monkeypatch.setattr(_update_region_codes_to_coordinates.ipinfo, "getHandler", lambda access_token: _Handler())
+
+    coordinates = _update_region_codes_to_coordinates._get_service_coordinates_from_ipinfo(
+        region_code="AWS/us-east-2", ipinfo_api_key="a1", log_parser_cache_directory=tmp_path
+    )
+
+    assert coordinates == {"latitude": 40.0, "longitude": -83.0}
+    assert requested_ip_addresses == ["192.0.2.0"]